@@ -1,2 +1,6 @@
-from .model import load_model, train_and_save_model
-from .logic import suggest_budget
+from .model import (load_model, train_and_save_model, get_model, unload_model, warm_up,
+                    export_mapped_model, model_memory_stats)
+from .logic import suggest_budget, suggest_budgets_batch, budget_cache_stats, clear_budget_cache
+from .odds import to_decimal, from_decimal, implied_probability, remove_vig, parlay_odds, price_slips, price_slip
+from .simulate import StakingPlan, simulate_bankroll, leg_probabilities
+from .staking import fractional_kelly, simultaneous_kelly, size_stakes
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+TREE_LEAF = -1
+CHUNK_ROWS = 4096
+
+# Flat file: magic, format version, header length, JSON header, then the
+# arrays at 64-byte aligned offsets so they can be mapped in place
+MAGIC = b"CCFOREST"
+FORMAT_VERSION = 1
+ALIGN = 64
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+_PREFIX = struct.Struct("<8sII")
+
+
+class ModelFileError(ValueError):
+    """A flat model file is truncated, corrupt or in an unknown format."""
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class CompiledForest:
+    """A tree ensemble flattened into contiguous NumPy arrays.
+
+    All trees share one set of node arrays; ``roots`` holds the index of each
+    tree's first node. Leaves point to themselves so every row can be walked
+    for ``max_depth`` steps without branching on whether it already stopped.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_outputs = value.shape[1]
+        self.mapped = False  # arrays are views of a memory-mapped file
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build from a fitted RandomForestRegressor (or any forest of regression trees)."""
+        estimators = getattr(model, "estimators_", None)
+        if not estimators:
+            raise TypeError("Model is not a fitted tree ensemble.")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            node_ids = np.arange(offset, offset + n, dtype=np.int64)
+            is_leaf = tree.children_left == TREE_LEAF
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(tree.value.reshape(n, -1).astype(np.float64))
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features)),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds)),
+            left=np.ascontiguousarray(np.concatenate(lefts)),
+            right=np.ascontiguousarray(np.concatenate(rights)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+        )
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def save(self, path, meta=None):
+        """Write the arrays to a flat file that ``load`` can memory-map.
+
+        The file is written next to ``path`` and renamed over it, so readers
+        never see a partial file. ``meta`` is stored in the header as-is.
+        """
+        arrays, offset = {}, 0
+        for name in ARRAYS:
+            arr = np.ascontiguousarray(getattr(self, name))
+            arrays[name] = (arr, offset)
+            offset = _aligned(offset + arr.nbytes)
+        payload = bytearray(offset)
+        for arr, start in arrays.values():
+            payload[start:start + arr.nbytes] = arr.tobytes()
+
+        header = json.dumps({
+            "max_depth": self.max_depth,
+            "arrays": {name: {"dtype": arr.dtype.newbyteorder("<").str, "shape": list(arr.shape), "offset": start}
+                       for name, (arr, start) in arrays.items()},
+            "payload_size": len(payload),
+            "sha256": hashlib.sha256(payload).hexdigest(),
+            "meta": meta or {},
+        }).encode()
+        prefix = _PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)) + header
+        prefix += b"\0" * (_aligned(len(prefix)) - len(prefix))
+
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(prefix)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_header(path):
+        """The JSON header of a flat file and the offset its arrays start at."""
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ModelFileError(f"{path}: truncated header")
+            magic, version, length = _PREFIX.unpack(prefix)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ModelFileError(f"{path}: not a version {FORMAT_VERSION} model file")
+            try:
+                header = json.loads(f.read(length))
+            except ValueError:
+                raise ModelFileError(f"{path}: corrupt header")
+        return header, _aligned(_PREFIX.size + length)
+
+    @classmethod
+    def load(cls, path, mmap=True, verify=True):
+        """Load a file written by ``save``; returns (forest, meta).
+
+        With ``mmap`` the arrays are read-only views of the mapped file, so
+        every process that maps it shares one copy in the page cache.
+        ``verify`` checks the payload's SHA-256 first.
+        """
+        header, start = cls.read_header(path)
+        size = header["payload_size"]
+        if os.path.getsize(path) < start + size:
+            raise ModelFileError(f"{path}: truncated payload")
+        if mmap:
+            buf = np.memmap(path, dtype=np.uint8, mode="r", offset=start, shape=(size,))
+        else:
+            with open(path, "rb") as f:
+                f.seek(start)
+                buf = np.frombuffer(f.read(size), dtype=np.uint8)
+        if verify and hashlib.sha256(buf).hexdigest() != header["sha256"]:
+            raise ModelFileError(f"{path}: checksum mismatch")
+
+        arrays = {}
+        for name in ARRAYS:
+            spec = header["arrays"][name]
+            arrays[name] = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]),
+                                      buffer=buf, offset=spec["offset"])
+        forest = cls(max_depth=header["max_depth"], **arrays)
+        forest.mapped = mmap
+        return forest, header["meta"]
+
+    def predict(self, X):
+        """Predict for an (N, n_features) array; returns (N, n_outputs)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if X.shape[0] <= CHUNK_ROWS:
+            return self._predict_chunk(X)
+        # Bound the (n_trees, rows) node matrix on large batches
+        return np.concatenate([
+            self._predict_chunk(X[start:start + CHUNK_ROWS])
+            for start in range(0, X.shape[0], CHUNK_ROWS)
+        ])
+
+    def _predict_chunk(self, X):
+        rows = np.arange(X.shape[0])[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=0)
+
+    def predict_one(self, row):
+        """Predict for a single row of features; returns (n_outputs,)."""
+        return self.predict(np.asarray(row).reshape(1, -1))[0]
@@ -1,8 +1,33 @@
-import pandas as pd
+import numpy as np
 import math
-from app.model import load_model
+import os
+from app.cache import LRUCache
+from app.model import get_loaded_model, model_generation, on_model_change
 
-model = load_model()
+FEATURES = ['income', 'fixed_expenses', 'savings_goal', 'months_to_goal']
+
+# Error codes returned per row by suggest_budgets_batch
+ERR_NON_NUMERIC = "non_numeric"
+ERR_INVALID = "invalid_input"
+ERR_UNREALISTIC = "unrealistic_goal"
+
+# Cache of model predictions keyed on the model generation and the normalized
+# inputs. With a quantum
+# set, money inputs are rounded to that step before predicting so near-identical
+# questions share an entry; the response is still computed from the exact inputs.
+BUDGET_CACHE_SIZE = int(os.getenv("BUDGET_CACHE_SIZE", "4096"))
+BUDGET_CACHE_TTL = float(os.getenv("BUDGET_CACHE_TTL", "3600")) or None
+BUDGET_CACHE_QUANTUM = float(os.getenv("BUDGET_CACHE_QUANTUM", "0"))
+
+_budget_cache = LRUCache(maxsize=BUDGET_CACHE_SIZE, ttl=BUDGET_CACHE_TTL)
+# The generation in the key keeps results apart; clearing just frees the old ones
+on_model_change(_budget_cache.clear)
+
+ERROR_MESSAGES = {
+    ERR_NON_NUMERIC: "⚠️ Input not realistic. Please enter numeric values.",
+    ERR_INVALID: "⚠️ Input not realistic. Please check your numbers.",
+    ERR_UNREALISTIC: "⚠️ This goal is not realistic with your current income and expenses.",
+}
 
 def suggest_budget(income, fixed_expenses, savings_goal, months_to_goal):
     """Suggest a personalized budget breakdown."""
@@ -12,29 +37,68 @@ def suggest_budget(income, fixed_expenses, savings_goal, months_to_goal):
         savings_goal = float(savings_goal)
         months_to_goal = float(months_to_goal)
     except (ValueError, TypeError):
-        return "⚠️ Input not realistic. Please enter numeric values."
+        return ERROR_MESSAGES[ERR_NON_NUMERIC]
 
     # Reject NaN or infinite values
     if any(map(lambda x: math.isnan(x) or math.isinf(x), [income, fixed_expenses, savings_goal, months_to_goal])):
-        return "⚠️ Input not realistic. Please enter numeric values."
+        return ERROR_MESSAGES[ERR_NON_NUMERIC]
 
     if months_to_goal <= 0 or income <= 0 or fixed_expenses < 0 or savings_goal < 0:
-        return "⚠️ Input not realistic. Please check your numbers."
+        return ERROR_MESSAGES[ERR_INVALID]
 
     savings_per_month = savings_goal / months_to_goal
     available = income - fixed_expenses - savings_per_month
 
     if available <= 0:
-        return "⚠️ This goal is not realistic with your current income and expenses."
+        return ERROR_MESSAGES[ERR_UNREALISTIC]
 
-    # Use DataFrame to avoid sklearn warnings
-    input_data = pd.DataFrame(
-        [[income, fixed_expenses, savings_goal, months_to_goal]],
-        columns=['income', 'fixed_expenses', 'savings_goal', 'months_to_goal']
+    food_pct, entertainment_pct, shopping_pct = _cached_predict(
+        income, fixed_expenses, savings_goal, months_to_goal
     )
 
-    food_pct, entertainment_pct, shopping_pct = model.predict(input_data)[0]
+    return _format_budget(income, fixed_expenses, savings_per_month, available,
+                          food_pct, entertainment_pct, shopping_pct)
+
+def _predict(rows):
+    """Predict (food, entertainment, shopping) percentages for rows of FEATURES."""
+    model, compiled_model = get_loaded_model()
+    if compiled_model is not None:
+        return compiled_model.predict(rows)
+
+    import pandas as pd
+
+    # Use DataFrame to avoid sklearn warnings
+    input_data = pd.DataFrame(rows, columns=FEATURES)
+    return model.predict(input_data)
+
+def _cache_key(income, fixed_expenses, savings_goal, months_to_goal):
+    q = BUDGET_CACHE_QUANTUM
+    if q > 0:
+        income = round(income / q) * q
+        fixed_expenses = round(fixed_expenses / q) * q
+        savings_goal = round(savings_goal / q) * q
+    # + 0.0 folds -0.0 into 0.0
+    return (income + 0.0, fixed_expenses + 0.0, savings_goal + 0.0, months_to_goal + 0.0)
+
+def _cached_predict(income, fixed_expenses, savings_goal, months_to_goal):
+    row = _cache_key(income, fixed_expenses, savings_goal, months_to_goal)
+    # Read before predicting, so a swap mid-prediction files this under the old model
+    key = (model_generation(), row)
+    pct = _budget_cache.get(key)
+    if pct is None:
+        pct = tuple(float(x) for x in _predict([row])[0])
+        _budget_cache.set(key, pct)
+    return pct
+
+def budget_cache_stats():
+    """Hit/miss counters and size of the suggest_budget prediction cache."""
+    return _budget_cache.stats()
 
+def clear_budget_cache():
+    _budget_cache.clear()
+
+def _format_budget(income, fixed_expenses, savings_per_month, available,
+                   food_pct, entertainment_pct, shopping_pct):
     return {
         "Income": income,
         "Fixed Expenses": fixed_expenses,
@@ -44,4 +108,108 @@ def suggest_budget(income, fixed_expenses, savings_goal, months_to_goal):
             "Entertainment": round(entertainment_pct * available, 2),
             "Shopping": round(shopping_pct * available, 2)
         }
-    }
\ No newline at end of file
+    }
+
+def _coerce_column(values):
+    """Convert one input column to float64, marking unparseable entries as NaN."""
+    try:
+        return np.asarray(values, dtype=np.float64), None
+    except (ValueError, TypeError):
+        pass
+
+    # Mixed/object input: fall back to the same float() rules as suggest_budget
+    out = np.empty(len(values), dtype=np.float64)
+    bad = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except (ValueError, TypeError):
+            out[i] = np.nan
+            bad[i] = True
+    return out, bad
+
+def _as_columns(data):
+    """Split batch input into the four feature columns."""
+    if isinstance(data, dict):
+        missing = [name for name in FEATURES if name not in data]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        columns = [data[name] for name in FEATURES]
+        lengths = {len(col) for col in columns}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length.")
+        return columns
+
+    if isinstance(data, (list, tuple)) and data and not isinstance(data[0], (list, tuple, np.ndarray)):
+        raise ValueError("Rows must each contain 4 values.")
+
+    if isinstance(data, np.ndarray) and data.dtype != object:
+        arr = data
+    else:
+        arr = np.empty((len(data), len(FEATURES)), dtype=object)
+        for i, row in enumerate(data):
+            if len(row) != len(FEATURES):
+                raise ValueError("Rows must each contain 4 values.")
+            arr[i] = list(row)
+
+    if arr.ndim != 2 or arr.shape[1] != len(FEATURES):
+        raise ValueError("Rows must each contain 4 values.")
+    return [arr[:, i] for i in range(len(FEATURES))]
+
+def suggest_budgets_batch(data):
+    """Suggest budgets for many scenarios with a single model prediction.
+
+    ``data`` is either an (N, 4) array/list of rows ordered like FEATURES, or a
+    dict mapping each feature name to a column of N values. Returns a list of N
+    entries: the same dict suggest_budget returns for valid rows, or
+    ``{"error": code, "message": text}`` for rows that were rejected.
+    """
+    columns = _as_columns(data)
+    n = len(columns[0])
+    if n == 0:
+        return []
+
+    values = []
+    non_numeric = np.zeros(n, dtype=bool)
+    for col in columns:
+        arr, bad = _coerce_column(col)
+        values.append(arr)
+        if bad is not None:
+            non_numeric |= bad
+    income, fixed_expenses, savings_goal, months_to_goal = values
+
+    # Same checks as suggest_budget, evaluated for every row at once
+    matrix = np.column_stack(values)
+    non_numeric |= ~np.isfinite(matrix).all(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        invalid = ~non_numeric & (
+            (months_to_goal <= 0) | (income <= 0) | (fixed_expenses < 0) | (savings_goal < 0)
+        )
+
+    ok = ~(non_numeric | invalid)
+    savings_per_month = np.zeros(n)
+    savings_per_month[ok] = savings_goal[ok] / months_to_goal[ok]
+    available = income - fixed_expenses - savings_per_month
+    unrealistic = ok & ~(available > 0)
+    ok &= ~unrealistic
+
+    codes = np.full(n, None, dtype=object)
+    codes[non_numeric] = ERR_NON_NUMERIC
+    codes[invalid] = ERR_INVALID
+    codes[unrealistic] = ERR_UNREALISTIC
+
+    pct = np.zeros((n, 3))
+    if ok.any():
+        pct[ok] = _predict(matrix[ok])
+
+    results = []
+    for i in range(n):
+        if codes[i] is not None:
+            results.append({"error": codes[i], "message": ERROR_MESSAGES[codes[i]]})
+            continue
+        results.append(_format_budget(
+            float(income[i]), float(fixed_expenses[i]), float(savings_per_month[i]),
+            float(available[i]), float(pct[i, 0]), float(pct[i, 1]), float(pct[i, 2])
+        ))
+    return results
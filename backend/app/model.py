@@ -1,26 +1,318 @@
-import pandas as pd
-import joblib
-from sklearn.ensemble import RandomForestRegressor
+import os
+import threading
+import time
 from pathlib import Path
+from app.compiled import CompiledForest, ModelFileError
+from app.registry import ModelRegistry, MODEL_FILE, file_sha256
+
+# pandas, sklearn and joblib are imported inside the functions that need them so
+# that importing `app` stays cheap for processes that never touch budgeting.
 
 MODEL_PATH = Path("models/budget_model.pkl")
+# The compiled forest as a flat file that every worker maps read-only, so the
+# tree arrays are one shared copy in the page cache. It is rebuilt from
+# MODEL_PATH whenever that file's contents change.
+MAPPED_MODEL_PATH = MODEL_PATH.with_suffix(".forest")
+
+# Set COMPILED_MODEL=0 to always go through sklearn's predict
+USE_COMPILED_MODEL = os.getenv("COMPILED_MODEL", "1") != "0"
+# Set MAPPED_MODEL=0 to compile a private copy in each process instead
+USE_MAPPED_MODEL = os.getenv("MAPPED_MODEL", "1") != "0"
+# Check the mapped file's checksum on load
+VERIFY_MAPPED_MODEL = os.getenv("VERIFY_MAPPED_MODEL", "1") != "0"
+
+# When the registry has an active version it is served instead of MODEL_PATH,
+# and workers poll ACTIVE every MODEL_WATCH_INTERVAL seconds to follow it
+MODEL_REGISTRY = ModelRegistry()
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+WARM_UP_ROW = (4000, 1500, 2400, 6)
+
+_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_loaded = None  # (model, compiled model or None), swapped in as one tuple
+_loaded_file = None  # (path, mtime, size) of the last model file read
+_active_version = None  # registry version in _loaded, None for MODEL_PATH
+_generation = 0  # bumped after every swap of the served model
+_reload_hooks = []
+_watcher = None
+_watcher_pid = None
+_watcher_stop = threading.Event()
 
 def train_and_save_model(csv_path="data/sample_data.csv"):
-    """Train a Random Forest model from sample data and save it."""
-    data = pd.read_csv(csv_path)
-    X = data[['income', 'fixed_expenses', 'savings_goal', 'months_to_goal']]
-    Y = data[['food_pct', 'entertainment_pct', 'shopping_pct']]
+    """Train a Random Forest model from sample data and save it.
+
+    Uses the chunked pipeline in app.training; run ``python -m app.training``
+    for large datasets, held-out scoring and registry publishing.
+    """
+    import joblib
+    from app.training import train
 
-    model = RandomForestRegressor(random_state=42)
-    model.fit(X, Y)
+    model, _ = train(csv_path, holdout=0)
 
     MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
     joblib.dump(model, MODEL_PATH)
     print("✅ Model Trained and Saved")
+    if USE_COMPILED_MODEL and USE_MAPPED_MODEL:
+        export_mapped_model(model)
 
 def load_model():
     """Load the trained model, or train it if not found."""
+    import joblib
+
     if not MODEL_PATH.exists():
         print("⚠️ Model not found — training a new one.")
         train_and_save_model()
-    return joblib.load(MODEL_PATH)
\ No newline at end of file
+    model = joblib.load(MODEL_PATH)
+    _note_model_file()
+    return model
+
+def _note_model_file():
+    # Run the change hooks if MODEL_PATH is not the file last read
+    global _loaded_file, _generation
+
+    stat = MODEL_PATH.stat()
+    identity = (str(MODEL_PATH.resolve()), stat.st_mtime_ns, stat.st_size)
+    changed = _loaded_file is not None and identity != _loaded_file
+    _loaded_file = identity
+    if changed:
+        _generation += 1
+        for hook in list(_reload_hooks):
+            hook()
+
+def on_model_change(hook):
+    """Register a callable to run when load_model reads a different model file."""
+    _reload_hooks.append(hook)
+    return hook
+
+def model_generation():
+    """Counter that changes whenever a different model starts being served.
+
+    Read it before predicting and store results under it: a prediction that
+    raced a swap is then filed under the old generation and never served.
+    """
+    return _generation
+
+def compile_model(model):
+    """Flatten a tree-ensemble model for fast inference; returns None if unsupported."""
+    try:
+        return CompiledForest.from_sklearn(model)
+    except (TypeError, AttributeError):
+        return None
+
+def _source_identity():
+    stat = MODEL_PATH.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(MODEL_PATH)}
+
+def export_mapped_model(model=None):
+    """Write MAPPED_MODEL_PATH from the sklearn model. Returns the compiled forest or None.
+
+    A model that can't be compiled (e.g. histogram boosting) removes any
+    MAPPED_MODEL_PATH left by an earlier forest, so it is never served.
+    """
+    compiled = compile_model(model if model is not None else load_model())
+    if compiled is None:
+        MAPPED_MODEL_PATH.unlink(missing_ok=True)
+        return None
+    compiled.save(MAPPED_MODEL_PATH, meta={"source": _source_identity()})
+    return compiled
+
+def _mapped_is_current(source):
+    # Size first as a cheap reject, then the contents: mtimes can match
+    # across different files (copies, checkouts, coarse timestamps)
+    if source.get("size") != MODEL_PATH.stat().st_size:
+        return False
+    return source.get("sha256") == file_sha256(MODEL_PATH)
+
+def load_mapped_model():
+    """Map the flat model file, rebuilding it if it is missing or stale.
+
+    Returns (compiled_model, sklearn model or None): the sklearn model is only
+    loaded when the file had to be rebuilt. compiled_model is None when the
+    model is not a forest.
+    """
+    if not MODEL_PATH.exists():
+        model = load_model()  # trains one
+        return export_mapped_model(model), model
+    try:
+        header, _ = CompiledForest.read_header(MAPPED_MODEL_PATH)
+        if _mapped_is_current(header["meta"].get("source", {})):
+            compiled, _ = CompiledForest.load(MAPPED_MODEL_PATH, verify=VERIFY_MAPPED_MODEL)
+            _note_model_file()
+            _report_mapped(compiled)
+            return compiled, None
+    except FileNotFoundError:
+        pass
+    except (ModelFileError, KeyError) as e:
+        print("⚠️ Mapped model unusable, rebuilding:", e)
+
+    model = load_model()
+    if export_mapped_model(model) is None:
+        return None, model  # not a forest: served through sklearn
+    compiled, _ = CompiledForest.load(MAPPED_MODEL_PATH, verify=False)
+    _report_mapped(compiled)
+    return compiled, model
+
+def _report_mapped(compiled):
+    print(f"✅ Mapped model: {compiled.nbytes / 1024:.0f}KB of tree arrays shared across workers")
+
+def model_memory_stats():
+    """Bytes of the loaded model that are shared (mapped) and private to this process.
+
+    ``saved_bytes`` is what mapping saves this process over the private
+    setup: the compiled arrays, plus the unpickled sklearn model if it was
+    never loaded (estimated from the pickle's size).
+    """
+    loaded = _loaded
+    if loaded is None:
+        return {"loaded": False, "mapped_bytes": 0, "private_bytes": 0, "saved_bytes": 0}
+    model, compiled = loaded
+    mapped = compiled is not None and compiled.mapped
+    mapped_bytes = compiled.nbytes if mapped else 0
+    private_bytes = 0 if compiled is None or mapped else compiled.nbytes
+    saved = mapped_bytes
+    pkl = MODEL_PATH if _active_version is None else MODEL_REGISTRY.root / _active_version / MODEL_FILE
+    if mapped and model is None and pkl.exists():
+        saved += pkl.stat().st_size
+    return {"loaded": True, "mapped_bytes": mapped_bytes, "private_bytes": private_bytes,
+            "sklearn_loaded": model is not None, "saved_bytes": saved}
+
+def get_loaded_model():
+    """Return (model, compiled_model), loading them on first use.
+
+    The registry's active version is served if there is one, else
+    MODEL_PATH. With the mapped model the sklearn model may be None:
+    predictions only need the compiled forest, and ``get_model`` loads
+    sklearn's on demand.
+
+    Safe to call from many threads: only the first caller loads, the rest wait
+    for it and then share the result.
+    """
+    global _loaded, _active_version
+    loaded = _loaded
+    if loaded is None:
+        with _lock:
+            loaded = _loaded
+            if loaded is None:
+                version = MODEL_REGISTRY.active_version()
+                if version is not None:
+                    model, compiled = _load_version(version)
+                    _active_version = version
+                elif USE_COMPILED_MODEL and USE_MAPPED_MODEL:
+                    compiled, model = load_mapped_model()
+                    if compiled is None:
+                        model = model if model is not None else load_model()
+                else:
+                    model = load_model()
+                    compiled = compile_model(model) if USE_COMPILED_MODEL else None
+                loaded = _loaded = (model, compiled)
+    # Every call, not just the first: a worker forked from a master that
+    # loaded the model inherits _loaded but not the watcher thread
+    watch_registry()
+    return loaded
+
+def get_model():
+    """Return the sklearn model, loading it on first use."""
+    global _loaded
+    model, compiled = get_loaded_model()
+    if model is None:
+        with _lock:
+            if _loaded is not None:
+                model, compiled = _loaded
+            if model is None:
+                model = load_model() if _active_version is None else MODEL_REGISTRY.load_sklearn(_active_version)
+                _loaded = (model, compiled)
+    return model
+
+def unload_model():
+    """Drop the loaded model; the next get_model() call loads it again."""
+    global _loaded, _active_version
+    with _lock:
+        _loaded = None
+        _active_version = None
+
+def active_model_version():
+    """Registry version being served, or None when serving MODEL_PATH."""
+    return _active_version
+
+def _load_version(version):
+    if USE_COMPILED_MODEL:
+        compiled, _ = MODEL_REGISTRY.load(version, verify=VERIFY_MAPPED_MODEL)
+        if compiled is not None:
+            return None, compiled
+    return MODEL_REGISTRY.load_sklearn(version), None
+
+def _predict_once(model, compiled):
+    if compiled is not None:
+        compiled.predict([WARM_UP_ROW])
+    else:
+        import pandas as pd
+        from app.logic import FEATURES
+
+        model.predict(pd.DataFrame([WARM_UP_ROW], columns=FEATURES))
+
+def reload_model(version=None):
+    """Swap in a registry version (default: the active one) without a restart.
+
+    The new model is loaded and run once before it replaces the old one in a
+    single assignment, so requests that already hold the old model finish on
+    it and later ones use the new one. The on_model_change hooks run after
+    the swap to flush cached results. Returns the version now served.
+    """
+    global _loaded, _active_version, _loaded_file, _generation
+    with _reload_lock:
+        version = version or MODEL_REGISTRY.active_version()
+        if version is None or version == _active_version:
+            return _active_version
+        start = time.perf_counter()
+        model, compiled = _load_version(version)
+        _predict_once(model, compiled)
+        with _lock:
+            _loaded = (model, compiled)
+            _active_version = version
+            _loaded_file = None
+            # After _loaded, so a reader that sees the new generation sees the new model
+            _generation += 1
+        for hook in list(_reload_hooks):
+            hook()
+    print(f"✅ Model version {version} swapped in after {time.perf_counter() - start:.2f}s")
+    return version
+
+def watch_registry(interval=None):
+    """Start the thread that follows the registry's ACTIVE version (once per process)."""
+    global _watcher, _watcher_pid
+    interval = MODEL_WATCH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return
+    if _watcher is not None and _watcher.is_alive() and _watcher_pid == os.getpid():
+        return
+    with _lock:
+        if _watcher is not None and _watcher.is_alive() and _watcher_pid == os.getpid():
+            return
+        _watcher_pid = os.getpid()
+        _watcher = threading.Thread(target=_watch, args=(interval,), name="model-registry-watcher", daemon=True)
+        _watcher.start()
+
+def _watch(interval):
+    while not _watcher_stop.wait(interval):
+        try:
+            # Nothing loaded yet: first use picks up the active version anyway
+            if _loaded is not None:
+                version = MODEL_REGISTRY.active_version()
+                if version is not None and version != _active_version:
+                    reload_model(version)
+        except Exception as e:
+            print("MODEL RELOAD ERROR:", e)
+
+def warm_up():
+    """Load the model and run one prediction so the first request doesn't pay for it.
+
+    Returns the time taken in seconds.
+    """
+    from app.logic import suggest_budget
+
+    start = time.perf_counter()
+    get_loaded_model()
+    suggest_budget(*WARM_UP_ROW)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Model warmed up in {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,204 @@
+"""Odds conversion and slip pricing.
+
+Everything works on NumPy arrays so whole books of legs or slips are handled
+in one call. Decimal (European) odds are the internal representation:
+american +150 is 2.50, -200 is 1.50; fractional odds are stored as their
+value, so 5/2 is 2.5 and converts to decimal 3.50.
+
+Money and odds written to DECIMAL(x,2) columns go through ``round_half_up``
+or ``to_decimal_places``, which round half away from zero like MySQL does
+rather than NumPy's round-half-to-even.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+
+import numpy as np
+
+AMERICAN = "american"
+DECIMAL = "decimal"
+FRACTIONAL = "fractional"
+FORMATS = (AMERICAN, DECIMAL, FRACTIONAL)
+
+# Float noise below this many decimal places is ignored when rounding, so
+# 10.01 * 2.5 (25.024999...) rounds to 25.03 like the exact product does.
+_NOISE_PLACES = 6
+
+
+def _from_american(odds):
+    with np.errstate(divide="ignore"):
+        return np.where(odds > 0, 1 + odds / 100, 1 - 100 / odds)
+
+def _check(invalid, odds):
+    if invalid.any():
+        raise ValueError(f"Invalid odds: {odds[invalid][0]}")
+
+def to_decimal(odds, formats=AMERICAN):
+    """Convert odds to decimal odds.
+
+    ``formats`` is one format name or an array with one per value.
+    Raises ValueError for odds that cannot exist in their format (american
+    between -100 and +100, decimal at or below 1, fractional at or below 0).
+    """
+    odds = np.asarray(odds, dtype=np.float64)
+    _check(~np.isfinite(odds), odds)
+
+    if isinstance(formats, str):
+        if formats == AMERICAN:
+            _check(np.abs(odds) < 100, odds)
+            return _from_american(odds)
+        if formats == FRACTIONAL:
+            _check(odds <= 0, odds)
+            return odds + 1
+        if formats == DECIMAL:
+            _check(odds <= 1, odds)
+            return odds
+        raise ValueError(f"Unknown odds format: {formats}")
+
+    formats = np.broadcast_to(np.asarray(formats), odds.shape)
+    _check(~np.isin(formats, FORMATS), formats)
+    american = formats == AMERICAN
+    fractional = formats == FRACTIONAL
+    _check((american & (np.abs(odds) < 100)) | (fractional & (odds <= 0)) |
+           ((formats == DECIMAL) & (odds <= 1)), odds)
+    return np.where(american, _from_american(odds), np.where(fractional, odds + 1, odds))
+
+def from_decimal(decimal_odds, fmt=AMERICAN):
+    """Convert decimal odds to ``fmt``. Even money (2.0) is american +100."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown odds format: {fmt}")
+    decimal_odds = np.asarray(decimal_odds, dtype=np.float64)
+    if (decimal_odds <= 1).any():
+        raise ValueError("Decimal odds must be greater than 1.")
+    if fmt == DECIMAL:
+        return decimal_odds
+    if fmt == FRACTIONAL:
+        return decimal_odds - 1
+    return np.where(decimal_odds >= 2, (decimal_odds - 1) * 100, -100 / (decimal_odds - 1))
+
+def convert(odds, from_fmt, to_fmt):
+    return from_decimal(to_decimal(odds, from_fmt), to_fmt)
+
+def to_decimal_exact(odds, fmt=AMERICAN):
+    """Scalar conversion to decimal odds in exact ``Decimal`` arithmetic.
+
+    A missing format (NULL ``odds_format``) is american, the column default.
+    Raises ValueError for the same impossible odds as ``to_decimal``.
+    """
+    fmt = fmt or AMERICAN
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown odds format: {fmt}")
+    try:
+        value = Decimal(str(odds))
+    except ArithmeticError:
+        raise ValueError(f"Invalid odds: {odds}")
+    if not value.is_finite() or (fmt == AMERICAN and abs(value) < 100) or \
+            (fmt == FRACTIONAL and value <= 0) or (fmt == DECIMAL and value <= 1):
+        raise ValueError(f"Invalid odds: {odds}")
+    if fmt == DECIMAL:
+        return value
+    if fmt == FRACTIONAL:
+        return value + 1
+    if value > 0:
+        return 1 + value / 100
+    return 1 + Decimal(100) / -value
+
+
+def implied_probability(decimal_odds):
+    """Bookmaker's implied probability (including the vig) of each price."""
+    return 1 / np.asarray(decimal_odds, dtype=np.float64)
+
+def overround(decimal_odds):
+    """Book margin per market: rows are markets, columns outcomes (NaN pads)."""
+    return np.nansum(implied_probability(np.atleast_2d(decimal_odds)), axis=1) - 1
+
+def remove_vig(decimal_odds, method="multiplicative"):
+    """Fair probabilities with the bookmaker margin removed.
+
+    ``decimal_odds`` is markets x outcomes; markets with fewer outcomes pad
+    with NaN. "multiplicative" scales each market's implied probabilities to
+    sum to 1; "power" finds k with sum(p ** k) == 1, which takes more of the
+    margin out of long shots.
+    """
+    p = implied_probability(np.atleast_2d(decimal_odds))
+    if method == "multiplicative":
+        return p / np.nansum(p, axis=1, keepdims=True)
+    if method != "power":
+        raise ValueError(f"Unknown vig removal method: {method}")
+
+    # sum(p ** k) falls as k grows; bisect on log k for every market at once
+    lo = np.full((p.shape[0], 1), -7.0)
+    hi = np.full((p.shape[0], 1), 7.0)
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        too_big = np.nansum(p ** np.exp(mid), axis=1, keepdims=True) > 1
+        lo = np.where(too_big, mid, lo)
+        hi = np.where(too_big, hi, mid)
+    return p ** np.exp((lo + hi) / 2)
+
+
+def round_half_up(values, places=2):
+    """Round half away from zero, as MySQL stores DECIMAL(x, places) values."""
+    values = np.asarray(values, dtype=np.float64)
+    scaled = np.round(values * 10 ** places, _NOISE_PLACES)
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / 10 ** places
+
+def to_decimal_places(values, places=2):
+    """``round_half_up`` as exact Decimals, ready to bind to DECIMAL columns."""
+    exponent = Decimal(1).scaleb(-places)
+    rounded = round_half_up(values, places)
+    return [Decimal(repr(float(v))).quantize(exponent, ROUND_HALF_UP) for v in np.ravel(rounded)]
+
+
+class SlipPrices(NamedTuple):
+    """Per-slip results of ``price_slips``; all arrays have one entry per slip."""
+    total_odds: np.ndarray       # decimal odds rounded for bets.total_odds
+    potential_win: np.ndarray    # stake * unrounded odds, rounded to cents
+    implied_probability: np.ndarray
+
+
+def slip_offsets(slip_lengths):
+    """Start index of each slip in the flat leg arrays."""
+    slip_lengths = np.asarray(slip_lengths, dtype=np.int64)
+    if slip_lengths.ndim != 1 or (slip_lengths < 1).any():
+        raise ValueError("Every slip needs at least one leg.")
+    offsets = np.zeros(len(slip_lengths), dtype=np.int64)
+    np.cumsum(slip_lengths[:-1], out=offsets[1:])
+    return offsets
+
+def parlay_odds(leg_decimal_odds, slip_lengths=None, offsets=None):
+    """Combined decimal odds of many slips from one flat array of leg odds.
+
+    Legs are laid out slip after slip; pass ``slip_lengths`` or precomputed
+    ``offsets`` (reuse them when re-pricing the same slips as lines move).
+    A single slip of any size is just ``slip_lengths=[n]``.
+    """
+    legs = np.asarray(leg_decimal_odds, dtype=np.float64)
+    if offsets is None:
+        offsets = slip_offsets(slip_lengths)
+        if int(np.sum(slip_lengths)) != len(legs):
+            raise ValueError("slip_lengths must add up to the number of legs.")
+    if len(legs) == 0:
+        return np.empty(0)
+    return np.multiply.reduceat(legs, offsets)
+
+def price_slips(leg_odds, slip_lengths=None, stakes=None, formats=AMERICAN, offsets=None):
+    """Price many slips in one call.
+
+    ``leg_odds`` holds every leg's odds (in ``formats``) slip after slip;
+    ``slip_lengths`` gives the number of legs in each slip. ``stakes`` is one
+    per slip (or a scalar). Returns SlipPrices.
+    """
+    combined = parlay_odds(to_decimal(leg_odds, formats), slip_lengths, offsets)
+    stakes = np.broadcast_to(np.asarray(1.0 if stakes is None else stakes, dtype=np.float64), combined.shape)
+    return SlipPrices(
+        total_odds=round_half_up(combined),
+        potential_win=round_half_up(stakes * combined),
+        implied_probability=1 / combined,
+    )
+
+def price_slip(legs, stake):
+    """Price one slip of (odds, format) legs as Decimals for bets.total_odds/potential_win."""
+    odds, formats = zip(*legs)
+    prices = price_slips(odds, [len(legs)], stake, formats=np.asarray(formats))
+    total_odds, potential_win = to_decimal_places([prices.total_odds[0], prices.potential_win[0]])
+    return total_odds, potential_win
@@ -0,0 +1,209 @@
+"""Versioned budget model artifacts and the pointer to the active one.
+
+    models/registry/
+        ACTIVE                 version workers should serve
+        000001/model.pkl       the sklearn model
+        000001/model.forest    its compiled forest, memory-mapped by workers
+                               (absent for models that aren't forests)
+        000001/meta.json       version, created_at, data_sha256, metrics
+
+A version directory is built under a temporary name and renamed into place,
+and ACTIVE is replaced atomically, so a worker never sees a half-written
+version. Workers follow ACTIVE (see ``app.model.watch_registry``) and swap
+the new model in without a restart.
+
+    python -m app.registry list
+    python -m app.registry publish models/budget_model.pkl --data data/sample_data.csv --activate
+    python -m app.registry activate 000002
+    python -m app.registry rollback
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from app.compiled import CompiledForest
+
+MODEL_REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", "models/registry"))
+ACTIVE_FILE = "ACTIVE"
+MODEL_FILE = "model.pkl"
+FOREST_FILE = "model.forest"
+META_FILE = "meta.json"
+
+
+class RegistryError(Exception):
+    """Unknown version, or a registry operation that cannot be done."""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """A directory of model versions with one marked active."""
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def versions(self):
+        """Published versions, oldest first."""
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.name.isdigit() and (p / META_FILE).exists())
+
+    def metadata(self, version):
+        try:
+            return json.loads((self._dir(version) / META_FILE).read_text())
+        except FileNotFoundError:
+            raise RegistryError(f"Unknown model version: {version}")
+
+    def active_version(self):
+        try:
+            return (self.root / ACTIVE_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, model, data_sha256=None, metrics=None, activate=False, **extra):
+        """Store a fitted model as a new version; returns the version.
+
+        ``model`` is a fitted sklearn model or the path of a pickled one.
+        """
+        import joblib
+
+        if isinstance(model, (str, Path)):
+            model = joblib.load(model)
+        try:
+            compiled = CompiledForest.from_sklearn(model)
+        except (TypeError, AttributeError):
+            compiled = None  # not a forest (e.g. histogram boosting): served through sklearn
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir()
+        try:
+            joblib.dump(model, staging / MODEL_FILE)
+            if compiled is not None:
+                compiled.save(staging / FOREST_FILE)
+            meta = {
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "data_sha256": data_sha256,
+                "metrics": metrics or {},
+                "model_sha256": file_sha256(staging / MODEL_FILE),
+                "forest_bytes": compiled.nbytes if compiled is not None else None,
+                **extra,
+            }
+            # Another publisher may take a number first; move on to the next one
+            for _ in range(100):
+                version = f"{int((self.versions() or ['0'])[-1]) + 1:06d}"
+                (staging / META_FILE).write_text(json.dumps({"version": version, **meta}, indent=2))
+                try:
+                    staging.rename(self.root / version)
+                    break
+                except OSError:
+                    continue
+            else:
+                raise RegistryError("Could not allocate a version number.")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point ACTIVE at ``version``; watching workers swap to it."""
+        self.metadata(version)
+        tmp = self.root / f"{ACTIVE_FILE}.tmp{os.getpid()}"
+        tmp.write_text(version + "\n")
+        os.replace(tmp, self.root / ACTIVE_FILE)
+
+    def rollback(self):
+        """Activate the version published before the active one; returns it."""
+        versions = self.versions()
+        active = self.active_version()
+        older = [v for v in versions if active is None or v < active]
+        if not older or active is None:
+            raise RegistryError("No earlier version to roll back to.")
+        self.activate(older[-1])
+        return older[-1]
+
+    def load(self, version, verify=True):
+        """The version's compiled forest, memory-mapped (None if it has none), and its metadata."""
+        meta = self.metadata(version)
+        path = self._dir(version) / FOREST_FILE
+        if not path.exists():
+            return None, meta
+        forest, _ = CompiledForest.load(path, verify=verify)
+        return forest, meta
+
+    def load_sklearn(self, version):
+        import joblib
+
+        self.metadata(version)
+        return joblib.load(self._dir(version) / MODEL_FILE)
+
+    def prune(self, keep=5):
+        """Delete all but the newest ``keep`` versions, never the active one. Returns those removed."""
+        active = self.active_version()
+        versions = self.versions()
+        removed = [v for v in versions[:max(0, len(versions) - keep)] if v != active]
+        for version in removed:
+            shutil.rmtree(self._dir(version), ignore_errors=True)
+        return removed
+
+    def _dir(self, version):
+        if not str(version).isdigit():
+            raise RegistryError(f"Unknown model version: {version}")
+        return self.root / str(version)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=str(MODEL_REGISTRY_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    publish = sub.add_parser("publish")
+    publish.add_argument("model", help="pickled sklearn model")
+    publish.add_argument("--data", help="training data file, hashed into the metadata")
+    publish.add_argument("--activate", action="store_true")
+    activate = sub.add_parser("activate")
+    activate.add_argument("version")
+    sub.add_parser("rollback")
+    prune = sub.add_parser("prune")
+    prune.add_argument("--keep", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "list":
+            active = registry.active_version()
+            for version in registry.versions():
+                meta = registry.metadata(version)
+                marker = "*" if version == active else " "
+                print(f"{marker} {version}  {meta['created_at']}  {json.dumps(meta.get('metrics', {}))}")
+        elif args.command == "publish":
+            data_sha256 = file_sha256(args.data) if args.data else None
+            print(registry.publish(args.model, data_sha256=data_sha256, activate=args.activate))
+        elif args.command == "activate":
+            registry.activate(args.version)
+        elif args.command == "rollback":
+            print(registry.rollback())
+        elif args.command == "prune":
+            print(" ".join(registry.prune(args.keep)))
+    except RegistryError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Monte Carlo bankroll simulation.
+
+Each path starts from the same bankroll and places ``n_bets`` bets drawn at
+random from a menu of (win probability, decimal odds) legs, sized by a
+staking plan. The paths in a chunk advance together, one vectorized NumPy
+step per bet, so memory is O(chunk_paths) however many paths and bets are
+requested. Chunks get independent child seeds from one SeedSequence, so a
+given seed and chunk size always reproduce the same result.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from .odds import implied_probability
+from .staking import kelly_fraction
+
+SIMULATION_CHUNK_PATHS = int(os.getenv("SIMULATION_CHUNK_PATHS", "10000"))
+SIMULATION_MAX_PATHS = int(os.getenv("SIMULATION_MAX_PATHS", "100000"))
+SIMULATION_MAX_BETS = int(os.getenv("SIMULATION_MAX_BETS", "2000"))
+# A path is ruined once its bankroll falls to this fraction of the start
+RUIN_FRACTION = 0.1
+PLANS = ("flat", "fraction", "kelly")
+
+
+class StakingPlan(NamedTuple):
+    """How much to stake on each bet.
+
+    ``flat``: ``value`` currency units per bet. ``fraction``: ``value`` of the
+    current bankroll. ``kelly``: ``value`` times the full Kelly stake for the
+    bet (0.25 is quarter Kelly); negative-edge bets are skipped.
+    """
+    plan: str
+    value: float
+
+
+def _stakes(plan, bank, p, d):
+    if plan.plan == "flat":
+        return np.full_like(bank, plan.value)
+    if plan.plan == "fraction":
+        return bank * plan.value
+    return bank * plan.value * kelly_fraction(p, d)
+
+def _simulate_chunk(rng, n_paths, n_bets, initial, probabilities, decimal_odds, plan, ruin_level):
+    bank = np.full(n_paths, float(initial))
+    peak = bank.copy()
+    max_drawdown = np.zeros(n_paths)
+    alive = np.ones(n_paths, dtype=bool)
+    single = len(probabilities) == 1
+
+    for _ in range(n_bets):
+        if single:
+            p, d = probabilities[0], decimal_odds[0]
+        else:
+            leg = rng.integers(len(probabilities), size=n_paths)
+            p, d = probabilities[leg], decimal_odds[leg]
+        stake = np.minimum(_stakes(plan, bank, p, d), bank)
+        stake[~alive] = 0
+        won = rng.random(n_paths) < p
+        bank += np.where(won, stake * (d - 1), -stake)
+
+        np.maximum(peak, bank, out=peak)
+        np.maximum(max_drawdown, 1 - bank / peak, out=max_drawdown)
+        alive &= bank > ruin_level
+    return bank, max_drawdown, ~alive
+
+def _summary(values, percentiles):
+    points = np.percentile(values, percentiles)
+    return {"mean": round(float(values.mean()), 4),
+            **{f"p{q}": round(float(v), 4) for q, v in zip(percentiles, points)}}
+
+def leg_probabilities(decimal_odds, edge=0.0):
+    """Win probabilities for legs known only by their price.
+
+    A single price can't be de-vigged, so this is the break-even probability
+    scaled by ``1 + edge`` (0.03 models a 3% edge over the book).
+    """
+    return np.clip(implied_probability(decimal_odds) * (1 + edge), 1e-6, 1 - 1e-6)
+
+def simulate_bankroll(initial, probabilities, decimal_odds, plan, n_bets=100, n_paths=20_000,
+                      seed=None, ruin_fraction=RUIN_FRACTION, chunk_paths=SIMULATION_CHUNK_PATHS):
+    """Simulate ``n_paths`` bankrolls over ``n_bets`` bets.
+
+    ``probabilities`` and ``decimal_odds`` describe the legs bets are drawn
+    from. Returns risk of ruin, the distribution of final bankrolls and of
+    each path's maximum drawdown (as a fraction of its running peak), and the
+    expected and median growth over the horizon.
+    """
+    probabilities = np.atleast_1d(np.asarray(probabilities, dtype=np.float64))
+    decimal_odds = np.atleast_1d(np.asarray(decimal_odds, dtype=np.float64))
+    if probabilities.shape != decimal_odds.shape or probabilities.size == 0:
+        raise ValueError("Need one probability per leg.")
+    if ((probabilities <= 0) | (probabilities >= 1)).any():
+        raise ValueError("Probabilities must be between 0 and 1.")
+    if (decimal_odds <= 1).any():
+        raise ValueError("Decimal odds must be greater than 1.")
+    if plan.plan not in PLANS or plan.value < 0:
+        raise ValueError(f"Staking plan must be one of {', '.join(PLANS)} with a non-negative value.")
+    if initial <= 0 or n_bets < 1 or n_paths < 1:
+        raise ValueError("Bankroll, bets and paths must be positive.")
+
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    finals, drawdowns, ruined = [], [], []
+    for size, child in zip(sizes, seeds):
+        final, drawdown, ruin = _simulate_chunk(np.random.default_rng(child), size, n_bets, initial,
+                                                probabilities, decimal_odds, plan, initial * ruin_fraction)
+        finals.append(final)
+        drawdowns.append(drawdown)
+        ruined.append(ruin)
+    final = np.concatenate(finals)
+    drawdown = np.concatenate(drawdowns)
+
+    return {
+        "paths": n_paths,
+        "bets": n_bets,
+        "initial": float(initial),
+        "risk_of_ruin": round(float(np.concatenate(ruined).mean()), 4),
+        "probability_of_profit": round(float((final > initial).mean()), 4),
+        "expected_growth": round(float(final.mean() / initial - 1), 4),
+        "median_growth": round(float(np.median(final) / initial - 1), 4),
+        "final_bankroll": _summary(final, (5, 25, 50, 75, 95)),
+        "max_drawdown": _summary(drawdown, (50, 90, 95, 99)),
+    }
@@ -0,0 +1,162 @@
+"""Kelly stake sizing for recommendations.
+
+``confidence_score`` (0-100) is read as the model's win probability for a
+leg. Single bets are sized with fractional Kelly. Bets placed together on
+one bankroll are sized jointly by ``simultaneous_kelly``: it maximises the
+expected log growth over the slip's joint outcomes. These are enumerated
+exactly for a few independent legs and sampled through a Gaussian copula
+when legs are correlated (e.g. legs on the same game) or too many to
+enumerate.
+
+``size_stakes`` sizes a whole batch in one vectorized call and applies the
+caps: a maximum fraction per bet, a maximum for the slip, and the user's
+betting budget category.
+"""
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from .odds import to_decimal
+
+KELLY_FRACTION = float(os.getenv("KELLY_FRACTION", "0.25"))
+MAX_BET_FRACTION = float(os.getenv("MAX_BET_FRACTION", "0.05"))
+MAX_SLIP_FRACTION = float(os.getenv("MAX_SLIP_FRACTION", "0.2"))
+SAME_GAME_CORRELATION = float(os.getenv("SAME_GAME_CORRELATION", "0.3"))
+# First of these budget categories the user has is their betting budget
+STAKING_BUDGET_CATEGORIES = os.getenv("STAKING_BUDGET_CATEGORIES", "betting,entertainment").split(",")
+
+EXACT_LEGS = 12
+SCENARIOS = 20_000
+
+
+def confidence_probability(confidence_score):
+    """Win probability from a 0-100 confidence score."""
+    return np.clip(np.asarray(confidence_score, dtype=np.float64) / 100, 0, 1)
+
+def kelly_fraction(probability, decimal_odds):
+    """Full Kelly fraction of bankroll, 0 where the bet has no edge."""
+    b = np.asarray(decimal_odds, dtype=np.float64) - 1
+    p = np.asarray(probability, dtype=np.float64)
+    return np.clip((b * p - (1 - p)) / b, 0, 1)
+
+def fractional_kelly(probability, decimal_odds, fraction=KELLY_FRACTION, max_fraction=MAX_BET_FRACTION):
+    """``fraction`` of the Kelly stake for each bet on its own, capped at ``max_fraction``."""
+    return np.minimum(kelly_fraction(probability, decimal_odds) * fraction, max_fraction)
+
+
+def same_game_correlation(game_ids, rho=SAME_GAME_CORRELATION):
+    """Correlation matrix with ``rho`` between legs on the same game, 0 otherwise."""
+    game_ids = np.asarray(game_ids)
+    corr = np.where(game_ids[:, None] == game_ids[None, :], rho, 0.0)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+def _outcomes(p, correlation, n_scenarios, seed):
+    # Joint win/loss scenarios (n x k booleans) and their weights
+    k = len(p)
+    independent = correlation is None or np.allclose(correlation, np.eye(k))
+    if independent and k <= EXACT_LEGS:
+        wins = ((np.arange(2 ** k)[:, None] >> np.arange(k)) & 1).astype(bool)
+        weights = np.where(wins, p, 1 - p).prod(axis=1)
+        return wins, weights
+    rng = np.random.default_rng(seed)
+    if independent:
+        wins = rng.random((n_scenarios, k)) < p
+    else:
+        # Gaussian copula: leg i wins when its latent normal is below the p_i quantile
+        chol = np.linalg.cholesky(np.asarray(correlation, dtype=np.float64) + 1e-9 * np.eye(k))
+        latent = rng.standard_normal((n_scenarios, k)) @ chol.T
+        thresholds = np.array([NormalDist().inv_cdf(q) for q in np.clip(p, 1e-9, 1 - 1e-9)])
+        wins = latent < thresholds
+    return wins, np.full(n_scenarios, 1 / n_scenarios)
+
+def _project(f, total):
+    # Closest point with f >= 0 and sum(f) <= total
+    f = np.maximum(f, 0)
+    if f.sum() <= total:
+        return f
+    # Euclidean projection onto the scaled simplex
+    u = np.sort(f)[::-1]
+    css = np.cumsum(u) - total
+    rho = np.nonzero(u - css / np.arange(1, len(u) + 1) > 0)[0][-1]
+    return np.maximum(f - css[rho] / (rho + 1), 0)
+
+def simultaneous_kelly(probability, decimal_odds, correlation=None, fraction=KELLY_FRACTION,
+                       max_total=MAX_SLIP_FRACTION, n_scenarios=SCENARIOS, seed=0, iterations=200):
+    """Bankroll fractions for bets placed at the same time.
+
+    Maximises E[log(1 + sum f_i r_i)] over the legs' joint outcomes with
+    f >= 0 and sum(f) <= ``max_total`` by projected gradient ascent, then
+    scales by ``fraction``. ``correlation`` is a k x k matrix of latent
+    correlations between legs (None for independent legs).
+    """
+    p = np.atleast_1d(np.asarray(probability, dtype=np.float64))
+    d = np.atleast_1d(np.asarray(decimal_odds, dtype=np.float64))
+    if p.shape != d.shape:
+        raise ValueError("Need one probability per leg.")
+    if p.size == 0:
+        return p
+    wins, weights = _outcomes(p, correlation, n_scenarios, seed)
+    returns = np.where(wins, d - 1, -1.0)  # per-unit profit of each leg in each scenario
+
+    def growth(f):
+        wealth = 1 + returns @ f
+        return -np.inf if (wealth <= 0).any() else weights @ np.log(wealth)
+
+    # Cap the total below 1 so no scenario can lose the whole bankroll
+    total = min(max_total / fraction if fraction > 0 else max_total, 0.99)
+    f = _project(kelly_fraction(p, d), total)
+    value, step = growth(f), 1.0
+    for _ in range(iterations):
+        gradient = returns.T @ (weights / (1 + returns @ f))
+        while step > 1e-10:
+            candidate = _project(f + step * gradient, total)
+            candidate_value = growth(candidate)
+            if candidate_value >= value:
+                break
+            step /= 2
+        else:
+            break
+        converged = np.abs(candidate - f).max() < 1e-7
+        f, value, step = candidate, candidate_value, step * 2
+        if converged:
+            break
+    return np.minimum(f * fraction, max_total)
+
+
+def budget_cap(user_data):
+    """The user's betting budget from their budget categories, or None."""
+    categories = (user_data or {}).get("categories") or {}
+    for name in STAKING_BUDGET_CATEGORIES:
+        if name in categories:
+            return max(float(categories[name]), 0.0)
+    return None
+
+def size_stakes(confidence_score, odds, balance, odds_format="american", game_ids=None, budget=None,
+                mode="simultaneous", fraction=KELLY_FRACTION, max_bet=MAX_BET_FRACTION,
+                max_slip=MAX_SLIP_FRACTION, seed=0):
+    """Stakes in currency for a batch of candidate bets, rounded down to cents.
+
+    ``mode`` "independent" sizes each bet with fractional Kelly on its own;
+    "simultaneous" sizes them jointly as one slip, correlating legs that
+    share a game id. Each stake is at most ``max_bet`` of ``balance`` and
+    the batch at most ``max_slip`` of it and ``budget``.
+    """
+    p = confidence_probability(confidence_score)
+    d = to_decimal(odds, odds_format)
+    if mode == "independent":
+        f = fractional_kelly(p, d, fraction, max_bet)
+    elif mode == "simultaneous":
+        correlation = None if game_ids is None else same_game_correlation(game_ids)
+        f = np.minimum(simultaneous_kelly(p, d, correlation, fraction, max_slip, seed=seed), max_bet)
+    else:
+        raise ValueError(f"Unknown staking mode: {mode}")
+
+    balance = max(float(balance), 0.0)
+    stakes = f * balance
+    limit = balance * max_slip if budget is None else min(balance * max_slip, budget)
+    total = stakes.sum()
+    if total > limit:
+        stakes *= limit / total
+    return np.floor(stakes * 100 + 1e-9) / 100
@@ -0,0 +1,265 @@
+"""Training pipeline for the budget model.
+
+Training data is streamed in chunks of TRAIN_CHUNK_ROWS with float32 dtypes
+declared up front, so pandas never holds the whole file. Rows are kept in a
+reservoir sized from the memory budget. Once the data outgrows it, each row
+seen so far is equally likely to be kept, so memory stays fixed however large
+the input gets. The budget bounds the training matrix; what the estimator
+itself allocates depends on its settings (e.g. --max-samples per tree). A
+held-out slice is scored after fitting.
+
+    python -m app.training data/budget_records.csv --estimator hist --n-jobs -1 --publish --activate
+    python -m app.training data/records.parquet --sample 0.1 --memory-mb 4096 --output models/budget_model.pkl
+
+Parquet needs pyarrow, which is imported only when a Parquet file is read.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from app.logic import FEATURES
+
+TARGETS = ["food_pct", "entertainment_pct", "shopping_pct"]
+COLUMNS = FEATURES + TARGETS
+
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", "100000"))
+TRAIN_MEMORY_MB = float(os.getenv("TRAIN_MEMORY_MB", "1024"))
+# Share of the memory budget for the training matrix; the rest is headroom
+# for the estimator (bootstrap indices, tree buffers, histogram bins)
+DATA_SHARE = 0.25
+ESTIMATORS = ("forest", "hist")
+
+
+def max_rows_for_budget(memory_mb, n_columns=len(COLUMNS)):
+    """Rows of float32 training data that fit in the data share of ``memory_mb``."""
+    return max(1, int(memory_mb * 2 ** 20 * DATA_SHARE / (n_columns * 4)))
+
+
+def _csv_chunks(path, chunksize):
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, usecols=COLUMNS, dtype={col: "float32" for col in COLUMNS},
+                             chunksize=chunksize):
+        yield chunk[COLUMNS].to_numpy(dtype=np.float32)
+
+def _parquet_chunks(path, chunksize):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet needs pyarrow: pip install pyarrow")
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=COLUMNS):
+        yield np.column_stack([batch.column(col).to_numpy(zero_copy_only=False).astype(np.float32)
+                               for col in COLUMNS])
+
+def iter_chunks(path, chunksize=TRAIN_CHUNK_ROWS):
+    """(rows, len(COLUMNS)) float32 arrays from a CSV or Parquet file."""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return _parquet_chunks(path, chunksize)
+    if suffix in (".csv", ".gz", ".txt"):
+        return _csv_chunks(path, chunksize)
+    raise ValueError(f"Unsupported training data format: {path}")
+
+
+class Reservoir:
+    """A uniform sample of at most ``capacity`` rows from a stream of chunks."""
+
+    def __init__(self, capacity, n_columns, seed=0):
+        self.capacity = capacity
+        self.rows = np.empty((min(capacity, TRAIN_CHUNK_ROWS), n_columns), dtype=np.float32)
+        self.size = 0
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, chunk):
+        # Fill first, growing the buffer up to capacity
+        room = self.capacity - self.size
+        if room > 0:
+            take = chunk[:room]
+            end = self.size + len(take)
+            if end > len(self.rows):
+                grown = np.empty((min(self.capacity, max(end, 2 * len(self.rows))), self.rows.shape[1]),
+                                 dtype=np.float32)
+                grown[:self.size] = self.rows[:self.size]
+                self.rows = grown
+            self.rows[self.size:end] = take
+            self.size = end
+            self.seen += len(take)
+            chunk = chunk[room:]
+        if len(chunk):
+            # Algorithm R, one draw per row: row i replaces a random slot with
+            # probability capacity / (i + 1)
+            index = np.arange(self.seen, self.seen + len(chunk))
+            slots = self._rng.integers(0, index + 1)
+            keep = slots < self.capacity
+            self.rows[slots[keep]] = chunk[keep]
+            self.seen += len(chunk)
+
+    def sample(self):
+        return self.rows[:self.size]
+
+
+def load_training_data(path, max_rows=None, memory_mb=TRAIN_MEMORY_MB, sample=None, chunksize=TRAIN_CHUNK_ROWS,
+                       seed=0):
+    """Stream ``path`` into at most ``max_rows`` rows (default: what the memory budget allows).
+
+    ``sample`` keeps that fraction of rows before the reservoir. Rows with
+    missing values are dropped. Returns (X, Y, rows_read).
+    """
+    capacity = max_rows or max_rows_for_budget(memory_mb)
+    reservoir = Reservoir(capacity, len(COLUMNS), seed)
+    rng = np.random.default_rng(seed + 1)
+    rows_read = 0
+    for chunk in iter_chunks(path, chunksize):
+        rows_read += len(chunk)
+        chunk = chunk[~np.isnan(chunk).any(axis=1)]
+        if sample is not None and sample < 1:
+            chunk = chunk[rng.random(len(chunk)) < sample]
+        reservoir.add(chunk)
+    data = reservoir.sample()
+    if not len(data):
+        raise ValueError(f"No usable training rows in {path}")
+    n = len(FEATURES)
+    return data[:, :n], data[:, n:], rows_read
+
+
+def make_estimator(kind="forest", n_jobs=-1, n_estimators=100, max_samples=None, seed=42):
+    """A multi-output regressor: a random forest (compiled for serving) or histogram boosting."""
+    if kind == "forest":
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(n_estimators=n_estimators, max_samples=max_samples, n_jobs=n_jobs,
+                                     random_state=seed)
+    if kind == "hist":
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        from sklearn.multioutput import MultiOutputRegressor
+
+        return MultiOutputRegressor(HistGradientBoostingRegressor(max_iter=n_estimators, random_state=seed),
+                                    n_jobs=n_jobs)
+    raise ValueError(f"Unknown estimator: {kind} (expected one of {', '.join(ESTIMATORS)})")
+
+
+def evaluate(model, X, Y):
+    """Held-out error per target and overall."""
+    import pandas as pd
+
+    pred = model.predict(pd.DataFrame(X, columns=FEATURES))
+    err = pred - Y
+    mae = np.abs(err).mean(axis=0)
+    rmse = np.sqrt((err ** 2).mean(axis=0))
+    ss_res = (err ** 2).sum(axis=0)
+    ss_tot = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+    r2 = np.where(ss_tot > 0, 1 - ss_res / np.where(ss_tot > 0, ss_tot, 1), 0.0)
+    return {
+        "mae": round(float(mae.mean()), 6),
+        "rmse": round(float(rmse.mean()), 6),
+        "r2": round(float(r2.mean()), 6),
+        "per_target": {t: {"mae": round(float(a), 6), "rmse": round(float(b), 6), "r2": round(float(c), 6)}
+                       for t, a, b, c in zip(TARGETS, mae, rmse, r2)},
+    }
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    # ru_maxrss is KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def train(path, estimator="forest", n_jobs=-1, n_estimators=100, max_samples=None, sample=None, max_rows=None,
+          memory_mb=TRAIN_MEMORY_MB, holdout=0.2, seed=42, chunksize=TRAIN_CHUNK_ROWS, trace_memory=False):
+    """Fit a budget model on ``path``; returns (model, report).
+
+    ``holdout`` of the loaded rows are kept back for scoring (0 fits on all).
+    The report has row counts, load and fit times, peak process RSS and
+    held-out error. ``trace_memory`` adds the peak of traced NumPy/Python
+    allocations; tracing slows the fit, so it is off by default.
+    """
+    import pandas as pd
+
+    # Leave tracing alone if the caller already started it
+    own_trace = trace_memory and not tracemalloc.is_tracing()
+    if own_trace:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    X, Y, rows_read = load_training_data(path, max_rows, memory_mb, sample, chunksize, seed)
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(X))
+    n_test = int(len(X) * holdout) if len(X) > 1 else 0
+    test, fit = order[:n_test], order[n_test:]
+
+    model = make_estimator(estimator, n_jobs, n_estimators, max_samples, seed)
+    start = time.perf_counter()
+    model.fit(pd.DataFrame(X[fit], columns=FEATURES), Y[fit])
+    fit_seconds = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if own_trace:
+        tracemalloc.stop()
+
+    report = {
+        "data": str(path),
+        "estimator": estimator,
+        "rows_read": rows_read,
+        "rows_train": int(len(fit)),
+        "rows_holdout": int(len(test)),
+        "load_seconds": round(load_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "peak_traced_mb": round(traced_peak / 2 ** 20, 1) if traced_peak is not None else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "memory_budget_mb": memory_mb,
+        "holdout": evaluate(model, X[test], Y[test]) if len(test) else None,
+    }
+    return model, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the budget model.")
+    parser.add_argument("data", help="CSV or Parquet file with the feature and target columns")
+    parser.add_argument("--estimator", choices=ESTIMATORS, default="forest")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-samples", type=float, help="bootstrap fraction per tree (forest)")
+    parser.add_argument("--sample", type=float, help="fraction of rows to read")
+    parser.add_argument("--max-rows", type=int, help="cap on rows kept (default: from --memory-mb)")
+    parser.add_argument("--memory-mb", type=float, default=TRAIN_MEMORY_MB)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace-memory", action="store_true", help="report traced allocations (slower)")
+    parser.add_argument("--output", help="write the pickled model here")
+    parser.add_argument("--publish", action="store_true", help="publish to the model registry")
+    parser.add_argument("--activate", action="store_true", help="make the published version active")
+    args = parser.parse_args(argv)
+
+    model, report = train(args.data, args.estimator, args.n_jobs, args.n_estimators, args.max_samples,
+                          args.sample, args.max_rows, args.memory_mb, args.holdout, args.seed,
+                          trace_memory=args.trace_memory)
+    if args.output:
+        import joblib
+
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(model, args.output)
+        report["output"] = args.output
+    if args.publish or args.activate:
+        from app.registry import ModelRegistry, file_sha256
+
+        report["version"] = ModelRegistry().publish(
+            model, data_sha256=file_sha256(args.data), metrics=report["holdout"] or {},
+            activate=args.activate, training=report)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
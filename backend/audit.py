@@ -0,0 +1,271 @@
+"""Asynchronous audit logging.
+
+Request handlers call ``log_event`` which only enqueues; a background thread
+writes queued events to audit_logs in multi-row INSERTs. When the queue is
+full (MySQL slow or down) or a write fails, events are appended to a local
+JSON-lines spill file instead of being dropped, and replayed into the table
+once writes succeed again. A spilled event the table rejects outright (bad
+data, a deleted user) is moved to a dead-letter file so it can't hold up the
+rest of the replay.
+
+    python audit.py replay   # load the spill file into audit_logs now
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pymysql
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "500"))
+# How long log_event may block on a full queue before spilling (0 = never block)
+AUDIT_PUT_TIMEOUT = float(os.getenv("AUDIT_PUT_TIMEOUT", "0"))
+AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH", str(Path(__file__).parent / "audit_spill.jsonl"))
+# Default: the spill path plus ".dead"
+AUDIT_DEAD_LETTER_PATH = os.getenv("AUDIT_DEAD_LETTER_PATH")
+# An event failing with one of these will fail however often it is replayed
+PERMANENT_ERRORS = (ValueError, TypeError, pymysql.err.DataError, pymysql.err.IntegrityError)
+
+COLUMNS = ("user_id", "action", "entity_type", "entity_id", "old_value", "new_value", "ip_address", "created_at")
+# created_at is a Unix time: FROM_UNIXTIME yields it in the session time zone,
+# which is the zone MySQL converts from when storing a TIMESTAMP
+_INSERT_SQL = (
+    f"INSERT INTO audit_logs ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('FROM_UNIXTIME(%s)' if col == 'created_at' else '%s' for col in COLUMNS)})"
+)
+
+
+def _unix_time(value):
+    # Older spill files hold created_at as a UTC "YYYY-MM-DD HH:MM:SS" string
+    if isinstance(value, str):
+        stamp = datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        return int(stamp.replace(tzinfo=datetime.timezone.utc).timestamp())
+    return value
+
+def write_events_to_db(events):
+    """Insert many audit events; pymysql sends them as one multi-row INSERT."""
+    from db import connection
+
+    rows = [tuple(_unix_time(event[col]) if col == "created_at" else event[col] for col in COLUMNS)
+            for event in events]
+    with connection() as conn, conn.cursor() as c:
+        c.executemany(_INSERT_SQL, rows)
+        conn.commit()
+
+
+def _json(value):
+    return None if value is None else json.dumps(value, default=str)
+
+
+class AuditLogger:
+    """Bounded in-memory queue of audit events with a write-behind flusher.
+
+    Events are flushed every ``flush_interval`` seconds, or sooner once
+    ``flush_batch`` are queued.
+    """
+
+    def __init__(self, write_many=write_events_to_db, maxsize=AUDIT_QUEUE_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, flush_batch=AUDIT_FLUSH_BATCH,
+                 put_timeout=AUDIT_PUT_TIMEOUT, spill_path=AUDIT_SPILL_PATH,
+                 dead_letter_path=AUDIT_DEAD_LETTER_PATH):
+        self._write_many = write_many
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path or f"{spill_path}.dead"
+
+        self._queue = queue.Queue(maxsize)
+        self._flush_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._counts = {"written": 0, "spilled": 0, "replayed": 0, "dead_lettered": 0, "write_errors": 0}
+
+    def log(self, action, user_id=None, entity_type=None, entity_id=None,
+            old_value=None, new_value=None, ip_address=None):
+        """Queue one event. Never touches the database on the caller's thread."""
+        event = {
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "old_value": _json(old_value),
+            "new_value": _json(new_value),
+            "ip_address": ip_address,
+            # Stamped now, not when the flusher gets to it
+            "created_at": int(time.time()),
+        }
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self._spill([event])
+            self._wake.set()
+            return
+        self._ensure_flusher()
+        if self._queue.qsize() >= self.flush_batch:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued now. Returns the number of events written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.flush_batch)
+                if not batch:
+                    break
+                try:
+                    self._write_many(batch)
+                except Exception as e:
+                    print("AUDIT FLUSH ERROR:", e)
+                    self._counts["write_errors"] += 1
+                    self._spill(batch)
+                    self._spill(self._drain(None))
+                    break
+                written += len(batch)
+            self._counts["written"] += written
+            if written and os.path.exists(self.spill_path):
+                self.replay_spill()
+        return written
+
+    def replay_spill(self):
+        """Write spilled events back into the table. Returns how many were replayed."""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return 0
+            # Each replayer takes the file under its own name; workers sharing
+            # the spill file must not rename over each other's replay
+            replaying = f"{self.spill_path}.replaying-{os.getpid()}-{threading.get_ident()}"
+            try:
+                os.replace(self.spill_path, replaying)
+            except FileNotFoundError:  # another process took it first
+                return 0
+        with open(replaying, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+
+        replayed, done = 0, 0
+        try:
+            for start in range(0, len(events), self.flush_batch):
+                batch = events[start:start + self.flush_batch]
+                try:
+                    self._write_many(batch)
+                    replayed += len(batch)
+                    done += len(batch)
+                    continue
+                except PERMANENT_ERRORS as e:
+                    print("AUDIT REPLAY ERROR:", e)
+                # Some event is bad; write them one at a time to find it
+                for event in batch:
+                    try:
+                        self._write_many([event])
+                        replayed += 1
+                    except PERMANENT_ERRORS as e:
+                        print(f"AUDIT EVENT DEAD-LETTERED ({event.get('action')}):", e)
+                        self._dead_letter(event)
+                    done += 1
+        except Exception as e:
+            print("AUDIT REPLAY ERROR:", e)
+            self._spill(events[done:], count=False)
+        finally:
+            os.remove(replaying)
+        self._counts["replayed"] += replayed
+        return replayed
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), **self._counts}
+
+    def _drain(self, limit):
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _spill(self, events, count=True):
+        if not events:
+            return
+        with self._spill_lock:
+            _append_events(self.spill_path, events)
+            if count:
+                self._counts["spilled"] += len(events)
+
+    def _dead_letter(self, event):
+        with self._spill_lock:
+            _append_events(self.dead_letter_path, [event])
+            self._counts["dead_lettered"] += 1
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def _append_events(path, events):
+    with open(path, "a", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_audit_logger():
+    """Return the process-wide AuditLogger, creating it on first use."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = AuditLogger()
+                atexit.register(_logger.close)
+    return _logger
+
+def log_event(action, **fields):
+    """Shortcut for ``get_audit_logger().log(...)``."""
+    get_audit_logger().log(action, **fields)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ["replay"]:
+        print("usage: python audit.py replay")
+        return 2
+    replayed = AuditLogger().replay_spill()
+    print(f"✅ Replayed {replayed} audit events")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Throughput of the chat intent router against the previous parser.
+
+Replays a recorded corpus of chat messages through both the old substring-scan
+handle_input and the current one, and prints messages/second for each.
+
+    python -m benchmarks.bench_intents [--repeat N]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from chat import calculate_remaining_budget, default_user_data, handle_input
+from intents import default_router, parse_intent
+
+CORPUS_PATH = Path(__file__).parent / "data" / "chat_messages.txt"
+
+
+def load_corpus(path=CORPUS_PATH):
+    return [line.rstrip("\n") for line in path.read_text().splitlines() if line.strip()]
+
+
+def legacy_handle_input(user_input, user_data):
+    """The substring-scanning handle_input that IntentRouter replaced."""
+    text = user_input.lower().strip()
+
+    #Greet user
+    if text in ["hi", "hello", "hey"]:
+        return ("Hey there! I'm your AI Financial Assistant.<br>"
+                "You can ask me to:<br>"
+                "- Update your income or expenses<br>"
+                "- Add to food, bills, or entertainment<br>"
+                "- Type 'help' for a list of all commands!")
+
+    if "help" in text:
+        return ("Here's what you can say:<br>"
+                "- 'Show my budget'<br>"
+                "- 'Add 200 to food'<br>"
+                "- 'Update entertainment to 400'<br>"
+                "- 'Set income to 5000'<br>"
+                "- 'Update savings to 300'<br>"
+                "- 'Reset data'")
+
+    # reset data
+    if "reset" in text:
+        user_data.update(default_user_data())
+        return "All data reset to default values."
+
+    # update income
+    if "income" in text:
+        try:
+            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
+            if any(word in text for word in ["update", "set", "change", "make"]):
+                user_data["income"] = amount
+                return f"Income updated to ${amount:,.2f}."
+            else:
+                user_data["income"] += amount
+                return f"Added ${amount:,.2f} to income. Total: ${user_data['income']:,.2f}."
+        except:
+            return "Couldn't process income update."
+
+    # update expenses
+    if "expense" in text or "expenses" in text:
+        try:
+            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
+            if any(word in text for word in ["update", "set", "change"]):
+                user_data["expenses"] = amount
+                return f"Expenses updated to ${amount:,.2f}."
+            else:
+                user_data["expenses"] += amount
+                return f"Added ${amount:,.2f} to expenses. Total: ${user_data['expenses']:,.2f}."
+        except:
+            return "Couldn't process expenses update."
+
+    # update the savings
+    if "saving" in text or "savings" in text:
+        try:
+            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
+            if any(word in text for word in ["update", "set", "change"]):
+                user_data["savings"] = amount
+                return f"Savings updated to ${amount:,.2f}."
+            else:
+                user_data["savings"] += amount
+                return f"Added ${amount:,.2f} to savings. Total: ${user_data['savings']:,.2f}."
+        except:
+            return "Couldn't process savings update."
+
+    # update categories
+    for category in user_data["categories"]:
+        if category in text:
+            try:
+                amount = float("".join([c for c in text if c.isdigit() or c == "."]))
+                if any(word in text for word in ["update", "set", "change", "make"]):
+                    user_data["categories"][category] = amount
+                    return f"{category.capitalize()} updated to ${amount:,.2f}."
+                else:
+                    user_data["categories"][category] += amount
+                    return f"Added ${amount:,.2f} to {category}. Total: ${user_data['categories'][category]:,.2f}."
+            except:
+                return f"Please specify a valid amount for {category}."
+
+    # show user budget
+    if "budget" in text or "show" in text:
+        remaining = calculate_remaining_budget(user_data)
+        category_breakdown = "<br>".join([f"- {k.capitalize()}: ${v:,.2f}" for k, v in user_data["categories"].items()])
+        return (f"Here's your budget breakdown:<br><br>"
+                f"<b>Income:</b> ${user_data['income']:,.2f}<br>"
+                f"<b>Expenses:</b> ${user_data['expenses']:,.2f}<br>"
+                f"<b>Savings:</b> ${user_data['savings']:,.2f}<br><br>"
+                f"{category_breakdown}<br><br>"
+                f"<b>Remaining:</b> ${remaining:,.2f}")
+
+    # default
+    remaining = calculate_remaining_budget(user_data)
+    return (f"Here's your quick financial summary:<br><br>"
+            f"- Income: ${user_data['income']:,.2f}<br>"
+            f"- Expenses: ${user_data['expenses']:,.2f}<br>"
+            f"- Savings: ${user_data['savings']:,.2f}<br>"
+            f"- Remaining budget: ${remaining:,.2f}<br><br>"
+            "Need help? Type <b>help</b> to see what else I can do.")
+
+
+def _throughput(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    elapsed = time.perf_counter() - start
+    return repeat * len(messages) / elapsed
+
+
+def run(repeat=2000):
+    messages = load_corpus()
+    legacy_state = default_user_data()
+    state = default_user_data()
+
+    results = {
+        "legacy handle_input": _throughput(lambda m: legacy_handle_input(m, legacy_state), messages, repeat),
+        "handle_input": _throughput(lambda m: handle_input(m, state), messages, repeat),
+        "router.parse uncached": _throughput(default_router.parse, messages, repeat),
+        "parse_intent cached": _throughput(parse_intent, messages, repeat),
+    }
+
+    print(f"{len(messages)} messages x {repeat} repeats")
+    for name, rate in results.items():
+        print(f"{name:>22}: {rate:>12,.0f} msg/s  ({1e6 / rate:6.2f} us/msg)")
+    print(f"{'speedup':>22}: {results['handle_input'] / results['legacy handle_input']:.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    run(parser.parse_args().repeat)
@@ -0,0 +1,141 @@
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+
+class Case:
+    """One benchmark: ``fn`` is called repeatedly; ``setup`` runs once before.
+
+    ``batch`` is the number of logical operations one call performs, so a call
+    that scores 1,000 rows reports throughput in rows/second.
+    """
+
+    def __init__(self, name, fn, setup=None, iterations=None, batch=1):
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+        self.iterations = iterations
+        self.batch = batch
+
+
+class Skip(Exception):
+    """Raised from a case's setup when it cannot run in this environment."""
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(case, iterations=1000, warmup=None, memory_iterations=None):
+    """Run a case and return its latency, throughput and peak-memory numbers."""
+    if case.setup is not None:
+        case.setup()
+    n = case.iterations or iterations
+    warmup = min(n, 50) if warmup is None else warmup
+    fn = case.fn
+    for _ in range(warmup):
+        fn()
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    timings = []
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            t0 = time.perf_counter_ns()
+            fn()
+            timings.append(time.perf_counter_ns() - t0)
+        total_ns = time.perf_counter_ns() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Peak memory is measured in a separate, shorter run: tracemalloc is slow
+    # and would distort the timings above.
+    mem_n = memory_iterations or max(1, min(n, 100))
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        for _ in range(mem_n):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    us = 1e-3
+    return {
+        "iterations": n,
+        "batch": case.batch,
+        "p50_us": round(_percentile(timings, 0.50) * us, 3),
+        "p99_us": round(_percentile(timings, 0.99) * us, 3),
+        "mean_us": round(sum(timings) / n * us, 3),
+        "max_us": round(timings[-1] * us, 3),
+        "throughput_per_s": round(n * case.batch / (total_ns / 1e9), 1),
+        "peak_memory_kb": round(max(0, peak - base) / 1024, 1),
+    }
+
+
+def run_cases(cases, iterations=1000, only=None, log=print):
+    results = {}
+    for case in cases:
+        if only and not any(pattern in case.name for pattern in only):
+            continue
+        try:
+            results[case.name] = measure(case, iterations=iterations)
+        except Skip as e:
+            results[case.name] = {"skipped": str(e)}
+            log(f"{case.name:<34} skipped: {e}")
+            continue
+        r = results[case.name]
+        log(f"{case.name:<34} p50 {r['p50_us']:>10.1f}us  p99 {r['p99_us']:>10.1f}us  "
+            f"{r['throughput_per_s']:>12,.0f}/s  peak {r['peak_memory_kb']:>8.1f}KB")
+    return results
+
+
+def report(results):
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "cases": results,
+    }
+
+
+def save(data, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def load(path):
+    return json.loads(path.read_text())
+
+
+def compare(current, baseline, threshold=0.2):
+    """List regressions of ``current`` against ``baseline`` (both report() dicts).
+
+    A case regresses when its p50 or p99 latency grows, or its throughput
+    drops, by more than ``threshold`` (0.2 = 20%).
+    """
+    regressions = []
+    base_cases = baseline.get("cases", {})
+    for name, cur in current.get("cases", {}).items():
+        base = base_cases.get(name)
+        if not base or "skipped" in base or "skipped" in cur:
+            continue
+        for metric in ("p50_us", "p99_us"):
+            if base[metric] > 0 and cur[metric] > base[metric] * (1 + threshold):
+                regressions.append((name, metric, base[metric], cur[metric]))
+        if cur["throughput_per_s"] < base["throughput_per_s"] * (1 - threshold):
+            regressions.append((name, "throughput_per_s", base["throughput_per_s"], cur["throughput_per_s"]))
+    return regressions
@@ -0,0 +1,221 @@
+"""Benchmarks for the backend hot paths.
+
+Reports p50/p99 latency, throughput and peak memory per case, saves the
+results as JSON and compares them against a stored baseline.
+
+    python -m benchmarks.run                       # run everything
+    python -m benchmarks.run --only budget chat    # cases whose name contains a pattern
+    python -m benchmarks.run --save-baseline       # store this run as the baseline
+    python -m benchmarks.run --fail-on-regression  # exit 1 if slower than baseline (or none saved)
+
+Run from the backend directory. Route cases are reported as skipped if
+main.py cannot be imported. Timings depend on the machine, so no baseline is
+committed: save one on the machine that runs the comparison (e.g. from the
+main branch in CI) before checking for regressions.
+"""
+import argparse
+import datetime
+import itertools
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import harness
+from benchmarks.bench_intents import load_corpus
+from benchmarks.harness import Case, Skip
+
+RESULTS_DIR = Path(__file__).parent / "results"
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+JWT_SECRET = "benchmark-secret-at-least-32-bytes-long"
+
+
+def _scenarios(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform([2500, 500, 0, 1], [15000, 4000, 20000, 36], size=(n, 4))
+    rows[:, 3] = np.ceil(rows[:, 3])
+    return rows
+
+
+def budget_cases():
+    from app import logic
+    from app.model import warm_up
+
+    distinct = itertools.cycle(_scenarios(100_000).tolist())
+    repeated = [4000, 1500, 2400, 6]
+    batch = _scenarios(1000, seed=1)
+
+    def uncached():
+        logic.clear_budget_cache()
+        logic.suggest_budget(*next(distinct))
+
+    return [
+        Case("suggest_budget uncached", uncached, setup=warm_up),
+        Case("suggest_budget cached", lambda: logic.suggest_budget(*repeated), setup=warm_up),
+        Case("suggest_budgets_batch x1000", lambda: logic.suggest_budgets_batch(batch),
+             setup=warm_up, iterations=100, batch=len(batch)),
+    ]
+
+
+def odds_cases():
+    from app.odds import price_slips, slip_offsets
+    from app.simulate import StakingPlan, simulate_bankroll
+
+    rng = np.random.default_rng(3)
+    lengths = rng.integers(1, 8, size=10_000)
+    legs = rng.choice([-300, -150, -110, 100, 120, 250, 600], size=lengths.sum()).astype(float)
+    stakes = rng.integers(100, 50_000, size=len(lengths)) / 100
+    offsets = slip_offsets(lengths)
+    return [
+        Case("price_slips x10000", lambda: price_slips(legs, stakes=stakes, offsets=offsets),
+             iterations=200, batch=len(lengths)),
+        Case("simulate_bankroll 20000x100",
+             lambda: simulate_bankroll(1000, [0.55, 0.5, 0.35], [1.91, 2.1, 3.0], StakingPlan("kelly", 0.25),
+                                       n_bets=100, n_paths=20_000, seed=1),
+             iterations=10),
+    ]
+
+
+def recommendation_cases():
+    from decimal import Decimal
+    from recommendations import RecommendationFeed
+
+    game_date = datetime.datetime.now() + datetime.timedelta(days=30)
+    rows = [{"id": i, "user_id": 1, "sport_id": 1, "game_id": i, "confidence_score": Decimal(i % 97),
+             "game_date": game_date} for i in range(50)]
+    feed = RecommendationFeed(load=lambda user_id, sport_id, limit, now: rows[:limit])
+    return [Case("recommendation feed top 10", lambda: feed.top(1, 1, 10), iterations=20_000)]
+
+
+def chat_cases():
+    from chat import default_user_data, handle_input
+
+    messages = itertools.cycle(load_corpus())
+    state = default_user_data()
+    return [Case("handle_input", lambda: handle_input(next(messages), state), iterations=20_000)]
+
+
+def token_cases():
+    import jwt
+    from token_cache import TokenCache
+
+    def encode():
+        return jwt.encode({
+            "email": "bench@example.com",
+            "user_id": 1,
+            "type": "access",
+            "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=60),
+        }, JWT_SECRET, algorithm="HS256")
+
+    def verify(token):
+        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+
+    token = encode()
+    cache = TokenCache()
+    return [
+        Case("create_access_token", encode, iterations=5000),
+        Case("decode_token uncached", lambda: verify(token), iterations=5000),
+        Case("decode_token cached", lambda: cache.verify(token, verify), iterations=20_000),
+    ]
+
+
+def bcrypt_cases():
+    from hashing import PasswordHasher, BCRYPT_ROUNDS
+
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    state = {}
+
+    def setup():
+        state["hash"] = hasher.hash_password("benchmark-password")
+
+    return [
+        Case(f"bcrypt login (rounds={BCRYPT_ROUNDS})",
+             lambda: hasher.check_password("benchmark-password", state["hash"]), setup=setup, iterations=10),
+    ]
+
+
+def route_cases():
+    state = {}
+
+    def client():
+        if "skip" in state:
+            raise Skip(state["skip"])
+        if "client" not in state:
+            try:
+                import main
+            except Exception as e:
+                state["skip"] = f"main.py not importable ({type(e).__name__}: {e})"
+                raise Skip(state["skip"])
+            from audit import AuditLogger
+            from budget_state import BudgetStateStore
+
+            # Keep /chat off the database so the route itself is measured
+            main.get_budget_store = lambda store=BudgetStateStore(
+                load=lambda user_id: None, save_many=lambda states: None
+            ): store
+            main.log_event = AuditLogger(write_many=lambda events: None).log
+
+            test_client = main.app.test_client()
+            token = main.create_access_token({"email": "bench@example.com", "user_id": 1})
+            test_client.set_cookie("token", token)
+            state["client"] = test_client
+        return state["client"]
+
+    rows = _scenarios(100, seed=2).tolist()
+    return [
+        Case("GET /validate", lambda: state["client"].get("/validate"), setup=client, iterations=2000),
+        Case("POST /chat", lambda: state["client"].post("/chat", json={"message": "add 20 to food"}),
+             setup=client, iterations=2000),
+        Case("POST /budget/batch x100", lambda: state["client"].post("/budget/batch", json={"rows": rows}),
+             setup=client, iterations=200, batch=len(rows)),
+    ]
+
+
+def all_cases():
+    return budget_cases() + odds_cases() + recommendation_cases() + chat_cases() + token_cases() + bcrypt_cases() + route_cases()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend hot-path benchmarks.")
+    parser.add_argument("--only", nargs="*", help="run cases whose name contains any of these")
+    parser.add_argument("--iterations", type=int, default=1000, help="default iterations per case")
+    parser.add_argument("--output", type=Path, help="results JSON path (default: results/<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Checked up front: a gate with nothing to compare against must not pass quietly
+    if args.fail_on_regression and not args.save_baseline and not args.baseline.exists():
+        print(f"❌ No baseline at {args.baseline}; run with --save-baseline first.")
+        return 1
+
+    data = harness.report(harness.run_cases(all_cases(), iterations=args.iterations, only=args.only))
+
+    output = args.output or RESULTS_DIR / f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    harness.save(data, output)
+    print(f"\nResults saved to {output}")
+
+    if args.save_baseline:
+        harness.save(data, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline to compare against (use --save-baseline).")
+        return 0
+
+    regressions = harness.compare(data, harness.load(args.baseline), args.threshold)
+    if not regressions:
+        print(f"No regressions against {args.baseline}.")
+        return 0
+
+    print(f"\n⚠️ {len(regressions)} regression(s) against {args.baseline}:")
+    for name, metric, before, after in regressions:
+        print(f"  {name}: {metric} {before:,.1f} -> {after:,.1f}")
+    return 1 if args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
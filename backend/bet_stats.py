@@ -0,0 +1,304 @@
+"""Incrementally maintained per-user betting statistics.
+
+Each settled bet updates the user's bet_statistics row in O(1): counters and
+running sums live in bet_statistics itself, and the extra state needed to keep
+averages and streaks exact (current streak, odds sum/count) lives in
+bet_statistics_state. Only top-level bets count (parlay components, rows with
+a parlay_id, settle into their parent).
+
+    python bet_stats.py backfill           # rebuild everything from bets
+    python bet_stats.py check [--sample N] # compare stored stats to a full recompute
+"""
+import argparse
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+
+import pymysql
+
+SETTLED_STATUSES = ("won", "lost", "cancelled", "push")
+CENTS = Decimal("0.01")
+ZERO = Decimal("0.00")
+# bet_statistics.win_rate / roi are DECIMAL(5,2)
+PCT_LIMIT = Decimal("999.99")
+
+STATS_COLUMNS = (
+    "total_bets", "winning_bets", "losing_bets", "cancelled_bets", "win_rate", "average_odds",
+    "total_wagered", "total_returned", "gross_profit", "roi", "longest_win_streak", "longest_loss_streak",
+)
+STATE_COLUMNS = ("current_streak", "odds_sum", "odds_count")
+
+
+def _dec(value):
+    return ZERO if value is None else Decimal(str(value))
+
+def _money(value):
+    # Same precision as the DECIMAL(12,2) money columns
+    return _dec(value).quantize(CENTS, ROUND_HALF_UP)
+
+def _pct(numerator, denominator):
+    if not denominator:
+        return ZERO
+    value = (numerator / denominator * 100).quantize(CENTS, ROUND_HALF_UP)
+    return max(-PCT_LIMIT, min(PCT_LIMIT, value))
+
+
+class BetStats:
+    """Running statistics for one user; ``apply`` folds in one settled bet."""
+
+    def __init__(self):
+        self.total_bets = 0
+        self.winning_bets = 0
+        self.losing_bets = 0
+        self.cancelled_bets = 0
+        self.total_wagered = ZERO
+        self.total_returned = ZERO
+        self.longest_win_streak = 0
+        self.longest_loss_streak = 0
+        # > 0: current run of wins, < 0: current run of losses
+        self.current_streak = 0
+        self.odds_sum = ZERO
+        self.odds_count = 0
+
+    @classmethod
+    def from_rows(cls, stats_row, state_row=None):
+        """Rebuild from stored bet_statistics / bet_statistics_state rows."""
+        stats = cls()
+        if stats_row:
+            for name in ("total_bets", "winning_bets", "losing_bets", "cancelled_bets",
+                         "longest_win_streak", "longest_loss_streak"):
+                setattr(stats, name, int(stats_row.get(name) or 0))
+            stats.total_wagered = _dec(stats_row.get("total_wagered"))
+            stats.total_returned = _dec(stats_row.get("total_returned"))
+        if state_row:
+            stats.current_streak = int(state_row.get("current_streak") or 0)
+            stats.odds_sum = _dec(state_row.get("odds_sum"))
+            stats.odds_count = int(state_row.get("odds_count") or 0)
+        return stats
+
+    def apply(self, status, stake, total_odds=None, payout=None):
+        """Fold one settled bet in. Pushes and cancellations don't break streaks."""
+        if status not in SETTLED_STATUSES:
+            raise ValueError(f"Bet is not settled: {status!r}")
+        self.total_bets += 1
+
+        if status == "cancelled":
+            self.cancelled_bets += 1
+            return self
+
+        stake = _money(stake)
+        self.total_wagered += stake
+        if total_odds is not None:
+            self.odds_sum += _dec(total_odds)
+            self.odds_count += 1
+
+        if status == "won":
+            self.winning_bets += 1
+            self.total_returned += _money(payout)
+            self.current_streak = self.current_streak + 1 if self.current_streak > 0 else 1
+            self.longest_win_streak = max(self.longest_win_streak, self.current_streak)
+        elif status == "lost":
+            self.losing_bets += 1
+            self.current_streak = self.current_streak - 1 if self.current_streak < 0 else -1
+            self.longest_loss_streak = max(self.longest_loss_streak, -self.current_streak)
+        else:  # push: stake comes back
+            self.total_returned += stake if payout is None else _money(payout)
+        return self
+
+    def stats_row(self):
+        profit = self.total_returned - self.total_wagered
+        average_odds = None
+        if self.odds_count:
+            average_odds = (self.odds_sum / self.odds_count).quantize(CENTS, ROUND_HALF_UP)
+        return {
+            "total_bets": self.total_bets,
+            "winning_bets": self.winning_bets,
+            "losing_bets": self.losing_bets,
+            "cancelled_bets": self.cancelled_bets,
+            "win_rate": _pct(Decimal(self.winning_bets), self.winning_bets + self.losing_bets),
+            "average_odds": average_odds,
+            "total_wagered": self.total_wagered.quantize(CENTS),
+            "total_returned": self.total_returned.quantize(CENTS),
+            "gross_profit": profit.quantize(CENTS),
+            "roi": _pct(profit, self.total_wagered),
+            "longest_win_streak": self.longest_win_streak,
+            "longest_loss_streak": self.longest_loss_streak,
+        }
+
+    def state_row(self):
+        return {"current_streak": self.current_streak, "odds_sum": self.odds_sum, "odds_count": self.odds_count}
+
+
+def _upsert_sql(table, columns):
+    names = ("user_id",) + columns
+    return (
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+        f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in columns)}"
+    )
+
+_STATS_UPSERT = _upsert_sql("bet_statistics", STATS_COLUMNS)
+_STATE_UPSERT = _upsert_sql("bet_statistics_state", STATE_COLUMNS)
+
+def write_stats(cursor, stats_by_user):
+    """Upsert bet_statistics and bet_statistics_state for many users."""
+    if not stats_by_user:
+        return
+    stats_rows, state_rows = [], []
+    for user_id, stats in stats_by_user.items():
+        row, state = stats.stats_row(), stats.state_row()
+        stats_rows.append((user_id,) + tuple(row[c] for c in STATS_COLUMNS))
+        state_rows.append((user_id,) + tuple(state[c] for c in STATE_COLUMNS))
+    cursor.executemany(_STATS_UPSERT, stats_rows)
+    cursor.executemany(_STATE_UPSERT, state_rows)
+
+def load_stats(cursor, user_ids, for_update=False):
+    """Current BetStats for each user id (fresh ones for users with no row)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(user_ids))
+    lock = " FOR UPDATE" if for_update else ""
+    cursor.execute(f"SELECT * FROM bet_statistics WHERE user_id IN ({placeholders}){lock}", user_ids)
+    stats_rows = {row["user_id"]: row for row in cursor.fetchall()}
+    cursor.execute(f"SELECT * FROM bet_statistics_state WHERE user_id IN ({placeholders}){lock}", user_ids)
+    state_rows = {row["user_id"]: row for row in cursor.fetchall()}
+    return {uid: BetStats.from_rows(stats_rows.get(uid), state_rows.get(uid)) for uid in user_ids}
+
+def record_settled_bets(cursor, bets):
+    """Fold newly settled bets into their users' statistics.
+
+    ``bets`` are dicts with id, user_id, status, total_stake, total_odds,
+    actual_payout, settled_date and settlement_seq; they are applied in
+    ``settlement_order``, the same order a recompute reads them in. Runs on the
+    caller's cursor and transaction, locking each affected user's rows once, so
+    it can be called from the same transaction that settles the bets.
+    """
+    bets = sorted((b for b in bets if b.get("parlay_id") is None), key=settlement_order)
+    if not bets:
+        return {}
+    stats = load_stats(cursor, sorted({b["user_id"] for b in bets}), for_update=True)
+    for bet in bets:
+        stats[bet["user_id"]].apply(bet["status"], bet["total_stake"], bet.get("total_odds"),
+                                    bet.get("actual_payout"))
+    write_stats(cursor, stats)
+    return stats
+
+
+def settlement_order(bet):
+    """Sort key for one user's settled bets, the same order as _HISTORY_SQL.
+
+    Bets settled before settlement_seq existed come first, by settle time and
+    id; everything after follows the global sequence settlement assigns.
+    """
+    seq = bet.get("settlement_seq")
+    if seq is not None:
+        return (1, seq, None, 0)
+    return (0, 0, bet.get("settled_date") or bet.get("bet_date"), bet["id"])
+
+# Keep the ORDER BY in step with settlement_order
+_HISTORY_SQL = """
+    SELECT user_id, status, total_stake, total_odds, actual_payout
+    FROM bets
+    WHERE parlay_id IS NULL AND status IN ('won', 'lost', 'cancelled', 'push'){user_filter}
+    ORDER BY user_id, settlement_seq IS NOT NULL, settlement_seq, COALESCE(settled_date, bet_date), id
+"""
+
+def recompute(rows):
+    """Full recompute from a user's settled bets in settlement order."""
+    stats = BetStats()
+    for row in rows:
+        stats.apply(row["status"], row["total_stake"], row["total_odds"], row["actual_payout"])
+    return stats
+
+def backfill(batch_size=1000):
+    """Rebuild every user's statistics from bets in one streaming pass.
+
+    Bets are read through an unbuffered server-side cursor ordered by user, so
+    only one user's running totals are in memory at a time; finished users are
+    written on a second connection in batches of ``batch_size``.
+    """
+    from db import get_connection
+
+    read_conn = get_connection(create_db_if_missing=False)
+    write_conn = get_connection(create_db_if_missing=False)
+    pending = {}
+    users = 0
+    try:
+        with read_conn.cursor(pymysql.cursors.SSDictCursor) as reader, write_conn.cursor() as writer:
+            reader.execute(_HISTORY_SQL.format(user_filter=""))
+            current_user, current = None, None
+            for row in reader:
+                if row["user_id"] != current_user:
+                    if current is not None:
+                        pending[current_user] = current
+                    current_user, current = row["user_id"], BetStats()
+                    if len(pending) >= batch_size:
+                        write_stats(writer, pending)
+                        write_conn.commit()
+                        users += len(pending)
+                        pending = {}
+                current.apply(row["status"], row["total_stake"], row["total_odds"], row["actual_payout"])
+            if current is not None:
+                pending[current_user] = current
+            write_stats(writer, pending)
+            write_conn.commit()
+            users += len(pending)
+    finally:
+        read_conn.close()
+        write_conn.close()
+    return users
+
+def check_consistency(user_ids=None, sample=100):
+    """Compare stored statistics with a full recompute from bets.
+
+    Checks ``user_ids`` or, if None, a random sample of users with stats.
+    Returns a list of (user_id, column, stored, recomputed) mismatches.
+    """
+    from db import connection
+
+    mismatches = []
+    with connection() as conn, conn.cursor() as c:
+        if user_ids is None:
+            c.execute("SELECT user_id FROM bet_statistics ORDER BY RAND() LIMIT %s", (sample,))
+            user_ids = [row["user_id"] for row in c.fetchall()]
+        if not user_ids:
+            return mismatches
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        c.execute(f"SELECT * FROM bet_statistics WHERE user_id IN ({placeholders})", list(user_ids))
+        stored = {row["user_id"]: row for row in c.fetchall()}
+        for user_id in user_ids:
+            c.execute(_HISTORY_SQL.format(user_filter=" AND user_id = %s"), (user_id,))
+            expected = recompute(c.fetchall()).stats_row()
+            actual = stored.get(user_id) or BetStats().stats_row()
+            for column in STATS_COLUMNS:
+                if _normalize(actual[column]) != _normalize(expected[column]):
+                    mismatches.append((user_id, column, actual[column], expected[column]))
+    return mismatches
+
+def _normalize(value):
+    return None if value is None else Decimal(str(value)).quantize(CENTS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the bet_statistics table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_cmd = sub.add_parser("backfill", help="rebuild all statistics from bets")
+    backfill_cmd.add_argument("--batch-size", type=int, default=1000)
+    check_cmd = sub.add_parser("check", help="compare stored statistics with a full recompute")
+    check_cmd.add_argument("--users", type=int, nargs="*")
+    check_cmd.add_argument("--sample", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        users = backfill(args.batch_size)
+        print(f"✅ Rebuilt statistics for {users} users")
+        return 0
+
+    mismatches = check_consistency(args.users, args.sample)
+    for user_id, column, stored, expected in mismatches:
+        print(f"⚠️ user {user_id}: {column} stored={stored} recomputed={expected}")
+    if not mismatches:
+        print("✅ Statistics consistent")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
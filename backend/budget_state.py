@@ -0,0 +1,307 @@
+import atexit
+import copy
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pymysql
+
+from chat import default_user_data
+
+BUDGET_STATE_CACHE_SIZE = int(os.getenv("BUDGET_STATE_CACHE_SIZE", "10000"))
+BUDGET_STATE_FLUSH_INTERVAL = float(os.getenv("BUDGET_STATE_FLUSH_INTERVAL", "2"))
+BUDGET_STATE_FLUSH_BATCH = int(os.getenv("BUDGET_STATE_FLUSH_BATCH", "500"))
+LOCK_STRIPES = 64
+# A row failing with one of these will fail however often it is retried
+PERMANENT_ERRORS = (ValueError, TypeError, pymysql.err.DataError, pymysql.err.IntegrityError)
+
+
+def load_state_from_db(user_id):
+    """Read one user's saved chat budget as (state, version), or None if they have none yet."""
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute(
+            "SELECT income, expenses, savings, categories, version FROM user_budget_state WHERE user_id = %s",
+            (user_id,)
+        )
+        row = c.fetchone()
+    if not row:
+        return None
+    return {
+        "income": float(row["income"]),
+        "expenses": float(row["expenses"]),
+        "savings": float(row["savings"]),
+        "categories": {k: float(v) for k, v in json.loads(row["categories"]).items()},
+    }, row["version"]
+
+def save_states_to_db(states):
+    """Compare-and-set many users' budgets; returns the users whose write lost.
+
+    ``states`` maps user_id -> (state, expected_version, new_version), with
+    expected_version None for a user who had no row. A row is only written
+    if its version is still the expected one, so a worker holding an older
+    copy can't overwrite a newer write from another worker.
+    """
+    from db import connection
+
+    rows = {
+        user_id: (s["income"], s["expenses"], s["savings"], json.dumps(s["categories"], allow_nan=False),
+                  expected, new)
+        for user_id, (s, expected, new) in states.items()
+    }
+    updates = [user_id for user_id, row in rows.items() if row[4] is not None]
+    inserts = [user_id for user_id, row in rows.items() if row[4] is None]
+    with connection() as conn, conn.cursor() as c:
+        if updates:
+            # One statement for the batch; rows whose version moved on are left alone
+            values = " UNION ALL ".join(
+                ["SELECT %s AS user_id, %s AS income, %s AS expenses, %s AS savings, %s AS categories, "
+                 "%s AS expected, %s AS new_version"] + ["SELECT %s, %s, %s, %s, %s, %s, %s"] * (len(updates) - 1))
+            c.execute(
+                f"""
+                UPDATE user_budget_state s
+                JOIN ({values}) AS v ON s.user_id = v.user_id AND s.version = v.expected
+                SET s.income = v.income, s.expenses = v.expenses, s.savings = v.savings,
+                    s.categories = CAST(v.categories AS JSON), s.version = v.new_version
+                """,
+                [value for user_id in updates for value in (user_id, *rows[user_id])]
+            )
+        if inserts:
+            # A row another worker created in the meantime is kept
+            c.executemany(
+                """
+                INSERT INTO user_budget_state (user_id, income, expenses, savings, categories, version)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE user_id = user_id
+                """,
+                [(user_id, *rows[user_id][:4], rows[user_id][5]) for user_id in inserts]
+            )
+        c.execute(
+            f"SELECT user_id, version FROM user_budget_state WHERE user_id IN ({', '.join(['%s'] * len(rows))})",
+            list(rows)
+        )
+        saved = {row["user_id"]: row["version"] for row in c.fetchall()}
+        conn.commit()
+    return {user_id for user_id, row in rows.items() if saved.get(user_id) != row[5]}
+
+
+def _new_version():
+    # Random rather than +1, so two workers writing from the same version
+    # can tell whose write landed
+    return random.getrandbits(62) + 1
+
+
+class BudgetStateStore:
+    """Per-user chat budgets held in memory with write-behind persistence.
+
+    Reads are served from an LRU of user states. Edits mark the user dirty and a
+    background thread writes dirty users back in batches every
+    ``flush_interval`` seconds, or sooner once ``flush_batch`` users are dirty.
+    Idle users are evicted least-recently-used first, but never before their
+    latest state has been written. A batch rejected for its data is retried
+    one user at a time; users whose state can never be written are logged and
+    dropped back to what the database has.
+
+    Each worker process has its own store. Writes are compare-and-set on the
+    row's version: if another worker wrote the user since this one loaded
+    them, the write is refused, logged, and the user is reloaded on next use,
+    so the first write wins instead of the last. Reads are not checked, so
+    with several workers route each user to one worker (sticky sessions) to
+    avoid showing a budget another worker has since changed.
+    """
+
+    def __init__(self, load=load_state_from_db, save_many=save_states_to_db,
+                 maxsize=BUDGET_STATE_CACHE_SIZE, flush_interval=BUDGET_STATE_FLUSH_INTERVAL,
+                 flush_batch=BUDGET_STATE_FLUSH_BATCH):
+        self._load = load
+        self._save_many = save_many
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+
+        self._entries = OrderedDict()  # user_id -> state
+        self._versions = {}  # user_id -> row version the state is based on (None: no row yet)
+        self._dirty = set()
+        self._flushing = set()  # written to the DB right now; not safe to evict yet
+        self._user_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._counts = {"written": 0, "dropped": 0, "conflicts": 0}
+
+    @contextmanager
+    def edit(self, user_id):
+        """Yield the user's state for in-place changes; it is marked dirty afterwards if it changed."""
+        with self._user_lock(user_id):
+            state = self._get(user_id)
+            with self._lock:
+                version = self._versions.get(user_id)
+            before = copy.deepcopy(state)
+            try:
+                yield state
+            finally:
+                if state != before:
+                    self._mark_dirty(user_id, state, version)
+
+    def get(self, user_id):
+        """Return a copy of the user's current state."""
+        with self._user_lock(user_id):
+            return copy.deepcopy(self._get(user_id))
+
+    def flush(self):
+        """Write every dirty user now. Returns the number of users written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch_ids = [uid for _, uid in zip(range(self.flush_batch), self._dirty)]
+                    if not batch_ids:
+                        break
+                    batch = {uid: (copy.deepcopy(self._entries[uid]), self._versions.get(uid), _new_version())
+                             for uid in batch_ids}
+                    self._dirty.difference_update(batch_ids)
+                    self._flushing.update(batch_ids)
+                try:
+                    failed, retry, lost = [], [], self._save_many(batch) or set()
+                except PERMANENT_ERRORS as e:
+                    # Some row is bad; find it without holding back the rest
+                    print("BUDGET STATE FLUSH ERROR:", e)
+                    failed, retry, lost = self._save_each(batch)
+                except Exception as e:
+                    print("BUDGET STATE FLUSH ERROR:", e)
+                    failed, retry, lost = [], batch_ids, set()
+                with self._lock:
+                    self._flushing.difference_update(batch_ids)
+                    self._dirty.update(retry)
+                    for user_id in batch_ids:
+                        if user_id not in retry and user_id not in failed and user_id not in lost:
+                            self._versions[user_id] = batch[user_id][2]
+                    for user_id in lost:
+                        print(f"BUDGET STATE CONFLICT for user {user_id}: changed by another worker, reloading")
+                    for user_id in [*failed, *lost]:
+                        # Fall back to the stored row, discarding edits made since too:
+                        # they were based on the same unwritable or outdated state
+                        self._entries.pop(user_id, None)
+                        self._versions.pop(user_id, None)
+                        self._dirty.discard(user_id)
+                    self._counts["dropped"] += len(failed)
+                    self._counts["conflicts"] += len(lost)
+                written += len(batch) - len(failed) - len(retry) - len(lost)
+                if retry:
+                    break
+            with self._lock:
+                self._counts["written"] += written
+        with self._lock:
+            self._evict()
+        return written
+
+    def _save_each(self, batch):
+        # Returns (users that can't be written, users to retry later, users whose write lost)
+        failed, lost = [], set()
+        user_ids = list(batch)
+        for i, user_id in enumerate(user_ids):
+            try:
+                lost |= self._save_many({user_id: batch[user_id]}) or set()
+            except PERMANENT_ERRORS as e:
+                print(f"BUDGET STATE DROPPED for user {user_id}:", e)
+                failed.append(user_id)
+            except Exception as e:
+                print("BUDGET STATE FLUSH ERROR:", e)
+                return failed, user_ids[i:], lost
+        return failed, [], lost
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._entries), "dirty": len(self._dirty), "maxsize": self.maxsize, **self._counts}
+
+    def _user_lock(self, user_id):
+        # Striped so the lock table stays bounded however many users we see
+        return self._user_locks[hash(user_id) % LOCK_STRIPES]
+
+    def _get(self, user_id):
+        with self._lock:
+            state = self._entries.get(user_id)
+            if state is not None:
+                self._entries.move_to_end(user_id)
+                return state
+
+        # Only this user's lock is held while we go to the database
+        state, version = self._load(user_id) or (default_user_data(), None)
+        with self._lock:
+            self._entries[user_id] = state
+            self._versions[user_id] = version
+            self._evict()
+        return state
+
+    def _mark_dirty(self, user_id, state, version):
+        with self._lock:
+            # Re-insert in case the entry was evicted while being edited
+            self._entries[user_id] = state
+            self._versions.setdefault(user_id, version)
+            self._entries.move_to_end(user_id)
+            self._dirty.add(user_id)
+            dirty = len(self._dirty)
+        self._ensure_flusher()
+        if dirty >= self.flush_batch:
+            self._wake.set()
+
+    def _evict(self):
+        # Caller holds self._lock. Dirty users stay until the flusher writes them.
+        excess = len(self._entries) - self.maxsize
+        if excess <= 0:
+            return
+        victims = []
+        for user_id in self._entries:
+            if len(victims) >= excess:
+                break
+            if user_id not in self._dirty and user_id not in self._flushing:
+                victims.append(user_id)
+        for user_id in victims:
+            del self._entries[user_id]
+            self._versions.pop(user_id, None)
+        if len(victims) < excess:
+            self._wake.set()
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="budget-state-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_budget_store():
+    """Return the process-wide BudgetStateStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BudgetStateStore()
+                atexit.register(_store.close)
+    return _store
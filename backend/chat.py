@@ -0,0 +1,100 @@
+import copy
+
+from intents import parse_intent, MAX_AMOUNT
+
+#defualt user info
+DEFAULT_USER_DATA = {
+    "income": 3000,
+    "expenses": 1500,
+    "savings": 200,
+    "categories": {
+        "food": 300,
+        "entertainment": 200,
+        "bills": 1000
+    }
+}
+
+def default_user_data():
+    return copy.deepcopy(DEFAULT_USER_DATA)
+
+def calculate_remaining_budget(user_data):
+    total_spent = sum(user_data["categories"].values()) + user_data["savings"]
+    return user_data["income"] - total_spent
+
+# Reply text when an update has no usable amount
+UPDATE_ERRORS = {
+    "income": "Couldn't process income update.",
+    "expenses": "Couldn't process expenses update.",
+    "savings": "Couldn't process savings update.",
+}
+
+def handle_input(user_input, user_data):
+    """Reply to one chat message, applying any update to ``user_data`` in place."""
+    intent = parse_intent(user_input)
+
+    #Greet user
+    if intent.name == "greet":
+        return ("Hey there! I'm your AI Financial Assistant.<br>"
+                "You can ask me to:<br>"
+                "- Update your income or expenses<br>"
+                "- Add to food, bills, or entertainment<br>"
+                "- Type 'help' for a list of all commands!")
+
+    if intent.name == "help":
+        return ("Here's what you can say:<br>"
+                "- 'Show my budget'<br>"
+                "- 'Add 200 to food'<br>"
+                "- 'Update entertainment to 400'<br>"
+                "- 'Set income to 5000'<br>"
+                "- 'Update savings to 300'<br>"
+                "- 'Reset data'")
+
+    # reset data
+    if intent.name == "reset":
+        user_data.update(default_user_data())
+        return "All data reset to default values."
+
+    # update income, expenses, savings or a category
+    if intent.name == "update":
+        target, amount = intent.target, intent.amount
+        if target in UPDATE_ERRORS:
+            if amount is None:
+                return UPDATE_ERRORS[target]
+            if intent.mode == "set":
+                user_data[target] = amount
+                return f"{target.capitalize()} updated to ${amount:,.2f}."
+            if user_data[target] + amount > MAX_AMOUNT:
+                return f"{target.capitalize()} can't go above ${MAX_AMOUNT:,.2f}."
+            user_data[target] += amount
+            return f"Added ${amount:,.2f} to {target}. Total: ${user_data[target]:,.2f}."
+
+        categories = user_data["categories"]
+        if amount is None:
+            return f"Please specify a valid amount for {target}."
+        if intent.mode == "set":
+            categories[target] = amount
+            return f"{target.capitalize()} updated to ${amount:,.2f}."
+        if categories.get(target, 0) + amount > MAX_AMOUNT:
+            return f"{target.capitalize()} can't go above ${MAX_AMOUNT:,.2f}."
+        categories[target] = categories.get(target, 0) + amount
+        return f"Added ${amount:,.2f} to {target}. Total: ${categories[target]:,.2f}."
+
+    # show user budget
+    if intent.name == "show":
+        remaining = calculate_remaining_budget(user_data)
+        category_breakdown = "<br>".join([f"- {k.capitalize()}: ${v:,.2f}" for k, v in user_data["categories"].items()])
+        return (f"Here's your budget breakdown:<br><br>"
+                f"<b>Income:</b> ${user_data['income']:,.2f}<br>"
+                f"<b>Expenses:</b> ${user_data['expenses']:,.2f}<br>"
+                f"<b>Savings:</b> ${user_data['savings']:,.2f}<br><br>"
+                f"{category_breakdown}<br><br>"
+                f"<b>Remaining:</b> ${remaining:,.2f}")
+
+    # default
+    remaining = calculate_remaining_budget(user_data)
+    return (f"Here's your quick financial summary:<br><br>"
+            f"- Income: ${user_data['income']:,.2f}<br>"
+            f"- Expenses: ${user_data['expenses']:,.2f}<br>"
+            f"- Savings: ${user_data['savings']:,.2f}<br>"
+            f"- Remaining budget: ${remaining:,.2f}<br><br>"
+            "Need help? Type <b>help</b> to see what else I can do.")
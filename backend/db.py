@@ -1,11 +1,39 @@
 import pymysql
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
 
 DB_HOST = os.getenv("DB_HOST")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+class TimedDictCursor(pymysql.cursors.DictCursor):
+    """DictCursor that records each statement's latency in metrics.
+
+    executemany and callproc go through execute, so they are covered too.
+    """
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, args)
+            failed = False
+            return result
+        finally:
+            metrics.observe_query(query, time.perf_counter() - start, failed)
+
+CURSOR_CLASS = TimedDictCursor if metrics.METRICS_ENABLED else pymysql.cursors.DictCursor
+
 def get_connection(create_db_if_missing=True):
     try:
         conn = pymysql.connect(
@@ -13,7 +41,7 @@ def get_connection(create_db_if_missing=True):
             user=DB_USER,
             password=DB_PASSWORD,
             database=DB_NAME,
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=CURSOR_CLASS
         )
     except pymysql.err.OperationalError as e:
         if create_db_if_missing and "Unknown database" in str(e):
@@ -33,248 +61,176 @@ def get_connection(create_db_if_missing=True):
                 user=DB_USER,
                 password=DB_PASSWORD,
                 database=DB_NAME,
-                cursorclass=pymysql.cursors.DictCursor
+                cursorclass=CURSOR_CLASS
             )
         else:
             raise
     return conn
 
 
-def create_tables():
-    conn = get_connection()
-    with conn.cursor() as c:
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                mfa_secret CHAR(32) UNIQUE DEFAULT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bankrolls (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                current_balance DECIMAL(12,2) NOT NULL DEFAULT 0.00,
-                initial_bankroll DECIMAL(12,2) NOT NULL,
-                peak_balance DECIMAL(12,2),
-                lowest_balance DECIMAL(12,2),
-                total_wagered DECIMAL(12,2) DEFAULT 0.00,
-                total_won DECIMAL(12,2) DEFAULT 0.00,
-                total_lost DECIMAL(12,2) DEFAULT 0.00,
-                roi DECIMAL(5,2) DEFAULT 0.00,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_user_bankroll (user_id),
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """A bounded pool of pymysql connections shared by request threads.
+
+    pymysql connections are not thread-safe, so each thread checks one out for
+    the duration of its work and hands it back afterwards. Connections are
+    pinged when borrowed and transparently replaced if the server dropped them.
+    """
+
+    def __init__(self, connect=None, minsize=DB_POOL_MIN, maxsize=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT):
+        self._connect = connect or (lambda: get_connection(create_db_if_missing=False))
+        self.minsize = min(minsize, maxsize)
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = deque()
+        self._size = 0  # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self._filled = False
+
+    def _after_fork(self):
+        # A forked child must not reuse the parent's sockets; forget them.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+            self._filled = False
+
+    def _fill(self, count):
+        # Opens ``count`` slots already reserved in _size; connecting can take
+        # seconds, so the lock is only taken to hand each connection over
+        for opened in range(count):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= count - opened
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._after_fork()
+            fill = 0
+            if not self._filled:
+                self._filled = True
+                fill = max(0, self.minsize - self._size)
+                self._size += fill
+        if fill:
+            self._fill(fill)
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.maxsize:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        if conn is not None and self._healthy(conn):
+            return conn
+
+        if conn is not None:
+            self._close(conn)
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS sports (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                sport_name VARCHAR(100) UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS games (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                sport_id INT NOT NULL,
-                game_name VARCHAR(255) NOT NULL,
-                team_a VARCHAR(100) NOT NULL,
-                team_b VARCHAR(100) NOT NULL,
-                game_date DATETIME NOT NULL,
-                status ENUM('scheduled','live','completed','cancelled') DEFAULT 'scheduled',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (sport_id) REFERENCES sports(id) ON DELETE CASCADE,
-                INDEX idx_sport_date (sport_id, game_date),
-                INDEX idx_status (status)
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bet_types (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                type_name VARCHAR(50) UNIQUE NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bet_legs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                game_id INT NOT NULL,
-                bet_type_id INT NOT NULL,
-                selection VARCHAR(255) NOT NULL,
-                odds DECIMAL(8,2) NOT NULL,
-                odds_format ENUM('american','decimal','fractional') DEFAULT 'american',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (game_id) REFERENCES games(id) ON DELETE CASCADE,
-                FOREIGN KEY (bet_type_id) REFERENCES bet_types(id) ON DELETE CASCADE,
-                INDEX idx_game (game_id)
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bets (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                bankroll_id INT NOT NULL,
-                parlay_id INT,
-                total_stake DECIMAL(12,2) NOT NULL,
-                total_odds DECIMAL(10,2),
-                potential_win DECIMAL(12,2),
-                actual_payout DECIMAL(12,2),
-                status ENUM('pending','won','lost','cancelled','push') DEFAULT 'pending',
-                bet_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                settled_date DATETIME,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY (bankroll_id) REFERENCES bankrolls(id) ON DELETE CASCADE,
-                FOREIGN KEY (parlay_id) REFERENCES bets(id) ON DELETE SET NULL,
-                INDEX idx_user_status (user_id, status),
-                INDEX idx_bet_date (bet_date),
-                INDEX idx_settled_date (settled_date)
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bet_slip_items (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                bet_id INT NOT NULL,
-                bet_leg_id INT NOT NULL,
-                leg_order INT NOT NULL,
-                stake DECIMAL(12,2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_bet_leg (bet_id, bet_leg_id),
-                FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE CASCADE,
-                FOREIGN KEY (bet_leg_id) REFERENCES bet_legs(id) ON DELETE CASCADE
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS ai_recommendations (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                game_id INT,
-                bet_leg_id INT,
-                sport_id INT NOT NULL,
-                game_name VARCHAR(255) NOT NULL,
-                selection VARCHAR(255) NOT NULL,
-                odds DECIMAL(8,2) NOT NULL,
-                confidence_score DECIMAL(5,2) NOT NULL,
-                recommended_stake DECIMAL(5,2),
-                analysis TEXT,
-                ai_model VARCHAR(100),
-                is_used BOOLEAN DEFAULT FALSE,
-                bet_id INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
-                FOREIGN KEY (game_id) REFERENCES games(id) ON DELETE SET NULL,
-                FOREIGN KEY (sport_id) REFERENCES sports(id) ON DELETE CASCADE,
-                FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE SET NULL,
-                INDEX idx_user_created (user_id, created_at),
-                INDEX idx_confidence (confidence_score)
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bet_statistics (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                total_bets INT DEFAULT 0,
-                winning_bets INT DEFAULT 0,
-                losing_bets INT DEFAULT 0,
-                cancelled_bets INT DEFAULT 0,
-                win_rate DECIMAL(5,2) DEFAULT 0.00,
-                average_odds DECIMAL(8,2),
-                total_wagered DECIMAL(12,2) DEFAULT 0.00,
-                total_returned DECIMAL(12,2) DEFAULT 0.00,
-                gross_profit DECIMAL(12,2) DEFAULT 0.00,
-                roi DECIMAL(5,2) DEFAULT 0.00,
-                longest_win_streak INT DEFAULT 0,
-                longest_loss_streak INT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_user_stats (user_id),
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS bet_analysis (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                bet_id INT NOT NULL,
-                quality_score DECIMAL(5,2),
-                ai_analysis TEXT,
-                user_notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_bet_analysis (bet_id),
-                FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE CASCADE
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS budget_recommendations (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                income DECIMAL(12,2) NOT NULL,
-                fixed_expenses DECIMAL(12,2) NOT NULL,
-                savings_goal DECIMAL(12,2) NOT NULL,
-                months_to_goal INT NOT NULL,
-                food_budget DECIMAL(12,2),
-                entertainment_budget DECIMAL(12,2),
-                shopping_budget DECIMAL(12,2),
-                monthly_savings DECIMAL(12,2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_created (user_id, created_at)
-            )
-        """)
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS audit_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                action VARCHAR(255) NOT NULL,
-                entity_type VARCHAR(100),
-                entity_id INT,
-                old_value JSON,
-                new_value JSON,
-                ip_address VARCHAR(45),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
-                INDEX idx_user_action (user_id, action),
-                INDEX idx_created_at (created_at)
-            )
-        """)
-
-        # Seed data
-        c.execute("""
-            INSERT IGNORE INTO bet_types (type_name, description) VALUES
-            ('Moneyline','Pick the winner'),
-            ('Spread','Pick a team to win by a margin'),
-            ('Total','Over/Under total score'),
-            ('Parlay','Multiple bets combined'),
-            ('Prop Bet','Specific events'),
-            ('Futures','Future outcome bets')
-        """)
-
-        c.execute("""
-            INSERT IGNORE INTO sports (sport_name) VALUES
-            ('NBA'),('NFL'),('NHL'),('MLB'),('Soccer')
-        """)
-
-    conn.commit()
-    return conn
+    def release(self, conn, discard=False):
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if discard or not conn.open:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block.
+
+        Anything not committed inside the block is rolled back; a connection
+        that fails the rollback is closed instead of going back to the pool.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            # Also ends read-only transactions so the next borrower doesn't
+            # see a stale REPEATABLE READ snapshot.
+            try:
+                conn.rollback()
+                discard = False
+            except Exception:
+                discard = True
+            self.release(conn, discard=discard)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle),
+                    "maxsize": self.maxsize}
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.ping(reconnect=True)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def connection():
+    """Shortcut for ``get_pool().connection()``."""
+    return get_pool().connection()
+
+
+def create_tables():
+    """Create or upgrade the schema; same as running ``python migrations.py``."""
+    from migrations import migrate
+    migrate()
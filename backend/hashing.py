@@ -0,0 +1,125 @@
+import bcrypt
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+
+class HasherBusy(Exception):
+    """The hashing queue is full; the caller should retry later."""
+
+    def __init__(self, retry_after=HASH_RETRY_AFTER):
+        super().__init__("Password hashing queue is full.")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool with a bounded backlog.
+
+    bcrypt releases the GIL while it works, so request threads just wait on the
+    result while other endpoints keep running. At most ``workers + queue_size``
+    hashes are accepted at once; beyond that calls fail fast with HasherBusy
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE,
+                 rounds=BCRYPT_ROUNDS, retry_after=HASH_RETRY_AFTER):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._recent = deque(maxlen=1024)
+
+    def hash_password(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._submit(bcrypt.hashpw, password.encode(), salt).decode()
+
+    def check_password(self, password: str, password_hash: str) -> bool:
+        return self._submit(bcrypt.checkpw, password.encode(), password_hash.encode())
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy(self.retry_after)
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._run, fn, args)
+        except Exception:
+            self._done(None)
+            raise
+        return future.result()
+
+    def _run(self, fn, args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._done(time.perf_counter() - start)
+
+    def _done(self, elapsed):
+        with self._lock:
+            self._pending -= 1
+            if elapsed is not None:
+                self._completed += 1
+                self._latency_total += elapsed
+                self._latency_max = max(self._latency_max, elapsed)
+                self._recent.append(elapsed)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            pending = self._pending
+            completed = self._completed
+            total = self._latency_total
+            latency_max = self._latency_max
+            rejected = self._rejected
+
+        def pct(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "in_flight": min(pending, self.workers),
+            "queue_depth": max(0, pending - self.workers),
+            "queue_capacity": self.queue_size,
+            "completed": completed,
+            "rejected": rejected,
+            "latency_avg": total / completed if completed else 0.0,
+            "latency_p50": pct(0.50),
+            "latency_p99": pct(0.99),
+            "latency_max": latency_max,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_hasher():
+    """Return the process-wide PasswordHasher, creating it on first use."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
@@ -0,0 +1,209 @@
+"""Bet history pages and streaming exports.
+
+Bets are read newest first with keyset pagination on (user_id, bet_date, id)
+instead of OFFSET, so every page is an index range scan however deep into
+the history it is. Exports walk the same keyset in chunks of
+HISTORY_EXPORT_CHUNK bets through an unbuffered server-side cursor, sending
+rows on in batches of HISTORY_EXPORT_FETCH as they arrive. A pooled
+connection is held for one chunk at a time and returned between chunks, and
+memory stays bounded by the fetch size whatever the history size.
+"""
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+from decimal import Decimal
+
+import pymysql
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+HISTORY_EXPORT_CHUNK = int(os.getenv("HISTORY_EXPORT_CHUNK", "1000"))
+HISTORY_EXPORT_FETCH = int(os.getenv("HISTORY_EXPORT_FETCH", "100"))
+
+BET_COLUMNS = ("id", "bet_date", "status", "total_stake", "total_odds", "potential_win",
+               "actual_payout", "settled_date", "parlay_id")
+LEG_COLUMNS = ("leg_order", "selection", "odds", "odds_format", "game_id", "game_name",
+               "team_a", "team_b", "game_date", "game_status", "leg_result")
+CSV_HEADER = ("bet_id",) + BET_COLUMNS[1:] + LEG_COLUMNS
+
+# bet_date is nullable; NULLs sort last in DESC order, so they come after
+# every dated bet and then among themselves by id
+_BETS_AFTER = """
+    SELECT id, bet_date, status, total_stake, total_odds, potential_win, actual_payout, settled_date, parlay_id
+    FROM bets
+    WHERE user_id = %s AND (bet_date < %s OR (bet_date = %s AND id < %s) OR bet_date IS NULL)
+    ORDER BY bet_date DESC, id DESC
+    LIMIT %s
+"""
+_BETS_AFTER_UNDATED = """
+    SELECT id, bet_date, status, total_stake, total_odds, potential_win, actual_payout, settled_date, parlay_id
+    FROM bets
+    WHERE user_id = %s AND bet_date IS NULL AND id < %s
+    ORDER BY bet_date DESC, id DESC
+    LIMIT %s
+"""
+_BETS_FIRST = """
+    SELECT id, bet_date, status, total_stake, total_odds, potential_win, actual_payout, settled_date, parlay_id
+    FROM bets
+    WHERE user_id = %s
+    ORDER BY bet_date DESC, id DESC
+    LIMIT %s
+"""
+_LEG_SELECT = """
+    bsi.leg_order, bl.selection, bl.odds, bl.odds_format, g.id AS game_id, g.game_name,
+    g.team_a, g.team_b, g.game_date, g.status AS game_status, r.result AS leg_result
+"""
+_LEG_JOINS = """
+    JOIN bet_legs bl ON bl.id = bsi.bet_leg_id
+    JOIN games g ON g.id = bl.game_id
+    LEFT JOIN bet_leg_results r ON r.bet_leg_id = bl.id
+"""
+
+
+def encode_cursor(bet_date, bet_id):
+    """Opaque token for the position just after this bet (``bet_date`` may be None)."""
+    raw = f"{bet_date.isoformat() if bet_date is not None else ''}|{bet_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    """(bet_date, bet_id) from ``encode_cursor``; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        bet_date, bet_id = raw.split("|")
+        return datetime.datetime.fromisoformat(bet_date) if bet_date else None, int(bet_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+def _keyset(user_id, after, limit):
+    if after is None:
+        return _BETS_FIRST, (user_id, limit)
+    bet_date, bet_id = after
+    if bet_date is None:
+        return _BETS_AFTER_UNDATED, (user_id, bet_id, limit)
+    return _BETS_AFTER, (user_id, bet_date, bet_date, bet_id, limit)
+
+def json_value(value):
+    """Decimals as exact strings and datetimes as ISO 8601, for JSON responses."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def fetch_page(conn, user_id, limit=HISTORY_PAGE_SIZE, after=None):
+    """One page of bets with their legs, and the cursor for the next page (or None)."""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    sql, params = _keyset(user_id, after, limit + 1)
+    with conn.cursor() as c:
+        c.execute(sql, params)
+        bets = c.fetchall()
+        has_more = len(bets) > limit
+        bets = bets[:limit]
+        if not bets:
+            return [], None
+
+        ids = [bet["id"] for bet in bets]
+        c.execute(f"""
+            SELECT bsi.bet_id, {_LEG_SELECT}
+            FROM bet_slip_items bsi {_LEG_JOINS}
+            WHERE bsi.bet_id IN ({", ".join(["%s"] * len(ids))})
+            ORDER BY bsi.bet_id, bsi.leg_order
+        """, ids)
+        legs = {}
+        for row in c.fetchall():
+            legs.setdefault(row.pop("bet_id"), []).append({k: json_value(v) for k, v in row.items()})
+
+    page = [{**{k: json_value(v) for k, v in bet.items()}, "legs": legs.get(bet["id"], [])} for bet in bets]
+    last = bets[-1]
+    return page, encode_cursor(last["bet_date"], last["id"]) if has_more else None
+
+
+def _export_sql(after):
+    page, _ = _keyset(None, after, None)
+    # The keyset picks whole bets; their legs are joined in the same scan
+    return f"""
+        SELECT b.id AS bet_id, b.bet_date, b.status, b.total_stake, b.total_odds, b.potential_win,
+               b.actual_payout, b.settled_date, b.parlay_id, {_LEG_SELECT}
+        FROM ({page}) b
+        LEFT JOIN bet_slip_items bsi ON bsi.bet_id = b.id
+        LEFT JOIN bet_legs bl ON bl.id = bsi.bet_leg_id
+        LEFT JOIN games g ON g.id = bl.game_id
+        LEFT JOIN bet_leg_results r ON r.bet_leg_id = bl.id
+        ORDER BY b.bet_date DESC, b.id DESC, bsi.leg_order
+    """
+
+def _csv_chunk(rows, header=False):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(CSV_HEADER)
+    for row in rows:
+        writer.writerow([json_value(row[col]) for col in CSV_HEADER])
+    return buf.getvalue()
+
+def _group_bets(rows, bet=None):
+    """Fold leg rows into bets; returns (finished bets, the bet still collecting legs)."""
+    done = []
+    for row in rows:
+        if bet is None or bet["id"] != row["bet_id"]:
+            if bet is not None:
+                done.append(bet)
+            bet = {col: json_value(row["bet_id" if col == "id" else col]) for col in BET_COLUMNS}
+            bet["legs"] = []
+        if row["leg_order"] is not None:
+            bet["legs"].append({col: json_value(row[col]) for col in LEG_COLUMNS})
+    return done, bet
+
+def _ndjson_chunk(bets):
+    return "".join(json.dumps(bet) + "\n" for bet in bets)
+
+def export_chunks(user_id, fmt="csv", chunk_size=HISTORY_EXPORT_CHUNK, connection=None,
+                  fetch_size=HISTORY_EXPORT_FETCH):
+    """Yield the user's whole history as CSV (one row per leg) or NDJSON (one bet per line).
+
+    Each chunk of ``chunk_size`` bets is read through an SSDictCursor on a
+    freshly borrowed pooled connection, ``fetch_size`` rows at a time, and
+    each batch is yielded as soon as it is read.
+    """
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    if connection is None:
+        from db import connection
+
+    after = None
+    first = True
+    while True:
+        sql = _export_sql(after)
+        params = _keyset(user_id, after, chunk_size)[1]
+        last, bets_in_chunk, bet = None, 0, None
+        with connection() as conn, conn.cursor(pymysql.cursors.SSDictCursor) as c:
+            c.execute(sql, params)
+            while True:
+                rows = c.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if last is None or row["bet_id"] != last["bet_id"]:
+                        bets_in_chunk += 1
+                    last = row
+                if fmt == "csv":
+                    yield _csv_chunk(rows, header=first)
+                    first = False
+                else:
+                    done, bet = _group_bets(rows, bet)
+                    if done:
+                        yield _ndjson_chunk(done)
+        # The keyset picks whole bets, so the last one has all its legs
+        if bet is not None:
+            yield _ndjson_chunk([bet])
+        if fmt == "csv" and first:
+            yield _csv_chunk([], header=True)
+            first = False
+
+        if last is None or bets_in_chunk < chunk_size:
+            return
+        after = (last["bet_date"], last["bet_id"])
@@ -0,0 +1,114 @@
+import re
+from functools import lru_cache, partial
+from typing import NamedTuple, Optional
+
+GREETINGS = frozenset(["hi", "hello", "hey"])
+DEFAULT_CATEGORIES = ("food", "entertainment", "bills")
+
+# Amounts like "200", "1,250.50", "$3000" or ".5"; thousands separators are dropped
+_AMOUNT_PATTERN = r"\d[\d,]*(?:\.\d+)?|\.\d+"
+_AMOUNT = re.compile(_AMOUNT_PATTERN)
+# Largest amount the budget columns hold (DECIMAL(12,2)); bigger ones are
+# treated as no amount
+MAX_AMOUNT = 9_999_999_999.99
+# Longer messages are parsed every time rather than cached, so the cache
+# holds at most 4096 short strings
+MAX_CACHED_MESSAGE = 256
+_SET_VERBS = re.compile(r"\b(?:update|set|change)")
+_SET_VERBS_WITH_MAKE = re.compile(r"\b(?:update|set|change|make)")
+
+
+class Intent(NamedTuple):
+    """A parsed chat command.
+
+    ``name`` is one of greet, help, reset, update, show or summary. For update,
+    ``target`` is income, expenses, savings or a category name, ``mode`` is
+    "set" or "add", and ``amount`` is None when the message had no number.
+    """
+    name: str
+    target: Optional[str] = None
+    mode: Optional[str] = None
+    amount: Optional[float] = None
+
+
+# Skips NamedTuple's keyword/default handling on the hot path
+_new_intent = partial(tuple.__new__, Intent)
+
+
+def parse_amount(text):
+    """Return the first amount in ``text`` as a float, or None (also when above MAX_AMOUNT)."""
+    match = _AMOUNT.search(text)
+    if match is None:
+        return None
+    amount = float(match.group(0).replace(",", ""))
+    # A long enough digit string parses to inf, which is above MAX_AMOUNT too
+    return amount if amount <= MAX_AMOUNT else None
+
+
+class IntentRouter:
+    """Maps chat messages to Intents with a single precompiled scan.
+
+    One regex pass finds every command keyword; only update commands go on to
+    look for a set-verb and an amount. Keywords are matched anywhere in the message (so "savings" hits "saving"),
+    and when several appear the highest-priority one wins, in the order:
+    help, reset, income, expenses, savings, categories, show. Set-verbs must
+    start a word, so "assets" does not read as "set".
+    """
+
+    def __init__(self, categories=DEFAULT_CATEGORIES):
+        self.categories = tuple(categories)
+        # keyword -> (priority, intent, set-verbs for updates)
+        self._rules = {
+            "help": (0, Intent("help"), None),
+            "reset": (1, Intent("reset"), None),
+            "income": (2, Intent("update", "income"), _SET_VERBS_WITH_MAKE),
+            "expense": (3, Intent("update", "expenses"), _SET_VERBS),
+            "saving": (4, Intent("update", "savings"), _SET_VERBS),
+        }
+        for i, category in enumerate(self.categories):
+            self._rules.setdefault(category, (5 + i, Intent("update", category), _SET_VERBS_WITH_MAKE))
+        show = (5 + len(self.categories), Intent("show"), None)
+        self._rules.setdefault("budget", show)
+        self._rules.setdefault("show", show)
+
+        # Longest first so overlapping keywords prefer the more specific one
+        keywords = sorted(self._rules, key=len, reverse=True)
+        self._keywords = re.compile("|".join(re.escape(k) for k in keywords))
+
+    def parse(self, message):
+        text = message.lower().strip()
+        if text in GREETINGS:
+            return GREET
+
+        best = None
+        for keyword in self._keywords.findall(text):
+            rule = self._rules[keyword]
+            if best is None or rule[0] < best[0]:
+                best = rule
+        if best is None:
+            return SUMMARY
+
+        _, intent, set_verbs = best
+        if set_verbs is None:
+            return intent
+        mode = "set" if set_verbs.search(text) else "add"
+        return _new_intent(("update", intent.target, mode, parse_amount(text)))
+
+GREET = Intent("greet")
+SUMMARY = Intent("summary")
+default_router = IntentRouter()
+
+def parse_intent(message):
+    """Parse with the default router; repeated messages are served from a cache.
+
+    The cache is keyed on the lowercased, stripped text, so "Show budget" and
+    "show budget " share an entry; messages over MAX_CACHED_MESSAGE skip it.
+    """
+    text = message.lower().strip()
+    if len(text) > MAX_CACHED_MESSAGE:
+        return default_router.parse(text)
+    return _parse_cached(text)
+
+@lru_cache(maxsize=4096)
+def _parse_cached(text):
+    return default_router.parse(text)
@@ -1,146 +1,91 @@
-from flask import Flask, render_template, request, jsonify, make_response, send_file
+from flask import Flask, render_template, request, jsonify, make_response, send_file, Response, stream_with_context
 import re
-from db import create_tables
+from db import connection, get_pool, PoolTimeout
+from migrations import check_schema, migrate
+from app import logic
+from app.logic import budget_cache_stats
+from app.model import warm_up, model_memory_stats
+from app.odds import to_decimal
+from app.simulate import (StakingPlan, simulate_bankroll, leg_probabilities,
+                          SIMULATION_MAX_PATHS, SIMULATION_MAX_BETS)
+from hashing import get_hasher, HasherBusy
+from token_cache import TokenCache
+from chat import handle_input
+from budget_state import get_budget_store
+from audit import log_event, get_audit_logger
+import metrics
+import profiling
+import history
+from recommendations import get_recommendation_feed
+from reference_data import get_reference_data
+import copy
 import datetime
 import os
 import jwt
-import bcrypt
 import pymysql
 import io
 import pyotp
 import qrcode
 
 app = Flask(__name__)
-conn = create_tables()
+
+# Schema changes are applied with `python migrations.py`; startup only checks
+# the version. AUTO_MIGRATE=1 applies pending migrations here instead, for
+# single-process development setups.
+if os.getenv("AUTO_MIGRATE") == "1":
+    migrate()
+    schema_version = True
+else:
+    schema_version = check_schema()
+
+# sports and bet_types are loaded once; skipped if the DB is down (they then
+# load on first use)
+if schema_version:
+    try:
+        get_reference_data().preload()
+    except Exception as e:
+        print("DB ERROR:", e)
 ALGORITHM = "HS256"
 SECRET_KEY = "TEST_SECRET" # CHANGE LATER!!!
-
-#defualt user info
-user_data = {
-    "income": 3000,
-    "expenses": 1500,
-    "savings": 200,
-    "categories": {
-        "food": 300,
-        "entertainment": 200,
-        "bills": 1000
-    }
-}
-
-def calculate_remaining_budget():
-    total_spent = sum(user_data["categories"].values()) + user_data["savings"]
-    return user_data["income"] - total_spent
-
-def handle_input(user_input):
-    text = user_input.lower().strip()
-
-    #Greet user
-    if text in ["hi", "hello", "hey"]:
-        return ("Hey there! I'm your AI Financial Assistant.<br>"
-                "You can ask me to:<br>"
-                "- Update your income or expenses<br>"
-                "- Add to food, bills, or entertainment<br>"
-                "- Type 'help' for a list of all commands!")
-
-    if "help" in text:
-        return ("Here's what you can say:<br>"
-                "- 'Show my budget'<br>"
-                "- 'Add 200 to food'<br>"
-                "- 'Update entertainment to 400'<br>"
-                "- 'Set income to 5000'<br>"
-                "- 'Update savings to 300'<br>"
-                "- 'Reset data'")
-
-    # reset data 
-    if "reset" in text:
-        user_data.update({
-            "income": 3000,
-            "expenses": 1500,
-            "savings": 200,
-            "categories": {"food": 300, "entertainment": 200, "bills": 1000}
-        })
-        return "All data reset to default values."
-
-    # update income
-    if "income" in text:
-        try:
-            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
-            if any(word in text for word in ["update", "set", "change", "make"]):
-                user_data["income"] = amount
-                return f"Income updated to ${amount:,.2f}."
-            else:
-                user_data["income"] += amount
-                return f"Added ${amount:,.2f} to income. Total: ${user_data['income']:,.2f}."
-        except:
-            return "Couldn't process income update."
-
-    # update expenses
-    if "expense" in text or "expenses" in text:
-        try:
-            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
-            if any(word in text for word in ["update", "set", "change"]):
-                user_data["expenses"] = amount
-                return f"Expenses updated to ${amount:,.2f}."
-            else:
-                user_data["expenses"] += amount
-                return f"Added ${amount:,.2f} to expenses. Total: ${user_data['expenses']:,.2f}."
-        except:
-            return "Couldn't process expenses update."
-
-    # update the savings
-    if "saving" in text or "savings" in text:
-        try:
-            amount = float("".join([c for c in text if c.isdigit() or c == "."]))
-            if any(word in text for word in ["update", "set", "change"]):
-                user_data["savings"] = amount
-                return f"Savings updated to ${amount:,.2f}."
-            else:
-                user_data["savings"] += amount
-                return f"Added ${amount:,.2f} to savings. Total: ${user_data['savings']:,.2f}."
-        except:
-            return "Couldn't process savings update."
-
-    # update categories
-    for category in user_data["categories"]:
-        if category in text:
-            try:
-                amount = float("".join([c for c in text if c.isdigit() or c == "."]))
-                if any(word in text for word in ["update", "set", "change", "make"]):
-                    user_data["categories"][category] = amount
-                    return f"{category.capitalize()} updated to ${amount:,.2f}."
-                else:
-                    user_data["categories"][category] += amount
-                    return f"Added ${amount:,.2f} to {category}. Total: ${user_data['categories'][category]:,.2f}."
-            except:
-                return f"Please specify a valid amount for {category}."
-
-    # show user budget
-    if "budget" in text or "show" in text:
-        remaining = calculate_remaining_budget()
-        category_breakdown = "<br>".join([f"- {k.capitalize()}: ${v:,.2f}" for k, v in user_data["categories"].items()])
-        return (f"Here's your budget breakdown:<br><br>"
-                f"<b>Income:</b> ${user_data['income']:,.2f}<br>"
-                f"<b>Expenses:</b> ${user_data['expenses']:,.2f}<br>"
-                f"<b>Savings:</b> ${user_data['savings']:,.2f}<br><br>"
-                f"{category_breakdown}<br><br>"
-                f"<b>Remaining:</b> ${remaining:,.2f}")
-
-    # default
-    remaining = calculate_remaining_budget()
-    return (f"Here's your quick financial summary:<br><br>"
-            f"- Income: ${user_data['income']:,.2f}<br>"
-            f"- Expenses: ${user_data['expenses']:,.2f}<br>"
-            f"- Savings: ${user_data['savings']:,.2f}<br>"
-            f"- Remaining budget: ${remaining:,.2f}<br><br>"
-            "Need help? Type <b>help</b> to see what else I can do.")
+token_cache = TokenCache()
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "10000"))
+
+# Per-route/per-query latency and the components' own counters on /metrics
+if metrics.METRICS_ENABLED:
+    metrics.init_app(app)
+    metrics.registry.add_stats("db_pool", lambda: get_pool().stats())
+    metrics.registry.add_stats("bcrypt", lambda: get_hasher().stats())
+    metrics.registry.add_stats("token_cache", token_cache.stats)
+    metrics.registry.add_stats("budget_cache", budget_cache_stats)
+    metrics.registry.add_stats("model_memory", model_memory_stats)
+    metrics.registry.add_stats("budget_store", lambda: get_budget_store().stats())
+    metrics.registry.add_stats("audit", lambda: get_audit_logger().stats())
+    metrics.registry.add_stats("recommendation_feed", lambda: get_recommendation_feed().stats())
+    # The flat counters; the games cache's own stats are nested, so they get their own prefix
+    metrics.registry.add_stats("reference", lambda: get_reference_data().stats())
+    metrics.registry.add_stats("reference_games", lambda: get_reference_data().stats()["games"])
+
+# Off unless PROFILE_SAMPLE_RATE or PROFILE_SLOW_MS is set; see profiling.py
+profiler = profiling.init_app(app)
+if profiler is not None and metrics.METRICS_ENABLED:
+    metrics.registry.add_stats("profiler", profiler.stats)
+
+# The budget model loads lazily on first use; set WARM_UP_MODEL=1 to load it
+# at import instead (e.g. in a pre-fork master so workers inherit it).
+if os.getenv("WARM_UP_MODEL") == "1":
+    warm_up()
+
+def _verify_jwt(token: str):
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
 def decode_token(token: str):
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
+    # Expired, revoked and invalid tokens all come back as None
+    return token_cache.verify(token, _verify_jwt)
+
+def revoke_token(token: str):
+    payload = decode_token(token) if token else None
+    if payload:
+        token_cache.revoke(token, payload["exp"])
 
 def create_temp_token(data: dict, expires_minutes=5):
     payload = data.copy()
@@ -185,16 +130,205 @@ def create_access_token(data: dict, expires_minutes: int = 60):
     payload["type"] = "access"
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
+def current_user():
+    """Claims of the logged-in user's access token, or None."""
+    token = request.cookies.get("token")
+    payload = decode_token(token) if token else None
+    if not payload or payload.get("type") != "access":
+        return None
+    return payload
+
+def audit(action, user_id=None, **fields):
+    """Queue an audit event for the current request; never blocks on MySQL."""
+    log_event(action, user_id=user_id, ip_address=request.remote_addr, **fields)
+
+@app.errorhandler(PoolTimeout)
+def db_busy(e):
+    print("DB POOL TIMEOUT:", e)
+    resp = make_response("Service busy, please retry.", 503)
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    resp = make_response("Too many login attempts in progress, please retry.", 503)
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
 @app.route("/")
 def index():
     return render_template("chat.html")
 
 @app.route("/chat", methods=["POST"])
 def chat():
+    user = current_user()
+    if not user or not user.get("user_id"):
+        return make_response("Unauthorized.", 401)
+
     user_message = request.json.get("message", "")
-    reply = handle_input(user_message)
+    user_id = user["user_id"]
+    with get_budget_store().edit(user_id) as user_data:
+        before = copy.deepcopy(user_data)
+        reply = handle_input(user_message, user_data)
+        if user_data != before:
+            audit("budget_update", user_id, entity_type="user_budget_state", entity_id=user_id,
+                  old_value=before, new_value=user_data)
     return jsonify({"response": reply})
 
+@app.route("/budget/batch", methods=["POST"])
+def budget_batch():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return make_response("Expected a JSON object.", 400)
+    rows = data.get("rows")
+    if rows is None:
+        rows = {k: v for k, v in data.items() if k != "rows"}
+
+    if not rows:
+        return make_response("Missing rows.", 400)
+
+    try:
+        count = len(rows) if not isinstance(rows, dict) else max(len(v) for v in rows.values())
+        if count > MAX_BATCH_ROWS:
+            return make_response(f"Too many rows (max {MAX_BATCH_ROWS}).", 413)
+        # Looked up on the module so the metrics wrapper sees the call
+        results = logic.suggest_budgets_batch(rows)
+    except (ValueError, TypeError) as e:
+        return make_response(str(e), 400)
+
+    return jsonify({"results": results})
+
+@app.route("/bets/history", methods=["GET"])
+def bet_history():
+    user = current_user()
+    if not user or not user.get("user_id"):
+        return make_response("Unauthorized.", 401)
+
+    try:
+        limit = int(request.args.get("limit", history.HISTORY_PAGE_SIZE))
+        cursor = request.args.get("cursor")
+        after = history.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return make_response(str(e), 400)
+
+    with connection() as conn:
+        bets, next_cursor = history.fetch_page(conn, user["user_id"], limit, after)
+    return jsonify({"bets": bets, "next_cursor": next_cursor})
+
+@app.route("/bets/export", methods=["GET"])
+def bet_export():
+    user = current_user()
+    if not user or not user.get("user_id"):
+        return make_response("Unauthorized.", 401)
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return make_response("Format must be csv or ndjson.", 400)
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    chunks = history.export_chunks(user["user_id"], fmt)
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=bets.{fmt}",
+    })
+
+@app.route("/sports", methods=["GET"])
+def sports():
+    return jsonify({"sports": get_reference_data().sports()})
+
+@app.route("/bet_types", methods=["GET"])
+def bet_types():
+    return jsonify({"bet_types": get_reference_data().bet_types()})
+
+@app.route("/games/upcoming", methods=["GET"])
+def upcoming_games():
+    sport_id = request.args.get("sport_id", type=int)
+    days = max(1, min(request.args.get("days", 7, type=int), 31))
+    games = get_reference_data().upcoming_games(sport_id, days)
+    return jsonify({"games": [{k: history.json_value(v) for k, v in game.items()} for game in games]})
+
+@app.route("/recommendations", methods=["GET"])
+def recommendations():
+    user = current_user()
+    if not user or not user.get("user_id"):
+        return make_response("Unauthorized.", 401)
+
+    try:
+        sport_id = request.args.get("sport_id", type=int)
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return make_response("Invalid limit.", 400)
+
+    recs = get_recommendation_feed().top(user["user_id"], sport_id, max(1, limit))
+    return jsonify({"recommendations": [{k: history.json_value(v) for k, v in rec.items()} for rec in recs]})
+
+def _simulation_legs(c, user_id, leg_ids):
+    # The given legs, or the legs of the user's most recent bets
+    if leg_ids:
+        c.execute(f"SELECT odds, odds_format FROM bet_legs WHERE id IN ({', '.join(['%s'] * len(leg_ids))})",
+                  leg_ids)
+    else:
+        c.execute("""
+            SELECT bl.odds, bl.odds_format
+            FROM bets b
+            JOIN bet_slip_items bsi ON bsi.bet_id = b.id
+            JOIN bet_legs bl ON bl.id = bsi.bet_leg_id
+            WHERE b.user_id = %s
+            ORDER BY b.bet_date DESC, b.id DESC
+            LIMIT 500
+        """, (user_id,))
+    rows = c.fetchall()
+    if not rows:
+        return None
+    # A NULL format is american, the column default
+    return to_decimal([float(r["odds"]) for r in rows], [r["odds_format"] or "american" for r in rows])
+
+@app.route("/bankroll/simulate", methods=["POST"])
+def bankroll_simulate():
+    user = current_user()
+    if not user or not user.get("user_id"):
+        return make_response("Unauthorized.", 401)
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return make_response("Expected a JSON object.", 400)
+    staking = data.get("staking") or {}
+    if not isinstance(staking, dict):
+        return make_response("Invalid simulation parameters.", 400)
+    try:
+        n_paths = int(data.get("paths", 20000))
+        n_bets = int(data.get("bets", 100))
+        plan = StakingPlan(staking.get("plan", "fraction"), float(staking.get("value", 0.02)))
+        edge = float(data.get("edge", 0))
+        leg_ids = [int(i) for i in data.get("bet_leg_ids") or []]
+        seed = data.get("seed")
+        seed = None if seed is None else int(seed)
+    except (ValueError, TypeError):
+        return make_response("Invalid simulation parameters.", 400)
+    if n_paths > SIMULATION_MAX_PATHS or n_bets > SIMULATION_MAX_BETS:
+        return make_response(f"At most {SIMULATION_MAX_PATHS} paths of {SIMULATION_MAX_BETS} bets.", 413)
+
+    with connection() as conn, conn.cursor() as c:
+        try:
+            decimal_odds = _simulation_legs(c, user["user_id"], leg_ids)
+        except ValueError as e:
+            return make_response(str(e), 400)
+        initial = data.get("initial")
+        if initial is None:
+            c.execute("SELECT current_balance FROM bankrolls WHERE user_id = %s", (user["user_id"],))
+            row = c.fetchone()
+            initial = row and row["current_balance"]
+    if decimal_odds is None:
+        return make_response("No bet legs to simulate.", 400)
+    if not initial:
+        return make_response("No bankroll to simulate.", 400)
+
+    try:
+        result = simulate_bankroll(float(initial), leg_probabilities(decimal_odds, edge), decimal_odds, plan,
+                                   n_bets=n_bets, n_paths=n_paths, seed=seed)
+    except (ValueError, TypeError) as e:
+        return make_response(str(e), 400)
+    return jsonify(result)
+
 @app.route("/mfa/setup", methods=["GET"])
 def mfa_setup():
     temp_token = request.cookies.get("temp_token")
@@ -208,9 +342,9 @@ def mfa_setup():
         return make_response("Invalid token payload.", 401)
 
     try:
-        with conn.cursor() as c:
+        with connection() as conn, conn.cursor() as c:
             c.execute(
-                "SELECT mfa_secret FROM users WHERE email = %s",
+                "SELECT id, mfa_secret FROM users WHERE email = %s",
                 (email,)
             )
             user = c.fetchone()
@@ -226,7 +360,12 @@ def mfa_setup():
                 "UPDATE users SET mfa_secret = %s WHERE email = %s",
                 (secret, email)
             )
-        conn.commit()
+            conn.commit()
+
+        audit("mfa_enabled", user["id"], entity_type="users", entity_id=user["id"])
+
+    except PoolTimeout:
+        raise
 
     except Exception as e:
         print("DB ERROR:", e)
@@ -263,9 +402,9 @@ def mfa_validate():
     if not email:
         return make_response("Invalid token payload.", 401)
 
-    with conn.cursor() as c:
+    with connection() as conn, conn.cursor() as c:
         c.execute(
-            "SELECT email, mfa_secret FROM users WHERE email = %s",
+            "SELECT id, email, mfa_secret FROM users WHERE email = %s",
             (email,)
         )
         user = c.fetchone()
@@ -275,10 +414,14 @@ def mfa_validate():
 
     totp = pyotp.TOTP(user["mfa_secret"])
     if not totp.verify(code, valid_window=1):
+        audit("mfa_failed", user["id"], entity_type="users", entity_id=user["id"])
         return make_response("Invalid MFA code.", 401)
 
+    audit("mfa_verified", user["id"], entity_type="users", entity_id=user["id"])
+
     access_token = create_access_token({
         "email": user["email"],
+        "user_id": user["id"],
     })
 
     resp = make_response('{"status":"ok","mfa":false}', 200)
@@ -331,16 +474,21 @@ def login():
     if not email or not password:
         return make_response("Missing email or password.", 400)
 
-    with conn.cursor() as c:
+    with connection() as conn, conn.cursor() as c:
         c.execute("SELECT * FROM users WHERE email = %s", (email,))
         user = c.fetchone()
 
     if not user:
+        audit("login_failed", new_value={"email": email})
         return make_response("Invalid email or password.", 401)
 
-    if not bcrypt.checkpw(password.encode(), user["password_hash"].encode()):
+    if not get_hasher().check_password(password, user["password_hash"]):
+        audit("login_failed", user["id"], entity_type="users", entity_id=user["id"])
         return make_response("Invalid email or password.", 401)
 
+    audit("login", user["id"], entity_type="users", entity_id=user["id"],
+          new_value={"mfa_enrolled": bool(user.get("mfa_secret"))})
+
     if not user.get("mfa_secret"):
         temp_token = create_temp_token({
             "email": user["email"],
@@ -396,32 +544,42 @@ def register():
         return make_response("Password must be at least 8 characters.", 400)
 
     email = email.strip().lower()
-    password_hash = bcrypt.hashpw(
-        password.encode(),
-        bcrypt.gensalt()
-    ).decode()
+    password_hash = get_hasher().hash_password(password)
 
     try:
-        with conn.cursor() as c:
+        with connection() as conn, conn.cursor() as c:
             c.execute(
                 "INSERT INTO users (email, password_hash) VALUES (%s, %s)",
                 (email, password_hash)
             )
-        conn.commit()
+            user_id = c.lastrowid
+            conn.commit()
 
     except pymysql.err.IntegrityError:
         return make_response("Email already exists.", 409)
 
+    except PoolTimeout:
+        raise
+
     except Exception as e:
         print("DB ERROR:", e)
         return make_response("Internal server error.", 500)
 
+    audit("register", user_id, entity_type="users", entity_id=user_id, new_value={"email": email})
+
     resp = make_response('{"status":"ok"}', 200)
     resp.headers["Content-Type"] = "application/json"
     return resp
 
 @app.route("/logout", methods=["POST"])
 def logout():
+    user = current_user()
+    if user:
+        audit("logout", user.get("user_id"))
+
+    revoke_token(request.cookies.get("token"))
+    revoke_token(request.cookies.get("temp_token"))
+
     resp = make_response('{"status":"logged_out"}', 200)
     resp.headers["Content-Type"] = "application/json"
     resp.delete_cookie(
@@ -435,4 +593,5 @@ def logout():
     return resp
 
 if __name__ == "__main__":
+    warm_up()
     app.run(host="localhost", port=3000, debug=True)
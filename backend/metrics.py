@@ -0,0 +1,277 @@
+"""Request, query and model metrics in Prometheus text format.
+
+Flask hooks time every request per route (the URL rule, not the raw path, so
+label values stay bounded) and track in-flight requests and errors. The
+MySQL cursor times every statement, labelled "<VERB> <table>". The budget
+model's entry points, cached predictions and raw predict calls are timed
+too. The stats() counters
+the pools and caches already keep are exported as gauges when /metrics is
+scraped.
+
+Each observation is a bisect and a short locked update, cheap enough to
+leave on. METRICS_ENABLED=0 turns all of it off. Every worker process keeps
+its own registry, so scrape each worker.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+NAMESPACE = "clutchcall"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # Per-bucket counts, then sum; cumulated when rendered
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def _samples(self, items):
+        lines = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    """Metrics plus stats() callables exported as gauges at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(self, prefix, stats):
+        """Export the numeric values of ``stats()`` as ``<prefix>_<key>`` gauges."""
+        self._stats.append((prefix, stats))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._stats:
+            try:
+                values = stats()
+            except Exception as e:
+                print("METRICS STATS ERROR:", prefix, e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{NAMESPACE}_{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method")))
+REQUEST_ERRORS = registry.register(Counter(
+    "http_request_exceptions_total", "Requests that raised, by route and exception type.", ("route", "exception")))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being handled, by route.", ("route",)))
+QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "MySQL statement latency by statement kind and table.", ("query",)))
+QUERY_ERRORS = registry.register(Counter(
+    "db_query_errors_total", "MySQL statements that raised, by statement kind and table.", ("query",)))
+MODEL_SECONDS = registry.register(Histogram(
+    "model_call_duration_seconds", "Budget model latency by function.", ("function",)))
+
+
+_QUERY_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|JOIN)\s+`?(\w+)", re.IGNORECASE)
+_query_labels = {}
+MAX_QUERY_LABELS = 2048
+
+def query_label(sql):
+    """Label a statement by its verb and first table, e.g. "SELECT bets"."""
+    label = _query_labels.get(sql)
+    if label is not None:
+        return label
+    text = sql.decode(errors="replace") if isinstance(sql, bytes) else str(sql)
+    words = text.split(None, 1)
+    verb = words[0].upper() if words else "EMPTY"
+    table = _QUERY_TABLE.search(text)
+    label = f"{verb} {table.group(1)}" if table else verb
+    # Statements built with variable-length IN lists or multi-row VALUES
+    # would grow this forever
+    if len(_query_labels) < MAX_QUERY_LABELS and len(text) <= 4096:
+        _query_labels[sql] = label
+    return label
+
+def observe_query(sql, seconds, failed=False):
+    label = query_label(sql)
+    QUERY_SECONDS.observe(seconds, label)
+    if failed:
+        QUERY_ERRORS.inc(label)
+
+
+def timed(histogram, label, fn):
+    """Wrap ``fn`` so each call is observed in ``histogram`` under ``label``."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start, label)
+    wrapper.__wrapped__ = fn
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+def instrument_budget_model():
+    """Time the budget functions, which callers look up on app.logic.
+
+    Routes call suggest_budgets_batch; single questions go through
+    _cached_predict (hits included) and both reach the model via _predict.
+    """
+    from app import logic
+
+    for name in ("suggest_budget", "suggest_budgets_batch", "_cached_predict", "_predict"):
+        fn = getattr(logic, name)
+        if not hasattr(fn, "__wrapped__"):
+            setattr(logic, name, timed(MODEL_SECONDS, name.lstrip("_"), fn))
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics route on a Flask app."""
+    from flask import Response, g, request
+
+    def route():
+        return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_route = route()
+        g._metrics_start = time.perf_counter()
+        IN_FLIGHT.inc(g._metrics_route)
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    # Teardown runs once per request, after a streamed body has been sent
+    @app.teardown_request
+    def _record_request(exc):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        route_name = g.pop("_metrics_route")
+        status = g.pop("_metrics_status", 500)
+        IN_FLIGHT.dec(route_name)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route_name, request.method)
+        REQUESTS.inc(route_name, request.method, str(status))
+        if exc is not None:
+            REQUEST_ERRORS.inc(route_name, type(exc).__name__)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(registry.render(), mimetype=CONTENT_TYPE)
+
+    instrument_budget_model()
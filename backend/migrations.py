@@ -0,0 +1,502 @@
+"""Versioned schema migrations.
+
+Each migration is applied once and recorded in schema_version. Migrations are
+an explicit deploy step; app processes only check the version at startup.
+
+    python migrations.py                 # apply pending migrations
+    python migrations.py --target N      # apply up to version N
+    python migrations.py status          # show current and latest version
+
+To change the schema, append a Migration to MIGRATIONS; never edit one that
+has already shipped.
+"""
+import argparse
+import os
+import sys
+from typing import NamedTuple
+
+import pymysql
+
+from db import connection, get_connection
+
+MIGRATE_LOCK = "clutchcall_schema_migrations"
+MIGRATE_LOCK_TIMEOUT = int(os.getenv("MIGRATE_LOCK_TIMEOUT", "60"))
+# MySQL "Table doesn't exist"
+ER_NO_SUCH_TABLE = 1146
+
+
+class MigrationError(Exception):
+    """Migrations could not be applied."""
+
+
+class AddIndex(NamedTuple):
+    """ALTER TABLE ... ADD INDEX, skipped if the index already exists.
+
+    MySQL has no ADD INDEX IF NOT EXISTS, and DDL commits on its own, so a
+    run that dies after the ALTER but before recording the version would
+    otherwise fail with "Duplicate key name" on every retry.
+    """
+    table: str
+    name: str
+    columns: str
+
+    def sql(self):
+        return f"ALTER TABLE {self.table} ADD INDEX {self.name} ({self.columns})"
+
+
+class AddColumn(NamedTuple):
+    """ALTER TABLE ... ADD COLUMN, skipped if the column already exists (see AddIndex)."""
+    table: str
+    name: str
+    definition: str
+
+    def sql(self):
+        return f"ALTER TABLE {self.table} ADD COLUMN {self.name} {self.definition}"
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: list  # SQL strings, AddIndex and AddColumn
+
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        mfa_secret CHAR(32) UNIQUE DEFAULT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bankrolls (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        current_balance DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+        initial_bankroll DECIMAL(12,2) NOT NULL,
+        peak_balance DECIMAL(12,2),
+        lowest_balance DECIMAL(12,2),
+        total_wagered DECIMAL(12,2) DEFAULT 0.00,
+        total_won DECIMAL(12,2) DEFAULT 0.00,
+        total_lost DECIMAL(12,2) DEFAULT 0.00,
+        roi DECIMAL(5,2) DEFAULT 0.00,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_user_bankroll (user_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sports (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        sport_name VARCHAR(100) UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        sport_id INT NOT NULL,
+        game_name VARCHAR(255) NOT NULL,
+        team_a VARCHAR(100) NOT NULL,
+        team_b VARCHAR(100) NOT NULL,
+        game_date DATETIME NOT NULL,
+        status ENUM('scheduled','live','completed','cancelled') DEFAULT 'scheduled',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (sport_id) REFERENCES sports(id) ON DELETE CASCADE,
+        INDEX idx_sport_date (sport_id, game_date),
+        INDEX idx_status (status)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_types (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        type_name VARCHAR(50) UNIQUE NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_legs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        game_id INT NOT NULL,
+        bet_type_id INT NOT NULL,
+        selection VARCHAR(255) NOT NULL,
+        odds DECIMAL(8,2) NOT NULL,
+        odds_format ENUM('american','decimal','fractional') DEFAULT 'american',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (game_id) REFERENCES games(id) ON DELETE CASCADE,
+        FOREIGN KEY (bet_type_id) REFERENCES bet_types(id) ON DELETE CASCADE,
+        INDEX idx_game (game_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bets (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        bankroll_id INT NOT NULL,
+        parlay_id INT,
+        total_stake DECIMAL(12,2) NOT NULL,
+        total_odds DECIMAL(10,2),
+        potential_win DECIMAL(12,2),
+        actual_payout DECIMAL(12,2),
+        status ENUM('pending','won','lost','cancelled','push') DEFAULT 'pending',
+        bet_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+        settled_date DATETIME,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (bankroll_id) REFERENCES bankrolls(id) ON DELETE CASCADE,
+        FOREIGN KEY (parlay_id) REFERENCES bets(id) ON DELETE SET NULL,
+        INDEX idx_user_status (user_id, status),
+        INDEX idx_bet_date (bet_date),
+        INDEX idx_settled_date (settled_date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_slip_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        bet_id INT NOT NULL,
+        bet_leg_id INT NOT NULL,
+        leg_order INT NOT NULL,
+        stake DECIMAL(12,2),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_bet_leg (bet_id, bet_leg_id),
+        FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE CASCADE,
+        FOREIGN KEY (bet_leg_id) REFERENCES bet_legs(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ai_recommendations (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        game_id INT,
+        bet_leg_id INT,
+        sport_id INT NOT NULL,
+        game_name VARCHAR(255) NOT NULL,
+        selection VARCHAR(255) NOT NULL,
+        odds DECIMAL(8,2) NOT NULL,
+        confidence_score DECIMAL(5,2) NOT NULL,
+        recommended_stake DECIMAL(5,2),
+        analysis TEXT,
+        ai_model VARCHAR(100),
+        is_used BOOLEAN DEFAULT FALSE,
+        bet_id INT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+        FOREIGN KEY (game_id) REFERENCES games(id) ON DELETE SET NULL,
+        FOREIGN KEY (sport_id) REFERENCES sports(id) ON DELETE CASCADE,
+        FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE SET NULL,
+        INDEX idx_user_created (user_id, created_at),
+        INDEX idx_confidence (confidence_score)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_statistics (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        total_bets INT DEFAULT 0,
+        winning_bets INT DEFAULT 0,
+        losing_bets INT DEFAULT 0,
+        cancelled_bets INT DEFAULT 0,
+        win_rate DECIMAL(5,2) DEFAULT 0.00,
+        average_odds DECIMAL(8,2),
+        total_wagered DECIMAL(12,2) DEFAULT 0.00,
+        total_returned DECIMAL(12,2) DEFAULT 0.00,
+        gross_profit DECIMAL(12,2) DEFAULT 0.00,
+        roi DECIMAL(5,2) DEFAULT 0.00,
+        longest_win_streak INT DEFAULT 0,
+        longest_loss_streak INT DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_user_stats (user_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_analysis (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        bet_id INT NOT NULL,
+        quality_score DECIMAL(5,2),
+        ai_analysis TEXT,
+        user_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_bet_analysis (bet_id),
+        FOREIGN KEY (bet_id) REFERENCES bets(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS budget_recommendations (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        income DECIMAL(12,2) NOT NULL,
+        fixed_expenses DECIMAL(12,2) NOT NULL,
+        savings_goal DECIMAL(12,2) NOT NULL,
+        months_to_goal INT NOT NULL,
+        food_budget DECIMAL(12,2),
+        entertainment_budget DECIMAL(12,2),
+        shopping_budget DECIMAL(12,2),
+        monthly_savings DECIMAL(12,2),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        INDEX idx_user_created (user_id, created_at)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS audit_logs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        action VARCHAR(255) NOT NULL,
+        entity_type VARCHAR(100),
+        entity_id INT,
+        old_value JSON,
+        new_value JSON,
+        ip_address VARCHAR(45),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+        INDEX idx_user_action (user_id, action),
+        INDEX idx_created_at (created_at)
+    )
+    """,
+    """
+    INSERT IGNORE INTO bet_types (type_name, description) VALUES
+    ('Moneyline','Pick the winner'),
+    ('Spread','Pick a team to win by a margin'),
+    ('Total','Over/Under total score'),
+    ('Parlay','Multiple bets combined'),
+    ('Prop Bet','Specific events'),
+    ('Futures','Future outcome bets')
+    """,
+    """
+    INSERT IGNORE INTO sports (sport_name) VALUES
+    ('NBA'),('NFL'),('NHL'),('MLB'),('Soccer')
+    """,
+]
+
+BUDGET_STATE = [
+    """
+    CREATE TABLE IF NOT EXISTS user_budget_state (
+        user_id INT PRIMARY KEY,
+        income DECIMAL(12,2) NOT NULL,
+        expenses DECIMAL(12,2) NOT NULL,
+        savings DECIMAL(12,2) NOT NULL,
+        categories JSON NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+BET_STATISTICS_STATE = [
+    """
+    CREATE TABLE IF NOT EXISTS bet_statistics_state (
+        user_id INT PRIMARY KEY,
+        current_streak INT NOT NULL DEFAULT 0,
+        odds_sum DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+        odds_count INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+BET_LEG_RESULTS = [
+    """
+    CREATE TABLE IF NOT EXISTS bet_leg_results (
+        bet_leg_id INT PRIMARY KEY,
+        result ENUM('won','lost','push','cancelled') NOT NULL,
+        settled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (bet_leg_id) REFERENCES bet_legs(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+BETS_HISTORY_INDEX = [
+    AddIndex("bets", "idx_user_bet_date", "user_id, bet_date, id"),
+]
+
+RECOMMENDATION_FEED_INDEX = [
+    AddIndex("ai_recommendations", "idx_user_feed", "user_id, is_used, sport_id, confidence_score"),
+]
+
+GAMES_UPDATED_INDEX = [
+    AddIndex("games", "idx_updated_at", "updated_at"),
+]
+
+RECOMMENDED_STAKE_AMOUNT = [
+    """
+    ALTER TABLE ai_recommendations MODIFY recommended_stake DECIMAL(12,2)
+    """,
+]
+
+# Compare-and-set token for the write-behind budget store (see budget_state)
+BUDGET_STATE_VERSION = [
+    AddColumn("user_budget_state", "version", "BIGINT NOT NULL DEFAULT 0"),
+]
+
+# One global order for settled bets, shared by incremental stats and recomputes
+# (see settlement._write_bets and bet_stats.settlement_order)
+SETTLEMENT_SEQUENCE = [
+    AddColumn("bets", "settlement_seq", "BIGINT NULL"),
+    """
+    CREATE TABLE IF NOT EXISTS settlement_sequence (
+        id TINYINT PRIMARY KEY,
+        last_value BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    INSERT IGNORE INTO settlement_sequence (id, last_value) VALUES (1, 0)
+    """,
+]
+
+# Logouts shared by every worker's token cache (see token_cache); expires_at
+# is the token's exp as a Unix time
+REVOKED_TOKENS = [
+    """
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        token_hash BINARY(32) PRIMARY KEY,
+        expires_at BIGINT NOT NULL,
+        INDEX idx_expires_at (expires_at)
+    )
+    """,
+]
+
+MIGRATIONS = [
+    Migration(1, "base schema and seed data", BASE_SCHEMA),
+    Migration(2, "user_budget_state", BUDGET_STATE),
+    Migration(3, "bet_statistics_state", BET_STATISTICS_STATE),
+    Migration(4, "bet_leg_results", BET_LEG_RESULTS),
+    Migration(5, "keyset index for bet history", BETS_HISTORY_INDEX),
+    Migration(6, "index for the recommendation feed", RECOMMENDATION_FEED_INDEX),
+    Migration(7, "index for polling changed games", GAMES_UPDATED_INDEX),
+    Migration(8, "recommended_stake sized like bankroll amounts", RECOMMENDED_STAKE_AMOUNT),
+    Migration(9, "version column for budget state writes", BUDGET_STATE_VERSION),
+    Migration(10, "settlement order for bet statistics", SETTLEMENT_SEQUENCE),
+    Migration(11, "revoked_tokens shared by all workers", REVOKED_TOKENS),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+_SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def current_version(cursor):
+    """Highest applied migration, 0 for a database that predates schema_version."""
+    try:
+        cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+    except pymysql.err.ProgrammingError as e:
+        if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    row = cursor.fetchone()
+    return (row and row["version"]) or 0
+
+def pending_migrations(version, target=None):
+    return [m for m in MIGRATIONS if m.version > version and (target is None or m.version <= target)]
+
+def _apply(cursor, statement):
+    if isinstance(statement, (AddIndex, AddColumn)):
+        catalog, key = (("statistics", "index_name") if isinstance(statement, AddIndex)
+                        else ("columns", "column_name"))
+        cursor.execute(f"""
+            SELECT 1 FROM information_schema.{catalog}
+            WHERE table_schema = DATABASE() AND table_name = %s AND {key} = %s
+            LIMIT 1
+        """, (statement.table, statement.name))
+        if cursor.fetchone():
+            return
+        statement = statement.sql()
+    cursor.execute(statement)
+
+def migrate(conn=None, target=None, log=print):
+    """Apply pending migrations (up to ``target``) and return their versions.
+
+    Holds a MySQL named lock while running so concurrent deploy jobs apply
+    each migration once. Every statement is safe to re-run (IF NOT EXISTS,
+    INSERT IGNORE, the existence checks of AddIndex and AddColumn, MODIFY
+    to the same type), so a database created before schema_version existed
+    is brought under version control by simply running all of them, and a
+    run interrupted mid-migration (MySQL DDL commits implicitly) can be
+    retried.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    applied = []
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATE_LOCK, MIGRATE_LOCK_TIMEOUT))
+            if not (c.fetchone() or {}).get("locked"):
+                raise MigrationError(f"Timed out after {MIGRATE_LOCK_TIMEOUT}s waiting for another migration run")
+            try:
+                c.execute(_SCHEMA_VERSION_DDL)
+                for migration in pending_migrations(current_version(c), target):
+                    for statement in migration.statements:
+                        _apply(c, statement)
+                    c.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                              (migration.version, migration.description))
+                    conn.commit()
+                    applied.append(migration.version)
+                    log(f"✅ Applied migration {migration.version}: {migration.description}")
+            finally:
+                c.execute("SELECT RELEASE_LOCK(%s)", (MIGRATE_LOCK,))
+    finally:
+        if own_conn:
+            conn.close()
+    return applied
+
+def check_schema(log=print):
+    """Startup check: one query, no DDL.
+
+    Returns the database's schema version, or None if the database could not
+    be reached (the app still starts; requests fail until it is back).
+    """
+    try:
+        with connection() as conn, conn.cursor() as c:
+            version = current_version(c)
+    except Exception as e:
+        log("DB ERROR:", e)
+        return None
+    if version < LATEST_VERSION:
+        log(f"⚠️ Database schema is at version {version}, expected {LATEST_VERSION}. "
+            f"Run `python migrations.py` to upgrade.")
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("command", nargs="?", choices=("migrate", "status"), default="migrate")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        conn = get_connection(create_db_if_missing=False)
+        try:
+            with conn.cursor() as c:
+                version = current_version(c)
+        finally:
+            conn.close()
+        print(f"Schema version {version} (latest {LATEST_VERSION})")
+        for migration in pending_migrations(version):
+            print(f"  pending {migration.version}: {migration.description}")
+        return 0
+
+    applied = migrate(target=args.target)
+    if not applied:
+        print(f"✅ Schema already current (version {LATEST_VERSION})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
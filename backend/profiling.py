@@ -0,0 +1,209 @@
+"""Opt-in profiling of sampled and slow requests.
+
+PROFILE_SAMPLE_RATE runs that fraction of requests under cProfile and saves
+a .prof file (open with ``python -m pstats`` or snakeviz). PROFILE_SLOW_MS
+watches every request with a stack sampler thread. Any request that takes
+longer than the threshold has its samples saved as a .folded file of
+collapsed stacks, the input flamegraph.pl and speedscope take. Files are
+named after the time, route and request ID and land in PROFILE_DIR. Only the
+newest PROFILE_MAX_FILES are kept.
+
+With both settings at 0 (the default) ``init_app`` installs nothing, so
+requests pay no cost. Responses carry the request ID in X-Request-ID so a
+slow response can be matched with its profile.
+"""
+import cProfile
+import datetime
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(Path(__file__).parent / "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+# Client-supplied request IDs end up in file names
+_REQUEST_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame):
+    """The frame's stack as "outer;...;inner", the collapsed flame graph format."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class _Request:
+    __slots__ = ("request_id", "route", "start", "thread_id", "profile", "samples")
+
+    def __init__(self, request_id, route, thread_id):
+        self.request_id = request_id
+        self.route = route
+        self.thread_id = thread_id
+        self.start = time.perf_counter()
+        self.profile = None
+        self.samples = None
+
+
+class RequestProfiler:
+    """Profiles a random sample of requests and keeps stacks of slow ones."""
+
+    def __init__(self, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, slow_ms=PROFILE_SLOW_MS,
+                 max_files=PROFILE_MAX_FILES, interval=PROFILE_INTERVAL):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_files = max_files
+        self.interval = interval
+        self._active = {}  # thread id -> _Request being stack-sampled
+        self._lock = threading.Lock()
+        # One cProfile at a time: from 3.12 it hooks every thread, and it
+        # bounds the overhead however many requests are sampled
+        self._cprofile_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._counts = {"profiled": 0, "slow": 0, "written": 0, "skipped": 0}
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def start(self, route, request_id=None):
+        """Begin watching the current thread's request; returns a handle for ``finish``."""
+        if not request_id or not _REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex[:16]
+        req = _Request(request_id, route, threading.get_ident())
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            if self._cprofile_lock.acquire(blocking=False):
+                req.profile = cProfile.Profile()
+                req.profile.enable()
+            else:
+                self._count("skipped")
+        if self.slow_ms > 0:
+            req.samples = Counter()
+            self._ensure_sampler()
+            with self._lock:
+                self._active[req.thread_id] = req
+        return req
+
+    def finish(self, req):
+        """Stop watching; write the profile if sampled and the stacks if slow. Returns the paths written."""
+        elapsed_ms = (time.perf_counter() - req.start) * 1000
+        written = []
+        if req.samples is not None:
+            with self._lock:
+                self._active.pop(req.thread_id, None)
+        if req.profile is not None:
+            req.profile.disable()
+            self._cprofile_lock.release()
+            self._count("profiled")
+            written.append(self._write(req, elapsed_ms, "prof", req.profile.dump_stats))
+        if req.samples is not None and elapsed_ms >= self.slow_ms:
+            self._count("slow")
+            with self._lock:
+                lines = "".join(f"{stack} {count}\n" for stack, count in req.samples.most_common())
+            written.append(self._write(req, elapsed_ms, "folded", lambda path: Path(path).write_text(lines)))
+        return [path for path in written if path is not None]
+
+    def sample(self):
+        """Record one stack sample for every watched request."""
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, req in self._active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    req.samples[collapse_stack(frame)] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"active": len(self._active), **self._counts}
+
+    def close(self):
+        self._stop.set()
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def _write(self, req, elapsed_ms, suffix, dump):
+        route = re.sub(r"[^A-Za-z0-9]+", "_", req.route).strip("_") or "root"
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = self.directory / f"{stamp}-{route}-{req.request_id}-{elapsed_ms:.0f}ms.{suffix}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            dump(str(path))
+            self._count("written")
+            self._rotate()
+            return path
+        except OSError as e:
+            print("PROFILE WRITE ERROR:", e)
+            return None
+
+    def _rotate(self):
+        # Names start with the timestamp, so name order is age order
+        files = sorted(p for p in self.directory.iterdir() if p.suffix in (".prof", ".folded"))
+        for old in files[:max(0, len(files) - self.max_files)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def _ensure_sampler(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="request-stack-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._active:
+                try:
+                    self.sample()
+                except Exception as e:
+                    print("PROFILE SAMPLE ERROR:", e)
+
+
+def init_app(app, profiler=None):
+    """Install the profiling hooks on a Flask app if profiling is configured."""
+    profiler = profiler or RequestProfiler()
+    if not profiler.enabled:
+        return None
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g._profile = profiler.start(route, request.headers.get("X-Request-ID"))
+
+    @app.after_request
+    def _tag_response(response):
+        req = g.get("_profile")
+        if req is not None:
+            response.headers["X-Request-ID"] = req.request_id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        req = g.pop("_profile", None)
+        if req is not None:
+            profiler.finish(req)
+
+    return profiler
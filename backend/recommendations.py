@@ -0,0 +1,272 @@
+"""Home-screen feed of AI recommendations.
+
+Each (user, sport) feed is kept in memory as a list sorted by confidence, so
+serving the top N is a slice. A feed is loaded on first use with an
+index-backed query (idx_user_feed). After that it is updated in place as
+recommendations are added or used and as games leave the schedule, instead of
+being re-sorted per request. Feeds also expire after RECOMMENDATION_FEED_TTL
+seconds so that changes written by other worker processes show up.
+sport_id None is the user's feed across all sports.
+"""
+import datetime
+import os
+import threading
+from bisect import bisect_left, insort
+from decimal import Decimal
+
+from app.cache import LRUCache
+
+RECOMMENDATION_FEEDS = int(os.getenv("RECOMMENDATION_FEEDS", "20000"))
+RECOMMENDATION_FEED_DEPTH = int(os.getenv("RECOMMENDATION_FEED_DEPTH", "50"))
+RECOMMENDATION_FEED_TTL = float(os.getenv("RECOMMENDATION_FEED_TTL", "60"))
+RECOMMENDATION_LIMIT = 10
+
+FEED_COLUMNS = ("id", "user_id", "sport_id", "game_id", "game_name", "selection", "odds",
+                "confidence_score", "recommended_stake", "created_at", "game_date")
+
+_FEED_SQL = """
+    SELECT r.id, r.user_id, r.sport_id, r.game_id, r.game_name, r.selection, r.odds,
+           r.confidence_score, r.recommended_stake, r.created_at, g.game_date
+    FROM ai_recommendations r
+    JOIN games g ON g.id = r.game_id
+    WHERE r.user_id = %s AND r.is_used = FALSE{sport_filter}
+      AND g.status = 'scheduled' AND g.game_date > %s
+    ORDER BY r.confidence_score DESC, r.id DESC
+    LIMIT %s
+"""
+
+
+def load_feed_from_db(user_id, sport_id, limit, now):
+    """Top ``limit`` unused recommendations on upcoming games, best first."""
+    from db import connection
+
+    sport_filter = "" if sport_id is None else " AND r.sport_id = %s"
+    params = (user_id,) + (() if sport_id is None else (sport_id,)) + (now, limit)
+    with connection() as conn, conn.cursor() as c:
+        c.execute(_FEED_SQL.format(sport_filter=sport_filter), params)
+        return c.fetchall()
+
+
+def _sort_key(rec):
+    # Highest confidence first, newest first among equals
+    return (-float(rec["confidence_score"]), -rec["id"])
+
+
+class _Feed:
+    def __init__(self, rows, depth):
+        self.keys = sorted(_sort_key(row) for row in rows)
+        self.items = {row["id"]: row for row in rows}
+        # A full page from the DB means there may be more rows behind it
+        self.complete = len(rows) < depth
+
+    def add(self, rec, depth):
+        if rec["id"] in self.items:
+            return
+        key = _sort_key(rec)
+        if not self.complete and self.keys and key > self.keys[-1]:
+            return  # below the cut-off; the DB still has it if we need it
+        insort(self.keys, key)
+        self.items[rec["id"]] = rec
+        if len(self.keys) > depth:
+            dropped = self.keys.pop()
+            del self.items[-dropped[1]]
+            self.complete = False
+
+    def discard(self, rec_id):
+        rec = self.items.pop(rec_id, None)
+        if rec is None:
+            return False
+        key = _sort_key(rec)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+        return True
+
+
+class RecommendationFeed:
+    """Per-(user, sport) top-N recommendation index."""
+
+    def __init__(self, load=load_feed_from_db, max_feeds=RECOMMENDATION_FEEDS,
+                 depth=RECOMMENDATION_FEED_DEPTH, ttl=RECOMMENDATION_FEED_TTL):
+        self._load = load
+        self.depth = depth
+        self._feeds = LRUCache(max_feeds, ttl)
+        self._lock = threading.Lock()
+
+    def top(self, user_id, sport_id=None, n=RECOMMENDATION_LIMIT, now=None):
+        """The user's best ``n`` unused recommendations on games that haven't started."""
+        now = now or datetime.datetime.now()
+        n = min(n, self.depth)
+        for _ in range(2):
+            feed = self._feeds.get((user_id, sport_id))
+            if feed is None:
+                feed = self._install(user_id, sport_id, now)
+            with self._lock:
+                result, expired = [], []
+                for key in feed.keys:
+                    rec = feed.items[-key[1]]
+                    if rec["game_date"] <= now:
+                        expired.append(rec["id"])
+                        continue
+                    result.append(rec)
+                    if len(result) == n:
+                        break
+                for rec_id in expired:
+                    feed.discard(rec_id)
+                short = len(result) < n and not feed.complete
+            if not short:
+                return [dict(rec) for rec in result]
+            # Used/expired entries ate into the cached depth; reload once
+            self._feeds.pop((user_id, sport_id))
+        return [dict(rec) for rec in result]
+
+    def add(self, rec):
+        """Index a newly inserted recommendation in any loaded feeds it belongs to."""
+        with self._lock:
+            for sport_id in (rec["sport_id"], None):
+                feed = self._feeds.get((rec["user_id"], sport_id))
+                if feed is not None:
+                    feed.add(rec, self.depth)
+
+    def discard(self, user_id, sport_id, rec_id):
+        """Drop a recommendation that was used (or deleted)."""
+        with self._lock:
+            for key in ((user_id, sport_id), (user_id, None)):
+                feed = self._feeds.get(key)
+                if feed is not None:
+                    feed.discard(rec_id)
+
+    def remove_game(self, game_id):
+        """Drop every cached recommendation on a game that is no longer upcoming."""
+        with self._lock:
+            for feed in self._feeds.values():
+                for rec_id in [rid for rid, rec in feed.items.items() if rec["game_id"] == game_id]:
+                    feed.discard(rec_id)
+
+    def invalidate(self, user_id, sport_id=None):
+        self._feeds.pop((user_id, sport_id))
+        self._feeds.pop((user_id, None))
+
+    def clear(self):
+        self._feeds.clear()
+
+    def stats(self):
+        return self._feeds.stats()
+
+    def _install(self, user_id, sport_id, now):
+        rows = self._load(user_id, sport_id, self.depth, now)
+        feed = _Feed(rows, self.depth)
+        self._feeds.set((user_id, sport_id), feed)
+        return feed
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+def get_recommendation_feed():
+    """Return the process-wide RecommendationFeed, creating it on first use."""
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                from reference_data import get_reference_data
+
+                _feed = RecommendationFeed()
+                get_reference_data().on_game_change(_drop_unscheduled_game)
+    return _feed
+
+
+def _drop_unscheduled_game(game):
+    if game["status"] != "scheduled":
+        _feed.remove_game(game["id"])
+
+
+def size_recommendations(recs):
+    """Fill in missing recommended_stake values, sizing each user's batch in one call.
+
+    Stakes are simultaneous Kelly on the user's current balance, capped by
+    their betting budget category. Users without a bankroll are left unsized.
+    """
+    from app.staking import budget_cap, size_stakes
+    from budget_state import get_budget_store
+    from db import connection
+
+    by_user = {}
+    for rec in recs:
+        if rec.get("recommended_stake") is None and rec.get("user_id") is not None:
+            by_user.setdefault(rec["user_id"], []).append(rec)
+    if not by_user:
+        return recs
+
+    users = sorted(by_user)
+    with connection() as conn, conn.cursor() as c:
+        c.execute(f"SELECT user_id, current_balance FROM bankrolls WHERE user_id IN ({', '.join(['%s'] * len(users))})",
+                  users)
+        balances = {row["user_id"]: row["current_balance"] for row in c.fetchall()}
+
+    for user_id, batch in by_user.items():
+        if not balances.get(user_id):
+            continue
+        # Legs without a game never share one
+        game_ids = [rec.get("game_id") if rec.get("game_id") is not None else -i for i, rec in enumerate(batch, 1)]
+        stakes = size_stakes([rec["confidence_score"] for rec in batch], [rec["odds"] for rec in batch],
+                             balances[user_id], game_ids=game_ids,
+                             budget=budget_cap(get_budget_store().get(user_id)))
+        for rec, stake in zip(batch, stakes):
+            rec["recommended_stake"] = Decimal(f"{stake:.2f}")
+    return recs
+
+def add_recommendations(recs):
+    """Insert recommendations and index them. ``recs`` are dicts of ai_recommendations columns.
+
+    recommended_stake is sized with ``size_recommendations`` where missing.
+    """
+    from db import connection
+
+    size_recommendations(recs)
+    columns = ("user_id", "game_id", "bet_leg_id", "sport_id", "game_name", "selection", "odds",
+               "confidence_score", "recommended_stake", "analysis", "ai_model")
+    with connection() as conn, conn.cursor() as c:
+        for rec in recs:
+            c.execute(
+                f"INSERT INTO ai_recommendations ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                tuple(rec.get(col) for col in columns)
+            )
+            rec["id"] = c.lastrowid
+        game_ids = sorted({rec["game_id"] for rec in recs if rec.get("game_id") is not None})
+        game_dates = {}
+        if game_ids:
+            c.execute(
+                f"SELECT id, game_date FROM games WHERE status = 'scheduled' AND id IN ({', '.join(['%s'] * len(game_ids))})",
+                game_ids
+            )
+            game_dates = {row["id"]: row["game_date"] for row in c.fetchall()}
+        conn.commit()
+
+    feed = get_recommendation_feed()
+    now = datetime.datetime.now()
+    for rec in recs:
+        game_date = game_dates.get(rec.get("game_id"))
+        if rec.get("user_id") is None or game_date is None or game_date <= now:
+            continue
+        feed.add({**{col: rec.get(col) for col in FEED_COLUMNS}, "created_at": now, "game_date": game_date})
+    return recs
+
+def mark_used(rec_id, bet_id=None):
+    """Flip is_used for a recommendation and drop it from the feed. Returns False if already used."""
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute("SELECT user_id, sport_id FROM ai_recommendations WHERE id = %s FOR UPDATE", (rec_id,))
+        rec = c.fetchone()
+        if not rec:
+            return False
+        c.execute(
+            "UPDATE ai_recommendations SET is_used = TRUE, bet_id = %s WHERE id = %s AND is_used = FALSE",
+            (bet_id, rec_id)
+        )
+        changed = c.rowcount > 0
+        conn.commit()
+
+    get_recommendation_feed().discard(rec["user_id"], rec["sport_id"], rec_id)
+    return changed
@@ -0,0 +1,219 @@
+"""Read-through cache for reference tables: sports, bet_types and upcoming games.
+
+sports and bet_types change only with deploys; they are loaded once and held
+for the life of the process. Scheduled/live games are cached per (sport, date
+window). A per-sport version number is part of each cache key, so
+invalidating a sport is one increment: its old windows become unreachable and
+age out of the LRU.
+
+Invalidation comes from two places. ``set_game_status`` writes a status
+change and invalidates at once. A background poller picks up games changed
+by anything else through games.updated_at every REFERENCE_POLL_INTERVAL
+seconds. Either way, hooks registered with ``on_game_change`` are called with
+the changed game rows.
+"""
+import datetime
+import os
+import threading
+
+from app.cache import LRUCache
+
+REFERENCE_GAME_WINDOWS = int(os.getenv("REFERENCE_GAME_WINDOWS", "2048"))
+REFERENCE_GAMES_TTL = float(os.getenv("REFERENCE_GAMES_TTL", "300"))
+REFERENCE_POLL_INTERVAL = float(os.getenv("REFERENCE_POLL_INTERVAL", "5"))
+UPCOMING_DAYS = 7
+
+GAME_COLUMNS = "id, sport_id, game_name, team_a, team_b, game_date, status, updated_at"
+
+
+def query_db(sql, params=()):
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute(sql, params)
+        return c.fetchall()
+
+
+class ReferenceData:
+    """Process-local cache of sports, bet types and upcoming games."""
+
+    def __init__(self, query=query_db, max_windows=REFERENCE_GAME_WINDOWS, ttl=REFERENCE_GAMES_TTL,
+                 poll_interval=REFERENCE_POLL_INTERVAL):
+        self._query = query
+        self.poll_interval = poll_interval
+        self._games = LRUCache(max_windows, ttl)
+        self._lock = threading.Lock()
+        self._sports = None
+        self._bet_types = None
+        self._versions = {}  # sport_id -> version; None is any sport
+        self._hooks = []
+        self._watermark = None
+        self._seen_at_watermark = set()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._counts = {"static_loads": 0, "polls": 0, "invalidations": 0}
+
+    # sports / bet_types
+
+    def preload(self):
+        """Load the static tables now (e.g. at startup) instead of on first use."""
+        self._load_static()
+
+    def sports(self):
+        return list(self._static()[0].values())
+
+    def sport(self, sport_id):
+        return self._static()[0].get(sport_id)
+
+    def bet_types(self):
+        return list(self._static()[1].values())
+
+    def bet_type(self, type_id):
+        return self._static()[1].get(type_id)
+
+    def reload_static(self):
+        with self._lock:
+            self._sports = self._bet_types = None
+        self._load_static()
+
+    def _static(self):
+        if self._sports is None:
+            self._load_static()
+        return self._sports, self._bet_types
+
+    def _load_static(self):
+        sports = {row["id"]: row for row in self._query("SELECT id, sport_name FROM sports ORDER BY id")}
+        bet_types = {row["id"]: row for row in self._query(
+            "SELECT id, type_name, description FROM bet_types ORDER BY id")}
+        with self._lock:
+            self._sports, self._bet_types = sports, bet_types
+            self._counts["static_loads"] += 1
+
+    # games
+
+    def upcoming_games(self, sport_id=None, days=UPCOMING_DAYS, start=None):
+        """Scheduled and live games from ``start`` (default today) for ``days`` days."""
+        self._ensure_poller()
+        start = start or datetime.date.today()
+        end = start + datetime.timedelta(days=days)
+        key = (sport_id, self._versions.get(sport_id, 0), start, end)
+        games = self._games.get(key)
+        if games is not None:
+            return games
+
+        sport_filter = "" if sport_id is None else "sport_id = %s AND "
+        params = (() if sport_id is None else (sport_id,)) + (start, end)
+        games = self._query(f"""
+            SELECT {GAME_COLUMNS} FROM games
+            WHERE {sport_filter}game_date >= %s AND game_date < %s AND status IN ('scheduled', 'live')
+            ORDER BY game_date, id
+        """, params)
+        self._games.set(key, games)
+        return games
+
+    def invalidate_games(self, sport_id=None):
+        """Drop cached windows for one sport (and the all-sports windows), or for all sports."""
+        with self._lock:
+            sports = [sport_id] if sport_id is not None else list(self._versions)
+            for sid in sports + [None]:
+                self._versions[sid] = self._versions.get(sid, 0) + 1
+            self._counts["invalidations"] += 1
+        if sport_id is None:
+            self._games.clear()
+
+    def on_game_change(self, hook):
+        """Call ``hook(game_row)`` for every game whose row changes."""
+        self._hooks.append(hook)
+        self._ensure_poller()
+
+    def games_changed(self, games):
+        """Invalidate and notify for changed game rows (poller and explicit writes)."""
+        for sport_id in sorted({game["sport_id"] for game in games}):
+            self.invalidate_games(sport_id)
+        for game in games:
+            for hook in self._hooks:
+                try:
+                    hook(game)
+                except Exception as e:
+                    print("REFERENCE HOOK ERROR:", e)
+
+    def poll(self):
+        """Pick up games changed since the last poll. Returns the changed rows."""
+        if self._watermark is None:
+            # Start from now: everything up to the current watermark is already current
+            ts = self._query("SELECT COALESCE(MAX(updated_at), NOW()) AS ts FROM games")[0]["ts"]
+            rows = self._query("SELECT id, updated_at FROM games WHERE updated_at = %s", (ts,))
+            self._watermark = ts
+            self._seen_at_watermark = {(row["id"], row["updated_at"]) for row in rows}
+            return []
+
+        # updated_at has one-second resolution: re-read the watermark second and
+        # skip rows already handled there
+        rows = self._query(
+            f"SELECT {GAME_COLUMNS} FROM games WHERE updated_at >= %s ORDER BY updated_at, id",
+            (self._watermark,)
+        )
+        changed = [row for row in rows
+                   if (row["id"], row["updated_at"]) not in self._seen_at_watermark]
+        self._counts["polls"] += 1
+        if rows:
+            self._watermark = rows[-1]["updated_at"]
+            self._seen_at_watermark = {(row["id"], row["updated_at"]) for row in rows
+                                       if row["updated_at"] == self._watermark}
+        if changed:
+            self.games_changed(changed)
+        return changed
+
+    def stats(self):
+        with self._lock:
+            return {"games": self._games.stats(), **self._counts}
+
+    def close(self):
+        self._stop.set()
+
+    def _ensure_poller(self):
+        if self.poll_interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="reference-data-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print("REFERENCE POLL ERROR:", e)
+
+
+_reference = None
+_reference_lock = threading.Lock()
+
+def get_reference_data():
+    """Return the process-wide ReferenceData, creating it on first use."""
+    global _reference
+    if _reference is None:
+        with _reference_lock:
+            if _reference is None:
+                _reference = ReferenceData()
+    return _reference
+
+
+def set_game_status(game_id, status):
+    """Change a game's status and invalidate cached games right away."""
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute("UPDATE games SET status = %s WHERE id = %s", (status, game_id))
+        c.execute(f"SELECT {GAME_COLUMNS} FROM games WHERE id = %s", (game_id,))
+        game = c.fetchone()
+        conn.commit()
+    if game:
+        get_reference_data().games_changed([game])
+    return game
@@ -0,0 +1,306 @@
+"""Set-based settlement of bets on completed games.
+
+Leg outcomes are recorded in bet_leg_results (one row per bet_legs row). For
+each chunk of completed games, one transaction:
+
+  1. locks the still-pending bets with a leg on those games,
+  2. resolves every bet whose legs all have a result,
+  3. resolves parlays (bets referenced through parlay_id) whose components
+     are now all settled,
+  4. writes bet statuses/payouts with batched UPDATEs, applies one aggregated
+     balance/peak/lowest update per bankroll and folds the settled bets into
+     bet_statistics.
+
+Only bets still 'pending' are touched, so re-running over the same games is a
+no-op. Stakes are assumed to have left the bankroll when the bet was placed;
+settlement credits the payout.
+
+    python settlement.py [--chunk-size N]
+"""
+import argparse
+import datetime
+import sys
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+import bet_stats
+from app.odds import to_decimal_exact
+
+CENTS = Decimal("0.01")
+ONE = Decimal("1")
+LEG_RESULTS = ("won", "lost", "push", "cancelled")
+DEFAULT_CHUNK_SIZE = 50
+
+
+def _money(value):
+    return value.quantize(CENTS, ROUND_HALF_UP)
+
+def resolve_bet(stake, legs):
+    """Outcome of a bet from its legs, or None while any leg is unresolved.
+
+    ``legs`` are (decimal_odds, result) pairs. Any lost leg loses the bet; push
+    and cancelled legs drop out (count as odds 1.0); a bet with nothing left
+    standing is a push, or cancelled if every leg was cancelled.
+    Returns (status, payout).
+    """
+    stake = Decimal(str(stake))
+    if not legs or any(result is None for _, result in legs):
+        return None
+    results = [result for _, result in legs]
+    if "lost" in results:
+        return "lost", Decimal("0.00")
+    if all(result == "cancelled" for result in results):
+        return "cancelled", _money(stake)
+
+    price = ONE
+    won_any = False
+    for odds, result in legs:
+        if result == "won":
+            price *= odds
+            won_any = True
+    if not won_any:
+        return "push", _money(stake)
+    return "won", _money(stake * price)
+
+def resolve_parlay(stake, components):
+    """Outcome of a parlay from its components' (status, total_odds) pairs."""
+    if not components or any(status == "pending" for status, _ in components):
+        return None
+    legs = [(Decimal(str(odds)) if odds is not None else ONE, status) for status, odds in components]
+    return resolve_bet(stake, legs)
+
+def bankroll_deltas(settled):
+    """Aggregate settled top-level bets into one update per bankroll.
+
+    Returns {bankroll_id: {"balance": credited payouts, "won": profit on wins,
+    "lost": stakes lost}}.
+    """
+    deltas = defaultdict(lambda: {"balance": Decimal("0.00"), "won": Decimal("0.00"), "lost": Decimal("0.00")})
+    for bet in settled:
+        if bet.get("parlay_id") is not None:
+            continue
+        delta = deltas[bet["bankroll_id"]]
+        stake = Decimal(str(bet["total_stake"]))
+        payout = bet["actual_payout"]
+        delta["balance"] += payout
+        if bet["status"] == "won":
+            delta["won"] += payout - stake
+        elif bet["status"] == "lost":
+            delta["lost"] += stake
+    return dict(deltas)
+
+
+def record_leg_results(results, conn=None):
+    """Store leg outcomes: ``results`` maps bet_leg_id -> won/lost/push/cancelled."""
+    from db import connection
+
+    rows = []
+    for leg_id, result in results.items():
+        if result not in LEG_RESULTS:
+            raise ValueError(f"Invalid leg result for leg {leg_id}: {result!r}")
+        rows.append((leg_id, result))
+    if not rows:
+        return 0
+
+    sql = """
+        INSERT INTO bet_leg_results (bet_leg_id, result) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE result = VALUES(result)
+    """
+    if conn is not None:
+        with conn.cursor() as c:
+            c.executemany(sql, rows)
+        return len(rows)
+    with connection() as conn, conn.cursor() as c:
+        c.executemany(sql, rows)
+        conn.commit()
+    return len(rows)
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+def _settle_bets(c, game_ids, now):
+    c.execute(f"""
+        SELECT b.id, b.user_id, b.bankroll_id, b.parlay_id, b.total_stake, b.total_odds
+        FROM bets b
+        WHERE b.status = 'pending' AND b.id IN (
+            SELECT bsi.bet_id FROM bet_slip_items bsi
+            JOIN bet_legs bl ON bl.id = bsi.bet_leg_id
+            WHERE bl.game_id IN ({_placeholders(game_ids)})
+        )
+        ORDER BY b.id
+        FOR UPDATE
+    """, game_ids)
+    bets = {row["id"]: row for row in c.fetchall()}
+    if not bets:
+        return []
+
+    bet_ids = list(bets)
+    c.execute(f"""
+        SELECT bsi.bet_id, bl.odds, bl.odds_format, r.result
+        FROM bet_slip_items bsi
+        JOIN bet_legs bl ON bl.id = bsi.bet_leg_id
+        LEFT JOIN bet_leg_results r ON r.bet_leg_id = bl.id
+        WHERE bsi.bet_id IN ({_placeholders(bet_ids)})
+    """, bet_ids)
+    legs = defaultdict(list)
+    invalid = set()
+    for row in c.fetchall():
+        try:
+            legs[row["bet_id"]].append((to_decimal_exact(row["odds"], row["odds_format"]), row["result"]))
+        except ValueError as e:
+            # Leave the bet pending for someone to fix rather than failing the chunk
+            print(f"SETTLEMENT ERROR: bet {row['bet_id']} skipped:", e)
+            invalid.add(row["bet_id"])
+
+    settled = []
+    for bet_id, bet in bets.items():
+        if bet_id in invalid:
+            continue
+        outcome = resolve_bet(bet["total_stake"], legs.get(bet_id))
+        if outcome is not None:
+            settled.append({**bet, "status": outcome[0], "actual_payout": outcome[1], "settled_date": now})
+    return settled
+
+def _settle_parlays(c, parent_ids, now):
+    parent_ids = sorted(parent_ids)
+    if not parent_ids:
+        return []
+    c.execute(f"""
+        SELECT id, user_id, bankroll_id, parlay_id, total_stake, total_odds
+        FROM bets WHERE status = 'pending' AND id IN ({_placeholders(parent_ids)})
+        ORDER BY id
+        FOR UPDATE
+    """, parent_ids)
+    parents = {row["id"]: row for row in c.fetchall()}
+    if not parents:
+        return []
+
+    ids = list(parents)
+    c.execute(f"SELECT parlay_id, status, total_odds FROM bets WHERE parlay_id IN ({_placeholders(ids)})", ids)
+    components = defaultdict(list)
+    for row in c.fetchall():
+        components[row["parlay_id"]].append((row["status"], row["total_odds"]))
+
+    settled = []
+    for bet_id, bet in parents.items():
+        outcome = resolve_parlay(bet["total_stake"], components.get(bet_id))
+        if outcome is not None:
+            settled.append({**bet, "status": outcome[0], "actual_payout": outcome[1], "settled_date": now})
+    return settled
+
+def _next_sequence(c, count):
+    """Reserve ``count`` settlement_seq values; returns the first.
+
+    LAST_INSERT_ID(expr) hands the new value back through the OK packet, and
+    the counter row stays locked until commit, so sequence order is commit order.
+    """
+    c.execute("UPDATE settlement_sequence SET last_value = LAST_INSERT_ID(last_value + %s) WHERE id = 1",
+              (count,))
+    return c.lastrowid - count + 1
+
+def _write_bets(c, settled):
+    # settlement_seq is the order bet_stats applies (and recomputes) bets in
+    first = _next_sequence(c, len(settled))
+    for offset, bet in enumerate(settled):
+        bet["settlement_seq"] = first + offset
+    c.executemany(
+        "UPDATE bets SET status = %s, actual_payout = %s, settled_date = %s, settlement_seq = %s "
+        "WHERE id = %s AND status = 'pending'",
+        [(b["status"], b["actual_payout"], b["settled_date"], b["settlement_seq"], b["id"]) for b in settled]
+    )
+
+def _write_bankrolls(c, deltas):
+    # MySQL applies SET assignments left to right, so peak/lowest see the new
+    # balance. Payouts only ever add, so the batch's end balance is its peak.
+    c.executemany("""
+        UPDATE bankrolls SET
+            current_balance = current_balance + %s,
+            total_won = total_won + %s,
+            total_lost = total_lost + %s,
+            peak_balance = GREATEST(COALESCE(peak_balance, current_balance), current_balance),
+            lowest_balance = LEAST(COALESCE(lowest_balance, current_balance), current_balance),
+            roi = IF(total_wagered > 0,
+                     LEAST(999.99, GREATEST(-999.99, (total_won - total_lost) / total_wagered * 100)),
+                     0)
+        WHERE id = %s
+    """, [(d["balance"], d["won"], d["lost"], bankroll_id) for bankroll_id, d in sorted(deltas.items())])
+
+def settle_chunk(conn, game_ids):
+    """Settle everything resolvable on ``game_ids`` in one transaction."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+    try:
+        with conn.cursor() as c:
+            settled = _settle_bets(c, list(game_ids), now)
+            if settled:
+                _write_bets(c, settled)
+
+            # Parlays can nest, so keep resolving parents until nothing changes
+            newly = settled
+            while True:
+                parent_ids = {b["parlay_id"] for b in newly if b["parlay_id"] is not None}
+                newly = _settle_parlays(c, parent_ids, now)
+                if not newly:
+                    break
+                _write_bets(c, newly)
+                settled.extend(newly)
+
+            if settled:
+                _write_bankrolls(c, bankroll_deltas(settled))
+                bet_stats.record_settled_bets(c, settled)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return settled
+
+def completed_game_ids(conn):
+    """Completed games that still have pending bets on them."""
+    with conn.cursor() as c:
+        c.execute("""
+            SELECT DISTINCT g.id
+            FROM games g
+            JOIN bet_legs bl ON bl.game_id = g.id
+            JOIN bet_slip_items bsi ON bsi.bet_leg_id = bl.id
+            JOIN bets b ON b.id = bsi.bet_id
+            WHERE g.status = 'completed' AND b.status = 'pending'
+            ORDER BY g.id
+        """)
+        return [row["id"] for row in c.fetchall()]
+
+def settle_games(game_ids=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Settle the given games (default: all completed games with pending bets).
+
+    Returns a summary dict with the number of games, bets and users touched.
+    """
+    from db import connection
+
+    summary = {"games": 0, "bets": 0, "users": 0}
+    users = set()
+    with connection() as conn:
+        if game_ids is None:
+            game_ids = completed_game_ids(conn)
+        game_ids = list(game_ids)
+        for start in range(0, len(game_ids), chunk_size):
+            chunk = game_ids[start:start + chunk_size]
+            settled = settle_chunk(conn, chunk)
+            summary["games"] += len(chunk)
+            summary["bets"] += len(settled)
+            users.update(b["user_id"] for b in settled)
+    summary["users"] = len(users)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Settle bets on completed games.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="games per transaction")
+    parser.add_argument("--games", type=int, nargs="*", help="only these game ids")
+    args = parser.parse_args(argv)
+
+    summary = settle_games(args.games, args.chunk_size)
+    print(f"✅ Settled {summary['bets']} bets for {summary['users']} users across {summary['games']} games")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
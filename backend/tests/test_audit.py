@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pymysql
+
+import audit
+from audit import AuditLogger
+
+
+class FakeTable:
+    """Collects written batches; can be switched to fail or block"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.gate = None
+
+    def write_many(self, events):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            raise ConnectionError("MySQL has gone away")
+        if any(event["action"] == "bad" for event in events):
+            raise pymysql.err.IntegrityError(1452, "Cannot add or update a child row")
+        self.batches.append(list(events))
+
+    @property
+    def rows(self):
+        return [event for batch in self.batches for event in batch]
+
+
+class TestAuditLogger(unittest.TestCase):
+    """Queued, batched audit logging with spill-to-file"""
+
+    def setUp(self):
+        self.table = FakeTable()
+        self.dir = tempfile.TemporaryDirectory()
+        self.spill = os.path.join(self.dir.name, "spill.jsonl")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_logger(self, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        logger = AuditLogger(write_many=self.table.write_many, spill_path=self.spill, **kwargs)
+        self.addCleanup(logger.close)
+        return logger
+
+    def test_batches_multi_row_writes(self):
+        """Queued events go out in batches of flush_batch"""
+        logger = self.make_logger(flush_batch=10)
+        for i in range(25):
+            logger.log("login", user_id=i, new_value={"n": i})
+        self.assertEqual(logger.flush(), 25)
+        self.assertEqual([len(b) for b in self.table.batches], [10, 10, 5])
+        self.assertEqual(json.loads(self.table.rows[3]["new_value"]), {"n": 3})
+        self.assertEqual(logger.stats()["written"], 25)
+        print("\n✅ test_batches_multi_row_writes passed — Events written in batches.")
+
+    def test_flusher_thread_writes_on_batch_threshold(self):
+        """Reaching flush_batch wakes the background flusher"""
+        logger = self.make_logger(flush_batch=5)
+        for i in range(5):
+            logger.log("budget_update", user_id=1)
+        for _ in range(200):
+            if len(self.table.rows) == 5:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(self.table.rows), 5)
+        print("\n✅ test_flusher_thread_writes_on_batch_threshold passed — Background flush triggered.")
+
+    def test_full_queue_spills_instead_of_blocking(self):
+        """A full queue spills to the local file rather than dropping or blocking"""
+        self.table.gate = threading.Event()  # flusher stuck on a slow MySQL
+        logger = self.make_logger(maxsize=3, flush_batch=1000)
+        # Runs before logger.close, which would otherwise wait on the stuck flusher
+        self.addCleanup(self.table.gate.set)
+        for i in range(10):
+            logger.log("login", user_id=i)
+        # The first spill wakes the flusher, which may take what is queued
+        # into its stuck write, so how many spill depends on timing
+        spilled = logger.stats()["spilled"]
+        self.assertGreater(spilled, 0)
+        with open(self.spill) as f:
+            self.assertEqual(len(f.readlines()), spilled)
+        self.table.gate.set()
+        logger.close()
+        self.assertEqual(sorted(e["user_id"] for e in self.table.rows), list(range(10)))
+        print("\n✅ test_full_queue_spills_instead_of_blocking passed — Overflow spilled.")
+
+    def test_failed_write_spills_and_replays(self):
+        """Events from a failed write are spilled and replayed after the next good write"""
+        logger = self.make_logger()
+        self.table.fail = True
+        logger.log("register", user_id=1)
+        logger.log("login", user_id=1)
+        self.assertEqual(logger.flush(), 0)
+        self.assertTrue(os.path.exists(self.spill))
+
+        self.table.fail = False
+        logger.log("logout", user_id=1)
+        logger.flush()
+        self.assertEqual(sorted(e["action"] for e in self.table.rows), ["login", "logout", "register"])
+        self.assertFalse(os.path.exists(self.spill))
+        print("\n✅ test_failed_write_spills_and_replays passed — Nothing lost across an outage.")
+
+    def test_concurrent_replays_keep_every_event(self):
+        """Loggers sharing a spill file never replay over each other's events"""
+        first = self.make_logger()
+        second = self.make_logger()
+        self.table.fail = True
+        for i in range(50):
+            first.log("login", user_id=i)
+        first.flush()
+        self.table.fail = False
+        threads = [threading.Thread(target=logger.replay_spill) for logger in (first, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(e["user_id"] for e in self.table.rows), list(range(50)))
+        self.assertEqual(os.listdir(self.dir.name), [])
+        print("\n✅ test_concurrent_replays_keep_every_event passed — Shared spill replayed once.")
+
+    def test_bad_event_dead_lettered_on_replay(self):
+        """An event the table rejects is set aside instead of blocking the replay forever"""
+        logger = self.make_logger()
+        self.table.fail = True
+        logger.log("login", user_id=1)
+        logger.log("bad", user_id=2)
+        logger.log("logout", user_id=1)
+        logger.flush()
+
+        self.table.fail = False
+        self.assertEqual(logger.replay_spill(), 2)
+        self.assertEqual([e["action"] for e in self.table.rows], ["login", "logout"])
+        self.assertFalse(os.path.exists(self.spill))
+        with open(logger.dead_letter_path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["action"] for line in f], ["bad"])
+        self.assertEqual(logger.stats()["dead_lettered"], 1)
+        print("\n✅ test_bad_event_dead_lettered_on_replay passed — Bad event moved aside, rest replayed.")
+
+    def test_created_at_written_as_unix_time(self):
+        """created_at goes through FROM_UNIXTIME, so the session time zone can't shift it"""
+        executed = []
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.executemany.side_effect = lambda sql, rows: executed.append((sql, rows))
+        conn = mock.MagicMock()
+        conn.__enter__.return_value = conn
+        conn.cursor.return_value = cursor
+        event = dict.fromkeys(audit.COLUMNS)
+        with mock.patch("db.connection", return_value=conn):
+            audit.write_events_to_db([{**event, "action": "login", "created_at": 1700000000},
+                                      {**event, "action": "login", "created_at": "2023-11-14 22:13:20"}])
+        sql, rows = executed[0]
+        self.assertIn("FROM_UNIXTIME(%s)", sql)
+        self.assertEqual([row[-1] for row in rows], [1700000000, 1700000000])
+        print("\n✅ test_created_at_written_as_unix_time passed — Timestamps stored in UTC.")
+
+    def test_close_flushes(self):
+        """close() writes everything still queued"""
+        logger = self.make_logger()
+        logger.log("mfa_verified", user_id=2)
+        logger.close()
+        self.assertEqual([e["action"] for e in self.table.rows], ["mfa_verified"])
+        print("\n✅ test_close_flushes passed — Shutdown flush.")
+
+
+if __name__ == "__main__":
+    unittest.main()
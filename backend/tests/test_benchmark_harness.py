@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import run
+from benchmarks.harness import Case, Skip, compare, measure, report, run_cases
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Measurement and baseline comparison of the benchmark harness"""
+
+    def test_measure_reports_metrics(self):
+        """A measured case should report latency, throughput and memory"""
+        result = measure(Case("sum", lambda: sum(range(100)), batch=2), iterations=200)
+        for key in ("p50_us", "p99_us", "mean_us", "throughput_per_s", "peak_memory_kb"):
+            self.assertIn(key, result)
+        self.assertLessEqual(result["p50_us"], result["p99_us"])
+        self.assertGreater(result["throughput_per_s"], 0)
+        print("\n✅ test_measure_reports_metrics passed — Metrics reported.")
+
+    def test_skipped_cases(self):
+        """Cases that cannot run should be recorded as skipped"""
+        def setup():
+            raise Skip("no database")
+
+        results = run_cases([Case("needs db", lambda: None, setup=setup)], log=lambda *_: None)
+        self.assertEqual(results, {"needs db": {"skipped": "no database"}})
+        print("\n✅ test_skipped_cases passed — Skips recorded.")
+
+    def test_compare_flags_regressions(self):
+        """Slower latency or lower throughput beyond the threshold is flagged"""
+        base = report({
+            "a": {"p50_us": 10.0, "p99_us": 20.0, "throughput_per_s": 1000.0},
+            "b": {"p50_us": 10.0, "p99_us": 20.0, "throughput_per_s": 1000.0},
+            "c": {"skipped": "no db"},
+        })
+        current = report({
+            "a": {"p50_us": 11.0, "p99_us": 21.0, "throughput_per_s": 950.0},
+            "b": {"p50_us": 15.0, "p99_us": 20.0, "throughput_per_s": 700.0},
+            "c": {"p50_us": 1.0, "p99_us": 1.0, "throughput_per_s": 1.0},
+        })
+        regressions = compare(current, base, threshold=0.2)
+        self.assertEqual([(name, metric) for name, metric, _, _ in regressions],
+                         [("b", "p50_us"), ("b", "throughput_per_s")])
+        print("\n✅ test_compare_flags_regressions passed — Regressions flagged.")
+
+    def test_missing_baseline_fails_gate(self):
+        """--fail-on-regression without a saved baseline fails before running anything"""
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(run.harness, "run_cases") as run_cases:
+            code = run.main(["--fail-on-regression", "--baseline", os.path.join(tmp, "baseline.json")])
+        self.assertEqual(code, 1)
+        run_cases.assert_not_called()
+        print("\n✅ test_missing_baseline_fails_gate passed — Missing baseline fails loudly.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import random
+import unittest
+from decimal import Decimal
+
+from bet_stats import BetStats, recompute, settlement_order
+
+
+def bet(status, stake="10.00", odds="2.00", payout=None):
+    if payout is None and status == "won":
+        payout = str(Decimal(stake) * Decimal(odds))
+    return {"status": status, "total_stake": Decimal(stake), "total_odds": Decimal(odds),
+            "actual_payout": None if payout is None else Decimal(payout)}
+
+
+class TestBetStats(unittest.TestCase):
+    """Incremental bet statistics"""
+
+    def test_counters_and_rates(self):
+        """Counts, win rate, ROI and average odds from a short history"""
+        history = [bet("won"), bet("lost"), bet("won", odds="3.00"), bet("push"), bet("cancelled")]
+        row = recompute(history).stats_row()
+        self.assertEqual(row["total_bets"], 5)
+        self.assertEqual((row["winning_bets"], row["losing_bets"], row["cancelled_bets"]), (2, 1, 1))
+        self.assertEqual(row["win_rate"], Decimal("66.67"))
+        self.assertEqual(row["total_wagered"], Decimal("40.00"))
+        self.assertEqual(row["total_returned"], Decimal("60.00"))
+        self.assertEqual(row["gross_profit"], Decimal("20.00"))
+        self.assertEqual(row["roi"], Decimal("50.00"))
+        self.assertEqual(row["average_odds"], Decimal("2.25"))
+        print("\n✅ test_counters_and_rates passed — Aggregates computed.")
+
+    def test_streaks(self):
+        """Streaks follow settlement order; pushes don't break them"""
+        statuses = ["won", "won", "push", "won", "lost", "lost", "cancelled", "lost", "won"]
+        stats = recompute([bet(s) for s in statuses])
+        self.assertEqual(stats.longest_win_streak, 3)
+        self.assertEqual(stats.longest_loss_streak, 3)
+        self.assertEqual(stats.current_streak, 1)
+        print("\n✅ test_streaks passed — Win/loss streaks tracked.")
+
+    def test_incremental_matches_full_recompute(self):
+        """Applying bets one at a time through stored rows equals a full recompute"""
+        rng = random.Random(7)
+        history = [bet(rng.choice(["won", "lost", "lost", "push", "cancelled"]),
+                       stake=f"{rng.randint(1, 500)}.{rng.randint(0, 99):02d}",
+                       odds=f"{rng.uniform(1.1, 9):.2f}")
+                   for _ in range(2000)]
+
+        stats_row, state_row = None, None
+        for b in history:
+            stats = BetStats.from_rows(stats_row, state_row)
+            stats.apply(b["status"], b["total_stake"], b["total_odds"], b["actual_payout"])
+            stats_row, state_row = stats.stats_row(), stats.state_row()
+
+        self.assertEqual(stats_row, recompute(history).stats_row())
+        print("\n✅ test_incremental_matches_full_recompute passed — O(1) updates match recompute.")
+
+    def test_settlement_order(self):
+        """Legacy bets come first by settle time and id, then the settlement sequence regardless of id"""
+        bets = [
+            {"id": 1, "settlement_seq": 11, "settled_date": "2024-01-01 00:00:00"},
+            {"id": 9, "settlement_seq": 10, "settled_date": "2024-01-01 00:00:00"},
+            {"id": 5, "settlement_seq": None, "settled_date": "2023-06-01 00:00:00"},
+            {"id": 4, "settlement_seq": None, "settled_date": "2023-06-01 00:00:00"},
+            {"id": 3, "settled_date": None, "bet_date": "2023-05-01 00:00:00"},
+        ]
+        self.assertEqual([b["id"] for b in sorted(bets, key=settlement_order)], [3, 4, 5, 9, 1])
+        print("\n✅ test_settlement_order passed — Settlement order is deterministic.")
+
+    def test_percentages_clamped(self):
+        """ROI is clamped to the DECIMAL(5,2) column range"""
+        row = recompute([bet("won", stake="1.00", odds="50.00")]).stats_row()
+        self.assertEqual(row["roi"], Decimal("999.99"))
+        print("\n✅ test_percentages_clamped passed — ROI fits its column.")
+
+    def test_unsettled_rejected(self):
+        with self.assertRaises(ValueError):
+            BetStats().apply("pending", 10)
+        print("\n✅ test_unsettled_rejected passed — Pending bets rejected.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from app.logic import suggest_budget, suggest_budgets_batch
+
+
+class TestBudgetBatch(unittest.TestCase):
+    """Tests for the batched suggest_budget entry point"""
+
+    SCENARIOS = [
+        (4000, 1500, 2400, 6),
+        (10000, 2000, 1000, 12),
+        (5000, 2500, 60000, 36),
+        (3000, 1500, 100, 1),
+        (2000, 1800, 10000, 6),
+        (0, 0, 0, 6),
+        (-5000, -2000, -1000, 6),
+    ]
+
+    def test_matches_single_calls(self):
+        """Each batch row should equal the single-call result"""
+        results = suggest_budgets_batch(np.array(self.SCENARIOS, dtype=float))
+        self.assertEqual(len(results), len(self.SCENARIOS))
+        for row, result in zip(self.SCENARIOS, results):
+            expected = suggest_budget(*row)
+            if isinstance(expected, dict):
+                self.assertEqual(result, expected)
+            else:
+                self.assertEqual(result["message"], expected)
+        print("\n✅ test_matches_single_calls passed — Batch results match suggest_budget.")
+
+    def test_column_input(self):
+        """Column lists should be accepted as well as rows"""
+        columns = {
+            "income": [row[0] for row in self.SCENARIOS],
+            "fixed_expenses": [row[1] for row in self.SCENARIOS],
+            "savings_goal": [row[2] for row in self.SCENARIOS],
+            "months_to_goal": [row[3] for row in self.SCENARIOS],
+        }
+        self.assertEqual(suggest_budgets_batch(columns), suggest_budgets_batch(self.SCENARIOS))
+        print("\n✅ test_column_input passed — Column and row input agree.")
+
+    def test_error_codes(self):
+        """Bad rows should get error codes without affecting valid rows"""
+        rows = [
+            ("1000; DROP TABLE users;", 500, 200, 6),
+            ("NaN", 1000, 500, 6),
+            (None, 1000, 500, 6),
+            (4000, 1500, 2400, 0),
+            (2000, 1800, 10000, 6),
+            (4000, 1500, 2400, 6),
+        ]
+        results = suggest_budgets_batch(rows)
+        codes = [r.get("error") for r in results]
+        self.assertEqual(codes, ["non_numeric", "non_numeric", "non_numeric",
+                                 "invalid_input", "unrealistic_goal", None])
+        self.assertEqual(results[-1], suggest_budget(4000, 1500, 2400, 6))
+        print("\n✅ test_error_codes passed — Invalid rows flagged per row.")
+
+    def test_bad_shape(self):
+        """Malformed batches should raise ValueError"""
+        with self.assertRaises(ValueError):
+            suggest_budgets_batch([(1, 2, 3)])
+        with self.assertRaises(ValueError):
+            suggest_budgets_batch({"income": [1]})
+        self.assertEqual(suggest_budgets_batch([]), [])
+        print("\n✅ test_bad_shape passed — Malformed batches rejected.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
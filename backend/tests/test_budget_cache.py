@@ -0,0 +1,105 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import app.logic as logic
+import app.model as model_module
+from app.cache import LRUCache
+from app.logic import suggest_budget
+
+
+class TestBudgetCache(unittest.TestCase):
+    """Memoization of suggest_budget predictions"""
+
+    def setUp(self):
+        logic.clear_budget_cache()
+
+    def test_repeat_question_hits_cache(self):
+        """Asking the same question twice should reuse the prediction"""
+        before = logic.budget_cache_stats()
+        first = suggest_budget(4000, 1500, 2400, 6)
+        second = suggest_budget("4000", "1500", "2400", "6")
+        after = logic.budget_cache_stats()
+        self.assertEqual(first, second)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        print("\n✅ test_repeat_question_hits_cache passed — Second call served from cache.")
+
+    def test_quantized_inputs_share_entry(self):
+        """Near-identical inputs should share an entry but keep exact amounts"""
+        with mock.patch.object(logic, "BUDGET_CACHE_QUANTUM", 50):
+            a = suggest_budget(4010, 1500, 2400, 6)
+            b = suggest_budget(3995, 1490, 2410, 6)
+        self.assertEqual(logic.budget_cache_stats()["size"], 1)
+        self.assertEqual(a["Income"], 4010)
+        self.assertEqual(b["Income"], 3995)
+        print("\n✅ test_quantized_inputs_share_entry passed — Quantized keys shared.")
+
+    def test_invalid_input_not_cached(self):
+        """Rejected inputs never reach the model or the cache"""
+        suggest_budget("abc", 1500, 2400, 6)
+        suggest_budget(2000, 1800, 10000, 6)
+        self.assertEqual(logic.budget_cache_stats()["size"], 0)
+        print("\n✅ test_invalid_input_not_cached passed — Invalid inputs bypass cache.")
+
+    def test_new_model_file_clears_cache(self):
+        """Loading a different model file should invalidate cached results"""
+        suggest_budget(4000, 1500, 2400, 6)
+        self.assertEqual(logic.budget_cache_stats()["size"], 1)
+
+        path = model_module.MODEL_PATH
+        stat = path.stat()
+        try:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            model_module.unload_model()
+            model_module.get_model()
+            self.assertEqual(logic.budget_cache_stats()["size"], 0)
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            model_module.unload_model()
+        print("\n✅ test_new_model_file_clears_cache passed — Model change flushed cache.")
+
+    def test_prediction_racing_a_swap_not_served(self):
+        """A result computed while the model was swapped stays with the old generation"""
+        real_predict = logic._predict
+
+        def predict_during_swap(rows):
+            result = real_predict(rows)
+            model_module._generation += 1  # swap lands mid-prediction, hooks not run yet
+            return result
+
+        with mock.patch.object(model_module, "_generation", model_module._generation), \
+                mock.patch.object(logic, "_predict", side_effect=predict_during_swap) as predict:
+            suggest_budget(4000, 1500, 2400, 6)
+            suggest_budget(4000, 1500, 2400, 6)
+        self.assertEqual(predict.call_count, 2)
+        print("\n✅ test_prediction_racing_a_swap_not_served passed — Cache keyed on model generation.")
+
+
+class TestLRUCache(unittest.TestCase):
+    """Bounded eviction and expiry of the shared cache primitive"""
+
+    def test_lru_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        print("\n✅ test_lru_eviction passed — Least recently used entry evicted.")
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(maxsize=4, ttl=60)
+        cache.set("short", 1, ttl=0.01)
+        cache.set("long", 2)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("long"), 2)
+        print("\n✅ test_ttl_expiry passed — Expired entries dropped.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,186 @@
+import threading
+import unittest
+
+import pymysql
+
+from budget_state import BudgetStateStore
+from chat import handle_input, DEFAULT_USER_DATA
+
+
+class FakeBackend:
+    """In-memory stand-in for the user_budget_state table"""
+
+    def __init__(self):
+        self.rows = {}
+        self.versions = {}
+        self.batches = []
+        self.loads = 0
+
+    def load(self, user_id):
+        self.loads += 1
+        row = self.rows.get(user_id)
+        if row is None:
+            return None
+        return {**row, "categories": dict(row["categories"])}, self.versions[user_id]
+
+    def save_many(self, states):
+        """Compare-and-set like save_states_to_db; returns the users whose write lost"""
+        self.batches.append(sorted(states))
+        lost = set()
+        for user_id, (state, expected, new) in states.items():
+            if self.versions.get(user_id) != expected:
+                lost.add(user_id)
+                continue
+            self.rows[user_id] = state
+            self.versions[user_id] = new
+        return lost
+
+
+class TestBudgetStateStore(unittest.TestCase):
+    """Per-user chat budgets with write-behind persistence"""
+
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.store = BudgetStateStore(load=self.backend.load, save_many=self.backend.save_many,
+                                      maxsize=2, flush_interval=60, flush_batch=100)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_users_are_isolated(self):
+        """One user's updates must not leak into another's budget"""
+        with self.store.edit(1) as data:
+            handle_input("set income to 5000", data)
+        with self.store.edit(2) as data:
+            reply = handle_input("show my budget", data)
+        self.assertIn("$3,000.00", reply)
+        self.assertEqual(self.store.get(1)["income"], 5000)
+        self.assertEqual(DEFAULT_USER_DATA["income"], 3000)
+        print("\n✅ test_users_are_isolated passed — Budgets kept per user.")
+
+    def test_reads_from_memory_and_flushes_in_batches(self):
+        """Edits should be written back together on flush"""
+        for user_id in (1, 2):
+            with self.store.edit(user_id) as data:
+                handle_input("add 50 to food", data)
+        self.store.get(1)
+        self.assertEqual(self.backend.loads, 2)
+        self.assertEqual(self.backend.rows, {})
+
+        self.assertEqual(self.store.flush(), 2)
+        self.assertEqual(self.backend.batches, [[1, 2]])
+        self.assertEqual(self.backend.rows[1]["categories"]["food"], 350)
+        self.assertEqual(self.store.flush(), 0)
+        print("\n✅ test_reads_from_memory_and_flushes_in_batches passed — Dirty users written in one batch.")
+
+    def test_eviction_keeps_dirty_users(self):
+        """Idle users are evicted LRU-first, but only after being written"""
+        for user_id in (1, 2, 3):
+            with self.store.edit(user_id) as data:
+                handle_input(f"set savings to {user_id}50", data)
+        self.assertEqual(self.store.stats()["users"], 3)
+
+        self.store.flush()
+        self.assertEqual(self.store.stats()["users"], 2)
+        self.assertEqual(self.store.get(1)["savings"], 150)
+        self.assertEqual(self.backend.loads, 4)
+        print("\n✅ test_eviction_keeps_dirty_users passed — Evicted users reload from storage.")
+
+    def test_failed_flush_retries(self):
+        """A failed write should leave users dirty for the next flush"""
+        calls = []
+
+        def flaky_save(states):
+            calls.append(states)
+            if len(calls) == 1:
+                raise ConnectionError("db down")
+            return self.backend.save_many(states)
+
+        self.store._save_many = flaky_save
+        with self.store.edit(7) as data:
+            handle_input("set income to 4200", data)
+        self.assertEqual(self.store.flush(), 0)
+        self.assertEqual(self.store.stats()["dirty"], 1)
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(self.backend.rows[7]["income"], 4200)
+        print("\n✅ test_failed_flush_retries passed — Failed flush retried.")
+
+    def test_bad_row_does_not_block_batch(self):
+        """A row the table rejects is dropped; the rest of its batch is still written"""
+        def strict_save(states):
+            if any(state["savings"] > 1000 for state, _, _ in states.values()):
+                raise pymysql.err.DataError(1264, "Out of range value for column 'savings'")
+            return self.backend.save_many(states)
+
+        self.store._save_many = strict_save
+        self.store.maxsize = 10
+        with self.store.edit(1) as data:
+            handle_input("set savings to 5000", data)
+        with self.store.edit(2) as data:
+            handle_input("set savings to 500", data)
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(self.backend.rows[2]["savings"], 500)
+        stats = self.store.stats()
+        self.assertEqual((stats["dirty"], stats["dropped"]), (0, 1))
+        self.assertEqual(self.store.get(1)["savings"], DEFAULT_USER_DATA["savings"])
+        print("\n✅ test_bad_row_does_not_block_batch passed — Bad row dropped, batch saved.")
+
+    def test_out_of_range_amounts_rejected(self):
+        """Amounts too big for the table never reach the stored state"""
+        with self.store.edit(1) as data:
+            self.assertEqual(handle_input("set income to 100000000000000", data), "Couldn't process income update.")
+            handle_input("set food to 9999999999", data)
+            self.assertIn("can't go above", handle_input("add 1 to food", data))
+        self.assertEqual(self.store.get(1)["income"], DEFAULT_USER_DATA["income"])
+        print("\n✅ test_out_of_range_amounts_rejected passed — Oversized amounts refused.")
+
+    def test_read_only_messages_stay_clean(self):
+        """Showing the budget does not mark the user dirty"""
+        with self.store.edit(1) as data:
+            handle_input("show my budget", data)
+        self.assertEqual(self.store.stats()["dirty"], 0)
+        print("\n✅ test_read_only_messages_stay_clean passed — No write for reads.")
+
+    def test_workers_do_not_overwrite_each_other(self):
+        """A worker holding an outdated copy loses its write and reloads instead of clobbering"""
+        other = BudgetStateStore(load=self.backend.load, save_many=self.backend.save_many,
+                                 maxsize=2, flush_interval=60, flush_batch=100)
+        self.addCleanup(other.close)
+        for store in (self.store, other):
+            store.get(1)
+        with self.store.edit(1) as data:
+            handle_input("set income to 5000", data)
+        self.assertEqual(self.store.flush(), 1)
+
+        with other.edit(1) as data:
+            handle_input("set savings to 900", data)
+        self.assertEqual(other.flush(), 0)
+        self.assertEqual(other.stats()["conflicts"], 1)
+        self.assertEqual(self.backend.rows[1]["income"], 5000)
+        self.assertEqual(other.get(1)["income"], 5000)
+
+        # Once reloaded it writes on top of the newer row
+        with other.edit(1) as data:
+            handle_input("set savings to 900", data)
+        self.assertEqual(other.flush(), 1)
+        self.assertEqual((self.backend.rows[1]["income"], self.backend.rows[1]["savings"]), (5000, 900))
+        print("\n✅ test_workers_do_not_overwrite_each_other passed — Compare-and-set write.")
+
+    def test_concurrent_edits(self):
+        """Concurrent edits for one user should not lose updates"""
+        def add():
+            for _ in range(50):
+                with self.store.edit(9) as data:
+                    handle_input("add 1 to bills", data)
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.store.get(9)["categories"]["bills"], 1200)
+        print("\n✅ test_concurrent_edits passed — No lost updates under concurrency.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
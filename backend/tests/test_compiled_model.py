@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import app.model as model_module
+from app.compiled import CompiledForest, ModelFileError
+from app.logic import FEATURES
+from app.model import get_model
+
+
+class TestCompiledModel(unittest.TestCase):
+    """Compiled forest must agree with sklearn's predict"""
+
+    def setUp(self):
+        self.model = get_model()
+        self.compiled = CompiledForest.from_sklearn(self.model)
+        rng = np.random.default_rng(42)
+        self.X = rng.uniform([500, 0, 0, 1], [20000, 10000, 50000, 60], size=(5000, 4))
+
+    def test_batch_matches_sklearn(self):
+        """Batch predictions should match model.predict"""
+        expected = self.model.predict(pd.DataFrame(self.X, columns=FEATURES))
+        np.testing.assert_allclose(self.compiled.predict(self.X), expected, rtol=0, atol=1e-12)
+        print("\n✅ test_batch_matches_sklearn passed — Compiled batch output matches sklearn.")
+
+    def test_single_row_matches_sklearn(self):
+        """Single-row predictions should match model.predict"""
+        for row in self.X[:50]:
+            expected = self.model.predict(pd.DataFrame([row], columns=FEATURES))[0]
+            np.testing.assert_allclose(self.compiled.predict_one(row), expected, rtol=0, atol=1e-12)
+        print("\n✅ test_single_row_matches_sklearn passed — Compiled single-row output matches sklearn.")
+
+    def test_threshold_edges(self):
+        """Rows sitting exactly on split thresholds should follow sklearn"""
+        tree = self.model.estimators_[0].tree_
+        splits = tree.children_left != -1
+        rows = np.tile(self.X[0], (splits.sum(), 1))
+        rows[np.arange(splits.sum()), tree.feature[splits]] = tree.threshold[splits]
+        expected = self.model.predict(pd.DataFrame(rows, columns=FEATURES))
+        np.testing.assert_allclose(self.compiled.predict(rows), expected, rtol=0, atol=1e-12)
+        print("\n✅ test_threshold_edges passed — Threshold ties resolved like sklearn.")
+
+    def test_rejects_non_forest(self):
+        """Models without estimators_ cannot be compiled"""
+        with self.assertRaises(TypeError):
+            CompiledForest.from_sklearn(object())
+        print("\n✅ test_rejects_non_forest passed — Unsupported models rejected.")
+
+
+class TestMappedModel(unittest.TestCase):
+    """Flat model files mapped read-only and shared across processes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.compiled = CompiledForest.from_sklearn(get_model())
+        self.X = np.random.default_rng(7).uniform([500, 0, 0, 1], [20000, 10000, 50000, 60], size=(500, 4))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_is_mapped(self):
+        """A saved forest maps back read-only and predicts identically"""
+        path = self.dir / "model.forest"
+        self.compiled.save(path, meta={"note": "x"})
+        mapped, meta = CompiledForest.load(path)
+        self.assertEqual(meta, {"note": "x"})
+        self.assertTrue(mapped.mapped)
+        self.assertFalse(mapped.value.flags.writeable)
+        np.testing.assert_array_equal(mapped.predict(self.X), self.compiled.predict(self.X))
+        print("\n✅ test_round_trip_is_mapped passed — Mapped forest matches.")
+
+    def test_corrupt_file_rejected(self):
+        """Flipped payload bytes fail the checksum; garbage fails the header check"""
+        path = self.dir / "model.forest"
+        self.compiled.save(path)
+        data = bytearray(path.read_bytes())
+        data[-100] ^= 0xFF
+        path.write_bytes(bytes(data))
+        with self.assertRaises(ModelFileError):
+            CompiledForest.load(path)
+        path.write_bytes(b"not a model")
+        with self.assertRaises(ModelFileError):
+            CompiledForest.load(path)
+        print("\n✅ test_corrupt_file_rejected passed — Checksum enforced.")
+
+    def test_stale_file_rebuilt(self):
+        """A mapped file built from a different pickle is rebuilt; a current one skips sklearn"""
+        pkl = self.dir / "budget_model.pkl"
+        shutil.copy(model_module.MODEL_PATH, pkl)
+        forest = pkl.with_suffix(".forest")
+        with mock.patch.object(model_module, "MODEL_PATH", pkl), \
+                mock.patch.object(model_module, "MAPPED_MODEL_PATH", forest):
+            compiled, model = model_module.load_mapped_model()
+            self.assertIsNotNone(model)
+            self.assertTrue(forest.exists())
+
+            compiled, model = model_module.load_mapped_model()
+            self.assertIsNone(model)
+            self.assertTrue(compiled.mapped)
+
+            with open(pkl, "ab") as f:
+                f.write(b"\0")  # joblib ignores trailing bytes; the checksum doesn't
+            compiled, model = model_module.load_mapped_model()
+            self.assertIsNotNone(model)
+        print("\n✅ test_stale_file_rebuilt passed — Stale mapped model rebuilt.")
+
+    def test_non_forest_replaces_mapped_file(self):
+        """A model that can't be compiled is served through sklearn, never through an older .forest"""
+        import joblib
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        from sklearn.multioutput import MultiOutputRegressor
+
+        pkl = self.dir / "budget_model.pkl"
+        shutil.copy(model_module.MODEL_PATH, pkl)
+        forest = pkl.with_suffix(".forest")
+        with mock.patch.object(model_module, "MODEL_PATH", pkl), \
+                mock.patch.object(model_module, "MAPPED_MODEL_PATH", forest):
+            model_module.load_mapped_model()
+            self.assertTrue(forest.exists())
+
+            hist = MultiOutputRegressor(HistGradientBoostingRegressor(max_iter=10)).fit(
+                pd.DataFrame(self.X, columns=FEATURES), self.X[:, :3] / self.X[:, :1])
+            joblib.dump(hist, pkl)
+            compiled, model = model_module.load_mapped_model()
+            self.assertIsNone(compiled)
+            self.assertFalse(forest.exists())
+            frame = pd.DataFrame(self.X, columns=FEATURES)
+            np.testing.assert_array_equal(model.predict(frame), hist.predict(frame))
+        print("\n✅ test_non_forest_replaces_mapped_file passed — Stale forest not served.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
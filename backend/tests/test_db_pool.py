@@ -0,0 +1,146 @@
+import threading
+import unittest
+
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stands in for a pymysql connection"""
+
+    def __init__(self):
+        self.open = True
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self, reconnect=True):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Checkout, bounds and health checks of the MySQL connection pool"""
+
+    def make_pool(self, **kwargs):
+        self.created = []
+
+        def connect():
+            conn = FakeConnection()
+            self.created.append(conn)
+            return conn
+
+        return ConnectionPool(connect=connect, **kwargs)
+
+    def test_reuses_connections(self):
+        """Sequential checkouts should reuse the same connection"""
+        pool = self.make_pool(minsize=1, maxsize=4, timeout=1)
+        with pool.connection() as a:
+            pass
+        with pool.connection() as b:
+            pass
+        self.assertIs(a, b)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(a.rollbacks, 2)
+        print("\n✅ test_reuses_connections passed — Idle connection reused.")
+
+    def test_max_size_and_timeout(self):
+        """Checkout beyond maxsize should block then time out"""
+        pool = self.make_pool(minsize=0, maxsize=2, timeout=0.05)
+        a = pool.acquire()
+        b = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        pool.release(a)
+        self.assertIs(pool.acquire(), a)
+        pool.release(b)
+        self.assertEqual(pool.stats()["size"], 2)
+        print("\n✅ test_max_size_and_timeout passed — Pool bounded with checkout timeout.")
+
+    def test_waiter_gets_released_connection(self):
+        """A blocked thread should get a connection as soon as one is returned"""
+        pool = self.make_pool(minsize=0, maxsize=1, timeout=2)
+        held = pool.acquire()
+        got = []
+        t = threading.Thread(target=lambda: got.append(pool.acquire()))
+        t.start()
+        pool.release(held)
+        t.join(timeout=2)
+        self.assertEqual(got, [held])
+        print("\n✅ test_waiter_gets_released_connection passed — Waiters woken on release.")
+
+    def test_dead_connection_replaced(self):
+        """Connections failing the health check should be replaced on borrow"""
+        pool = self.make_pool(minsize=1, maxsize=1, timeout=1)
+        with pool.connection() as first:
+            pass
+        first.alive = False
+        with pool.connection() as second:
+            self.assertIsNot(second, first)
+        self.assertFalse(first.open)
+        self.assertEqual(pool.stats()["size"], 1)
+        print("\n✅ test_dead_connection_replaced passed — Broken connection reconnected.")
+
+    def test_failed_rollback_discards(self):
+        """A connection that dies mid-request should not return to the pool"""
+        pool = self.make_pool(minsize=0, maxsize=1, timeout=1)
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as conn:
+                conn.alive = False
+                raise RuntimeError("boom")
+        self.assertEqual(pool.stats(), {"size": 0, "idle": 0, "in_use": 0, "maxsize": 1})
+        print("\n✅ test_failed_rollback_discards passed — Dead connection discarded.")
+
+    def test_connect_failure_frees_slot(self):
+        """A failed connect should not leak pool capacity"""
+        pool = ConnectionPool(connect=self._fail, minsize=0, maxsize=1, timeout=0.05)
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                pool.acquire()
+        self.assertEqual(pool.stats()["size"], 0)
+        print("\n✅ test_connect_failure_frees_slot passed — Capacity restored after connect error.")
+
+    def test_fill_connects_outside_the_lock(self):
+        """Threads can release connections and read stats while the pool is still connecting"""
+        gate, connecting = threading.Event(), threading.Event()
+
+        def slow_connect():
+            connecting.set()
+            gate.wait(5)
+            return FakeConnection()
+
+        pool = ConnectionPool(connect=slow_connect, minsize=2, maxsize=4, timeout=1)
+        filler = threading.Thread(target=pool.acquire)
+        filler.start()
+        self.assertTrue(connecting.wait(1))
+
+        done = threading.Event()
+        threading.Thread(target=lambda: (pool.stats(), done.set()), daemon=True).start()
+        self.assertTrue(done.wait(1))
+        self.assertEqual(pool.stats()["size"], 2)
+        gate.set()
+        filler.join(5)
+        self.assertEqual(pool.stats(), {"size": 2, "idle": 1, "in_use": 1, "maxsize": 4})
+        print("\n✅ test_fill_connects_outside_the_lock passed — Slow connect doesn't block the pool.")
+
+    def test_fill_failure_frees_reserved_slots(self):
+        """A connect error while filling gives back every slot it had reserved"""
+        pool = ConnectionPool(connect=self._fail, minsize=3, maxsize=4, timeout=0.05)
+        with self.assertRaises(ConnectionError):
+            pool.acquire()
+        self.assertEqual(pool.stats()["size"], 0)
+        print("\n✅ test_fill_failure_frees_reserved_slots passed — Reserved capacity restored.")
+
+    @staticmethod
+    def _fail():
+        raise ConnectionError("refused")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from hashing import PasswordHasher, HasherBusy
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """bcrypt offloading with a bounded queue"""
+
+    def setUp(self):
+        self.hasher = PasswordHasher(workers=2, queue_size=1, rounds=4)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    def test_hash_and_check(self):
+        """Hashes should verify and use the configured work factor"""
+        hashed = self.hasher.hash_password("correct horse")
+        self.assertTrue(hashed.startswith("$2b$04$"))
+        self.assertTrue(self.hasher.check_password("correct horse", hashed))
+        self.assertFalse(self.hasher.check_password("wrong horse", hashed))
+        stats = self.hasher.stats()
+        self.assertEqual(stats["completed"], 3)
+        self.assertGreater(stats["latency_max"], 0)
+        print("\n✅ test_hash_and_check passed — Hashes verify with tuned rounds.")
+
+    def test_rejects_when_queue_full(self):
+        """Calls beyond workers + queue_size should fail fast"""
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def slow_checkpw(password, hashed):
+            started.release()
+            release.wait(timeout=5)
+            return True
+
+        with mock.patch("hashing.bcrypt.checkpw", side_effect=slow_checkpw):
+            threads = [threading.Thread(target=self.hasher.check_password, args=("pw", "hash"))
+                       for _ in range(3)]
+            for t in threads:
+                t.start()
+            started.acquire(timeout=5)
+            started.acquire(timeout=5)
+            deadline = time.monotonic() + 5
+            while self.hasher.stats()["queue_depth"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(self.hasher.stats()["queue_depth"], 1)
+
+            with self.assertRaises(HasherBusy) as ctx:
+                self.hasher.check_password("pw", "hash")
+            self.assertEqual(ctx.exception.retry_after, self.hasher.retry_after)
+
+            release.set()
+            for t in threads:
+                t.join(timeout=5)
+
+        stats = self.hasher.stats()
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["completed"], 3)
+        print("\n✅ test_rejects_when_queue_full passed — Overflow rejected with Retry-After.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,178 @@
+import csv
+import datetime
+import io
+import json
+import unittest
+from contextlib import contextmanager
+from decimal import Decimal
+
+import history
+
+T0 = datetime.datetime(2025, 1, 31, 12, 0, 0)
+
+
+def make_bets(n):
+    """Bets newest first, two per timestamp so ties on bet_date are exercised"""
+    return [{"id": 1000 - i, "bet_date": T0 - datetime.timedelta(hours=i // 2), "status": "won",
+             "total_stake": Decimal("10.00"), "total_odds": Decimal("2.50"), "potential_win": Decimal("25.00"),
+             "actual_payout": Decimal("25.00"), "settled_date": None, "parlay_id": None}
+            for i in range(n)]
+
+
+def leg(n):
+    return {"leg_order": n, "selection": f"Team {n}", "odds": Decimal("150"), "odds_format": "american",
+            "game_id": n, "game_name": "A vs B", "team_a": "A", "team_b": "B", "game_date": T0,
+            "game_status": "completed", "leg_result": "won"}
+
+
+class FakeCursor:
+    """Applies the keyset parameters to an in-memory list of bets"""
+
+    def __init__(self, bets, legs_per_bet=2):
+        self.bets = bets
+        self.legs_per_bet = legs_per_bet
+        self.queries = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @staticmethod
+    def _key(bet_date, bet_id):
+        # MySQL orders NULL below every date
+        return (bet_date is not None, bet_date or T0, bet_id)
+
+    def _page(self, params):
+        if len(params) == 2:
+            _, limit = params
+            rows = self.bets
+        else:
+            if len(params) == 3:
+                (_, bet_id, limit), bet_date = params, None
+            else:
+                _, bet_date, _, bet_id, limit = params
+            after = self._key(bet_date, bet_id)
+            rows = [b for b in self.bets if self._key(b["bet_date"], b["id"]) < after]
+        return rows[:limit]
+
+    def execute(self, sql, params):
+        self.queries.append(params)
+        if "bsi.bet_id IN" in sql:
+            self._rows = [{"bet_id": bet_id, **leg(n)} for bet_id in params for n in range(self.legs_per_bet)]
+        elif "LEFT JOIN bet_slip_items" in sql:
+            self._rows = [{"bet_id": b["id"], **{k: v for k, v in b.items() if k != "id"}, **leg(n)}
+                          for b in self._page(params) for n in range(self.legs_per_bet)]
+        else:
+            self._rows = [dict(b) for b in self._page(params)]
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursorclass=None):
+        return self._cursor
+
+
+class TestHistory(unittest.TestCase):
+    """Keyset-paginated history and streaming exports"""
+
+    def test_cursor_round_trip(self):
+        """Cursors encode the keyset position and reject garbage"""
+        self.assertEqual(history.decode_cursor(history.encode_cursor(T0, 42)), (T0, 42))
+        with self.assertRaises(ValueError):
+            history.decode_cursor("not-a-cursor")
+        print("\n✅ test_cursor_round_trip passed — Cursor encoded and decoded.")
+
+    def test_pages_cover_history_once(self):
+        """Walking the pages returns every bet exactly once, newest first"""
+        bets = make_bets(23)
+        conn = FakeConnection(FakeCursor(bets))
+        seen, after = [], None
+        while True:
+            page, cursor = history.fetch_page(conn, 7, limit=5, after=after)
+            seen.extend(bet["id"] for bet in page)
+            self.assertTrue(all(len(bet["legs"]) == 2 for bet in page))
+            if cursor is None:
+                break
+            after = history.decode_cursor(cursor)
+        self.assertEqual(seen, [b["id"] for b in bets])
+        print("\n✅ test_pages_cover_history_once passed — Keyset pages complete.")
+
+    def test_undated_bets_are_paged(self):
+        """Bets with a NULL bet_date come last and page like the rest"""
+        bets = make_bets(5) + [dict(b, id=10 - i, bet_date=None) for i, b in enumerate(make_bets(4))]
+        conn = FakeConnection(FakeCursor(bets))
+        self.assertEqual(history.decode_cursor(history.encode_cursor(None, 9)), (None, 9))
+        seen, after = [], None
+        while True:
+            page, cursor = history.fetch_page(conn, 7, limit=3, after=after)
+            seen.extend(bet["id"] for bet in page)
+            if cursor is None:
+                break
+            after = history.decode_cursor(cursor)
+        self.assertEqual(seen, [b["id"] for b in bets])
+        print("\n✅ test_undated_bets_are_paged passed — NULL-dated bets kept in history.")
+
+    def test_export_streams_in_chunks(self):
+        """Exports read one bounded chunk per query and emit CSV rows per leg"""
+        cursor = FakeCursor(make_bets(25))
+
+        @contextmanager
+        def connection():
+            yield FakeConnection(cursor)
+
+        chunks = list(history.export_chunks(7, "csv", chunk_size=10, connection=connection))
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(params[-1] == 10 for params in cursor.queries))
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        self.assertEqual(tuple(rows[0]), history.CSV_HEADER)
+        self.assertEqual(len(rows) - 1, 50)
+        print("\n✅ test_export_streams_in_chunks passed — CSV streamed chunk by chunk.")
+
+    def test_ndjson_export(self):
+        """NDJSON exports one bet per line with its legs nested"""
+        cursor = FakeCursor(make_bets(4), legs_per_bet=3)
+
+        @contextmanager
+        def connection():
+            yield FakeConnection(cursor)
+
+        lines = "".join(history.export_chunks(7, "ndjson", chunk_size=3, connection=connection)).splitlines()
+        bets = [json.loads(line) for line in lines]
+        self.assertEqual([b["id"] for b in bets], [1000, 999, 998, 997])
+        self.assertEqual([len(b["legs"]) for b in bets], [3, 3, 3, 3])
+        self.assertEqual(bets[0]["total_stake"], "10.00")
+        print("\n✅ test_ndjson_export passed — NDJSON grouped by bet.")
+
+    def test_export_yields_rows_as_fetched(self):
+        """Rows go out in fetch-sized batches, and a bet split across batches keeps all its legs"""
+        def export(fmt, fetch_size):
+            cursor = FakeCursor(make_bets(7), legs_per_bet=3)
+
+            @contextmanager
+            def connection():
+                yield FakeConnection(cursor)
+
+            return list(history.export_chunks(7, fmt, chunk_size=5, connection=connection, fetch_size=fetch_size))
+
+        self.assertEqual(len(export("csv", 4)), 6)  # 15 rows then 6 rows, four at a time
+        self.assertEqual("".join(export("csv", 4)), "".join(export("csv", 100)))
+        self.assertEqual("".join(export("ndjson", 2)), "".join(export("ndjson", 100)))
+        bets = [json.loads(line) for line in "".join(export("ndjson", 2)).splitlines()]
+        self.assertEqual([len(b["legs"]) for b in bets], [3] * 7)
+        print("\n✅ test_export_yields_rows_as_fetched passed — Export streamed row batch by row batch.")
+
+
+if __name__ == "__main__":
+    unittest.main()
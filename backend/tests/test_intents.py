@@ -0,0 +1,73 @@
+import unittest
+
+from benchmarks.bench_intents import legacy_handle_input, load_corpus
+from chat import default_user_data, handle_input
+import intents
+from intents import Intent, IntentRouter, parse_amount, parse_intent
+
+
+class TestIntentRouter(unittest.TestCase):
+    """Structured parsing of chat commands"""
+
+    def test_update_intents(self):
+        """Updates should carry target, mode and amount"""
+        self.assertEqual(parse_intent("Set income to 5,000"), Intent("update", "income", "set", 5000.0))
+        self.assertEqual(parse_intent("add 45.75 to food"), Intent("update", "food", "add", 45.75))
+        self.assertEqual(parse_intent("update savings to 300"), Intent("update", "savings", "set", 300.0))
+        self.assertEqual(parse_intent("make savings 300"), Intent("update", "savings", "add", 300.0))
+        self.assertEqual(parse_intent("expenses"), Intent("update", "expenses", "add", None))
+        print("\n✅ test_update_intents passed — Update commands parsed.")
+
+    def test_priority_and_keywords(self):
+        """Higher-priority keywords win regardless of position"""
+        self.assertEqual(parse_intent("show food and help").name, "help")
+        self.assertEqual(parse_intent("show my budget"), Intent("show"))
+        self.assertEqual(parse_intent("  HEY "), Intent("greet"))
+        self.assertEqual(parse_intent("how am I doing?"), Intent("summary"))
+        self.assertEqual(parse_intent("add 10 to my income and food").target, "income")
+        print("\n✅ test_priority_and_keywords passed — Keyword priority respected.")
+
+    def test_set_verbs_need_word_start(self):
+        """'assets' must not be read as the verb 'set'"""
+        self.assertEqual(parse_intent("add my assets 100 to income").mode, "add")
+        self.assertEqual(parse_intent("updated income 100").mode, "set")
+        print("\n✅ test_set_verbs_need_word_start passed — Verb matching is word-anchored.")
+
+    def test_amount_tokenizer(self):
+        """Amounts should parse currency-style numbers"""
+        self.assertEqual(parse_amount("add $1,200.50 to bills"), 1200.5)
+        self.assertEqual(parse_amount("add .5 to food"), 0.5)
+        self.assertEqual(parse_amount("add 2 then 3"), 2.0)
+        self.assertIsNone(parse_amount("add some to food"))
+        self.assertEqual(parse_amount("set income to 9,999,999,999.99"), 9999999999.99)
+        self.assertIsNone(parse_amount("set income to 100000000000000"))
+        self.assertIsNone(parse_amount("set income to " + "9" * 400))  # float('inf')
+        print("\n✅ test_amount_tokenizer passed — Amounts tokenized.")
+
+    def test_cache_keyed_on_normalized_text(self):
+        """Case and padding variants share a cache entry; long messages are never cached"""
+        intents._parse_cached.cache_clear()
+        self.assertEqual(parse_intent("Show my budget"), parse_intent("  show MY budget "))
+        self.assertEqual(intents._parse_cached.cache_info().currsize, 1)
+        long_message = "add 20 to food " + "x" * intents.MAX_CACHED_MESSAGE
+        self.assertEqual(parse_intent(long_message), Intent("update", "food", "add", 20.0))
+        self.assertEqual(intents._parse_cached.cache_info().currsize, 1)
+        print("\n✅ test_cache_keyed_on_normalized_text passed — Intent cache stays bounded.")
+
+    def test_custom_categories(self):
+        """Routers can be compiled for other category sets"""
+        router = IntentRouter(categories=("travel", "food"))
+        self.assertEqual(router.parse("add 20 to travel"), Intent("update", "travel", "add", 20.0))
+        print("\n✅ test_custom_categories passed — Custom categories routed.")
+
+    def test_matches_previous_parser_on_corpus(self):
+        """Replies on the recorded corpus should match the old parser"""
+        old_state, new_state = default_user_data(), default_user_data()
+        for message in load_corpus():
+            self.assertEqual(handle_input(message, new_state), legacy_handle_input(message, old_state), message)
+        self.assertEqual(new_state, old_state)
+        print("\n✅ test_matches_previous_parser_on_corpus passed — Replies unchanged on corpus.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
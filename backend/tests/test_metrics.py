@@ -0,0 +1,91 @@
+import unittest
+
+from flask import Flask
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Prometheus metrics, request hooks and query labels"""
+
+    def test_histogram_render(self):
+        """Histogram buckets are cumulative with +Inf, sum and count"""
+        hist = metrics.Histogram("test_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            hist.observe(value, "/x")
+        lines = hist.render()
+        self.assertIn('clutchcall_test_seconds_bucket{route="/x",le="0.1"} 1', lines)
+        self.assertIn('clutchcall_test_seconds_bucket{route="/x",le="1.0"} 3', lines)
+        self.assertIn('clutchcall_test_seconds_bucket{route="/x",le="+Inf"} 4', lines)
+        self.assertIn('clutchcall_test_seconds_count{route="/x"} 4', lines)
+        self.assertIn("# TYPE clutchcall_test_seconds histogram", lines)
+        print("\n✅ test_histogram_render passed — Histogram rendered.")
+
+    def test_query_label(self):
+        """Statements are labelled by verb and first table"""
+        self.assertEqual(metrics.query_label("\n  SELECT id FROM bets WHERE user_id = %s"), "SELECT bets")
+        self.assertEqual(metrics.query_label("INSERT INTO audit_logs (a) VALUES (%s)"), "INSERT audit_logs")
+        self.assertEqual(metrics.query_label("UPDATE bankrolls SET x = 1"), "UPDATE bankrolls")
+        self.assertEqual(metrics.query_label("SELECT GET_LOCK(%s, %s)"), "SELECT")
+        print("\n✅ test_query_label passed — Queries labelled.")
+
+    def test_request_hooks(self):
+        """Requests are counted and timed per URL rule, errors by exception type"""
+        app = Flask(__name__)
+
+        @app.route("/items/<int:item_id>")
+        def item(item_id):
+            if item_id == 0:
+                raise RuntimeError("boom")
+            return "ok"
+
+        metrics.init_app(app)
+        client = app.test_client()
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/items/0")
+        body = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('clutchcall_http_requests_total{route="/items/<int:item_id>",method="GET",status="200"} 2',
+                      body)
+        self.assertIn('clutchcall_http_requests_total{route="/items/<int:item_id>",method="GET",status="500"} 1',
+                      body)
+        self.assertIn('clutchcall_http_request_exceptions_total{route="/items/<int:item_id>",'
+                      'exception="RuntimeError"} 1', body)
+        self.assertIn('clutchcall_http_requests_in_flight{route="/items/<int:item_id>"} 0', body)
+        print("\n✅ test_request_hooks passed — Requests instrumented.")
+
+    def test_stats_and_model_timing(self):
+        """stats() values become gauges; suggest_budget is timed once however often it is wrapped"""
+        registry = metrics.Registry()
+        registry.add_stats("test_pool", lambda: {"in_use": 3, "name": "x"})
+        body = registry.render()
+        self.assertIn("clutchcall_test_pool_in_use 3", body)
+        self.assertNotIn("clutchcall_test_pool_name", body)
+
+        from app import logic
+        metrics.instrument_budget_model()
+        metrics.instrument_budget_model()
+        self.assertFalse(hasattr(logic.suggest_budget.__wrapped__, "__wrapped__"))
+        logic.suggest_budget(4000, 1500, -1, 6)
+        self.assertIn('clutchcall_model_call_duration_seconds_count{function="suggest_budget"}',
+                      metrics.registry.render())
+        print("\n✅ test_stats_and_model_timing passed — Stats and model calls exported.")
+
+    def test_budget_route_timed(self):
+        """A /budget/batch request shows up in the model latency histogram"""
+        import main
+
+        def count(function):
+            counts = metrics.MODEL_SECONDS._values.get((function,))
+            return 0 if counts is None else sum(counts[:-1])
+
+        before = count("suggest_budgets_batch"), count("predict")
+        response = main.app.test_client().post("/budget/batch", json={"rows": [[4000, 1500, 2400, 6]]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(count("suggest_budgets_batch"), before[0] + 1)
+        self.assertEqual(count("predict"), before[1] + 1)
+        print("\n✅ test_budget_route_timed passed — Route's model calls timed.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+
+import pymysql
+
+import migrations
+from migrations import LATEST_VERSION, MIGRATIONS
+
+
+class FakeCursor:
+    """Answers the schema_version query and records every statement"""
+
+    def __init__(self, version=None, indexes=()):
+        self.version = version  # None: schema_version doesn't exist yet
+        self.indexes = set(indexes)  # indexes and columns that already exist
+        self.executed = []
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if "GET_LOCK" in sql:
+            self._row = {"locked": 1}
+        elif "MAX(version)" in sql:
+            if self.version is None:
+                raise pymysql.err.ProgrammingError(1146, "Table 'schema_version' doesn't exist")
+            self._row = {"version": self.version}
+        elif "information_schema" in sql:
+            self._row = {"1": 1} if params[1] in self.indexes else None
+        elif sql.startswith("INSERT INTO schema_version"):
+            self.version = params[0]
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+
+def ddl(cursor):
+    return [sql for sql in cursor.executed if "CREATE TABLE" in sql and "schema_version" not in sql]
+
+
+class TestMigrations(unittest.TestCase):
+    """Versioned schema migrations"""
+
+    def test_versions_are_sequential(self):
+        """Migration versions start at 1 and increase by one"""
+        self.assertEqual([m.version for m in MIGRATIONS], list(range(1, LATEST_VERSION + 1)))
+        print("\n✅ test_versions_are_sequential passed — Versions ordered.")
+
+    def test_fresh_database(self):
+        """A database without schema_version gets every migration, recorded once each"""
+        cursor = FakeCursor()
+        applied = migrations.migrate(FakeConnection(cursor), log=lambda *a: None)
+        self.assertEqual(applied, list(range(1, LATEST_VERSION + 1)))
+        self.assertEqual(cursor.version, LATEST_VERSION)
+        self.assertIn("RELEASE_LOCK", cursor.executed[-1])
+        print("\n✅ test_fresh_database passed — All migrations applied.")
+
+    def test_current_database_runs_no_ddl(self):
+        """Re-running against a current database applies nothing"""
+        cursor = FakeCursor(version=LATEST_VERSION)
+        self.assertEqual(migrations.migrate(FakeConnection(cursor), log=lambda *a: None), [])
+        self.assertEqual(ddl(cursor), [])
+        print("\n✅ test_current_database_runs_no_ddl passed — No DDL when current.")
+
+    def test_partial_upgrade_and_target(self):
+        """Only migrations above the current version (and up to the target) run"""
+        cursor = FakeCursor(version=1)
+        applied = migrations.migrate(FakeConnection(cursor), target=2, log=lambda *a: None)
+        self.assertEqual(applied, [2])
+        self.assertEqual(ddl(cursor), MIGRATIONS[1].statements)
+        print("\n✅ test_partial_upgrade_and_target passed — Pending migrations only.")
+
+    def test_interrupted_index_migration_can_be_retried(self):
+        """An index left behind by a run that died before recording its version is not added twice"""
+        cursor = FakeCursor(version=4, indexes={"idx_user_bet_date"})
+        applied = migrations.migrate(FakeConnection(cursor), target=6, log=lambda *a: None)
+        self.assertEqual(applied, [5, 6])
+        alters = [sql for sql in cursor.executed if "ADD INDEX" in sql]
+        self.assertEqual(alters, [MIGRATIONS[5].statements[0].sql()])
+        print("\n✅ test_interrupted_index_migration_can_be_retried passed — Existing index skipped.")
+
+    def test_check_schema_tolerates_unreachable_database(self):
+        """The startup check logs and returns None instead of raising"""
+        def broken():
+            raise pymysql.err.OperationalError(2003, "Can't connect")
+
+        original = migrations.connection
+        migrations.connection = broken
+        try:
+            logged = []
+            self.assertIsNone(migrations.check_schema(log=lambda *a: logged.append(a)))
+            self.assertTrue(logged)
+        finally:
+            migrations.connection = original
+        print("\n✅ test_check_schema_tolerates_unreachable_database passed — Startup survives a down DB.")
+
+
+if __name__ == "__main__":
+    unittest.main()
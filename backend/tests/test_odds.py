@@ -0,0 +1,75 @@
+import unittest
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+from app import odds
+
+
+class TestOdds(unittest.TestCase):
+    """Odds conversion, vig removal and slip pricing"""
+
+    def test_conversions(self):
+        """American, decimal and fractional odds convert both ways"""
+        np.testing.assert_allclose(odds.to_decimal([150, -200, 100]), [2.5, 1.5, 2.0])
+        np.testing.assert_allclose(odds.to_decimal([1.5, 2.5], "fractional"), [2.5, 3.5])
+        np.testing.assert_allclose(odds.to_decimal([150, 2.5, 1.5], ["american", "decimal", "fractional"]),
+                                   [2.5, 2.5, 2.5])
+        american = np.array([-250, -110, 100, 120, 450])
+        np.testing.assert_allclose(odds.convert(american, "american", "american"), american)
+        self.assertEqual(odds.to_decimal_exact(-200), Decimal("1.5"))
+        self.assertEqual(odds.to_decimal_exact("0.5", "fractional"), Decimal("1.5"))
+        self.assertEqual(odds.to_decimal_exact(150, None), Decimal("2.5"))
+        print("\n✅ test_conversions passed — Odds formats converted.")
+
+    def test_invalid_odds(self):
+        """Impossible prices and unknown formats are rejected"""
+        for values, fmt in (([-50], "american"), ([1.0], "decimal"), ([0], "fractional"), ([2], "moneyline")):
+            with self.assertRaises(ValueError):
+                odds.to_decimal(values, fmt)
+            with self.assertRaises(ValueError):
+                odds.to_decimal_exact(values[0], fmt)
+        for value in (0, "NaN", "abc"):
+            with self.assertRaises(ValueError):
+                odds.to_decimal_exact(value)
+        print("\n✅ test_invalid_odds passed — Invalid odds rejected.")
+
+    def test_remove_vig(self):
+        """Fair probabilities sum to 1 per market, including padded markets"""
+        book = np.array([[1.91, 1.91, np.nan], [2.10, 3.40, 3.60]])
+        self.assertGreater(odds.overround(book)[0], 0)
+        for method in ("multiplicative", "power"):
+            fair = odds.remove_vig(book, method)
+            np.testing.assert_allclose(np.nansum(fair, axis=1), [1.0, 1.0], atol=1e-9)
+            np.testing.assert_allclose(fair[0, :2], [0.5, 0.5])
+        print("\n✅ test_remove_vig passed — Margin removed.")
+
+    def test_price_slips_batch(self):
+        """Ragged batches price like one slip at a time"""
+        rng = np.random.default_rng(3)
+        lengths = rng.integers(1, 8, size=2000)
+        legs = rng.choice([-300, -150, -110, 100, 120, 250, 600], size=lengths.sum())
+        stakes = rng.integers(1, 50_000, size=len(lengths)) / 100
+
+        prices = odds.price_slips(legs, lengths, stakes)
+        start = 0
+        for i, n in enumerate(lengths[:200]):
+            exact = Decimal(1)
+            for leg in legs[start:start + n]:
+                exact *= odds.to_decimal_exact(int(leg))
+            start += n
+            expected = (Decimal(str(stakes[i])) * exact).quantize(Decimal("0.01"), ROUND_HALF_UP)
+            self.assertEqual(odds.to_decimal_places([prices.potential_win[i]])[0], expected)
+        print("\n✅ test_price_slips_batch passed — Batch pricing matches exact arithmetic.")
+
+    def test_round_half_up(self):
+        """Ties round away from zero like MySQL DECIMAL, despite float noise"""
+        self.assertEqual(odds.to_decimal_places([2.675, 0.125, -1.005, 10.01 * 2.5]),
+                         [Decimal("2.68"), Decimal("0.13"), Decimal("-1.01"), Decimal("25.03")])
+        total_odds, potential_win = odds.price_slip([(-110, "american"), (2.5, "decimal")], "10.00")
+        self.assertEqual((total_odds, potential_win), (Decimal("4.77"), Decimal("47.73")))
+        print("\n✅ test_round_half_up passed — DECIMAL(10,2) rounding.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from flask import Flask
+
+import profiling
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling(unittest.TestCase):
+    """Sampled cProfile runs and stack samples of slow requests"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_app(self, profiler):
+        app = Flask(__name__)
+
+        @app.route("/work/<int:ms>")
+        def work(ms):
+            busy_wait(ms / 1000)
+            return "done"
+
+        self.assertIs(profiling.init_app(app, profiler), profiler)
+        return app.test_client()
+
+    def test_disabled_installs_nothing(self):
+        """With no sample rate or threshold no hooks are added"""
+        app = Flask(__name__)
+        self.assertIsNone(profiling.init_app(app, profiling.RequestProfiler(self.dir, 0, 0)))
+        self.assertEqual(app.before_request_funcs, {})
+        self.assertEqual(app.teardown_request_funcs, {})
+        print("\n✅ test_disabled_installs_nothing passed — No overhead when off.")
+
+    def test_sampled_request_profile(self):
+        """A sampled request is written as a loadable .prof tagged with route and request ID"""
+        client = self.make_app(profiling.RequestProfiler(self.dir, sample_rate=1.0, slow_ms=0))
+        resp = client.get("/work/5", headers={"X-Request-ID": "abc123"})
+        self.assertEqual(resp.headers["X-Request-ID"], "abc123")
+        files = list(self.dir.glob("*.prof"))
+        self.assertEqual(len(files), 1)
+        self.assertIn("work_int_ms-abc123", files[0].name)
+        self.assertTrue(any(func[2] == "busy_wait" for func in pstats.Stats(str(files[0])).stats))
+        print("\n✅ test_sampled_request_profile passed — cProfile output written.")
+
+    def test_slow_request_stacks(self):
+        """Only requests over the threshold keep their collapsed stacks"""
+        profiler = profiling.RequestProfiler(self.dir, sample_rate=0, slow_ms=50, interval=0.002)
+        client = self.make_app(profiler)
+        client.get("/work/1")
+        self.assertEqual(list(self.dir.glob("*.folded")), [])
+        client.get("/work/80", headers={"X-Request-ID": "../../etc"})
+        files = list(self.dir.glob("*.folded"))
+        self.assertEqual(len(files), 1)
+        self.assertNotIn("etc", files[0].name)
+        self.assertIn("busy_wait (test_profiling.py", files[0].read_text())
+        self.assertEqual(profiler.stats()["slow"], 1)
+        profiler.close()
+        print("\n✅ test_slow_request_stacks passed — Slow request sampled.")
+
+    def test_rotation(self):
+        """Only the newest max_files profiles are kept"""
+        client = self.make_app(profiling.RequestProfiler(self.dir, sample_rate=1.0, max_files=3))
+        for i in range(5):
+            client.get("/work/0", headers={"X-Request-ID": f"req{i}"})
+        self.assertEqual(len(list(self.dir.iterdir())), 3)
+        print("\n✅ test_rotation passed — Old profiles rotated out.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import datetime
+import unittest
+from decimal import Decimal
+
+from recommendations import RecommendationFeed
+
+NOW = datetime.datetime(2025, 3, 1, 12, 0)
+
+
+def rec(rec_id, confidence, sport_id=1, game_id=None, hours_ahead=24, user_id=7):
+    return {"id": rec_id, "user_id": user_id, "sport_id": sport_id, "game_id": game_id or rec_id,
+            "game_name": "A vs B", "selection": "A", "odds": Decimal("-110"),
+            "confidence_score": Decimal(str(confidence)), "recommended_stake": None, "created_at": NOW,
+            "game_date": NOW + datetime.timedelta(hours=hours_ahead)}
+
+
+class FakeTable:
+    """Serves the feed query from a list, counting how often it is hit"""
+
+    def __init__(self, recs):
+        self.recs = recs
+        self.queries = 0
+
+    def load(self, user_id, sport_id, limit, now):
+        self.queries += 1
+        rows = [r for r in self.recs if r["user_id"] == user_id and (sport_id is None or r["sport_id"] == sport_id)
+                and r["game_date"] > now]
+        rows.sort(key=lambda r: (-r["confidence_score"], -r["id"]))
+        return [dict(r) for r in rows[:limit]]
+
+
+class TestRecommendationFeed(unittest.TestCase):
+    """In-memory top-N recommendation feed"""
+
+    def test_top_n_served_from_memory(self):
+        """The first read loads from the DB; later reads are served from the index"""
+        table = FakeTable([rec(i, c) for i, c in enumerate([55, 91, 72, 91, 60], start=1)])
+        feed = RecommendationFeed(load=table.load, depth=10)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, 3, now=NOW)], [4, 2, 3])
+        self.assertEqual([r["id"] for r in feed.top(7, 1, 3, now=NOW)], [4, 2, 3])
+        self.assertEqual(table.queries, 1)
+        print("\n✅ test_top_n_served_from_memory passed — Feed cached.")
+
+    def test_insert_and_use_update_in_place(self):
+        """New recommendations slot in by confidence; used ones drop out"""
+        table = FakeTable([rec(1, 50), rec(2, 70)])
+        feed = RecommendationFeed(load=table.load, depth=10)
+        feed.top(7, 1, now=NOW)
+        feed.top(7, None, now=NOW)
+
+        feed.add(rec(3, 60))
+        self.assertEqual([r["id"] for r in feed.top(7, 1, now=NOW)], [2, 3, 1])
+        self.assertEqual([r["id"] for r in feed.top(7, None, now=NOW)], [2, 3, 1])
+        feed.discard(7, 1, 2)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, now=NOW)], [3, 1])
+        self.assertEqual(table.queries, 2)
+        print("\n✅ test_insert_and_use_update_in_place passed — Incremental updates.")
+
+    def test_reloads_when_depth_runs_out(self):
+        """A truncated feed reloads from the DB once used entries leave it short"""
+        table = FakeTable([rec(i, 50 + i) for i in range(1, 11)])
+        feed = RecommendationFeed(load=table.load, depth=4)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, 4, now=NOW)], [10, 9, 8, 7])
+        for rec_id in (10, 9):
+            table.recs = [r for r in table.recs if r["id"] != rec_id]
+            feed.discard(7, 1, rec_id)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, 4, now=NOW)], [8, 7, 6, 5])
+        self.assertEqual(table.queries, 2)
+        print("\n✅ test_reloads_when_depth_runs_out passed — Cold fallback on exhaustion.")
+
+    def test_started_and_removed_games_drop_out(self):
+        """Games that started or left the schedule are no longer recommended"""
+        table = FakeTable([rec(1, 90, hours_ahead=1), rec(2, 80, game_id=50), rec(3, 70)])
+        feed = RecommendationFeed(load=table.load, depth=10)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, now=NOW)], [1, 2, 3])
+        feed.remove_game(50)
+        later = NOW + datetime.timedelta(hours=2)
+        self.assertEqual([r["id"] for r in feed.top(7, 1, now=later)], [3])
+        print("\n✅ test_started_and_removed_games_drop_out passed — Expired entries pruned.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import datetime
+import unittest
+
+from reference_data import ReferenceData
+
+TODAY = datetime.date(2025, 3, 1)
+T0 = datetime.datetime(2025, 3, 1, 9, 0, 0)
+
+
+class FakeDB:
+    """Answers the reference queries from in-memory rows and counts them"""
+
+    def __init__(self):
+        self.sports = [{"id": 1, "sport_name": "NBA"}, {"id": 2, "sport_name": "NFL"}]
+        self.bet_types = [{"id": 1, "type_name": "Moneyline", "description": "Pick the winner"}]
+        self.games = [self.game(1, 1, "scheduled"), self.game(2, 1, "live"), self.game(3, 2, "scheduled"),
+                      self.game(4, 1, "completed")]
+        self.queries = []
+
+    @staticmethod
+    def game(game_id, sport_id, status, updated_at=T0):
+        return {"id": game_id, "sport_id": sport_id, "game_name": f"Game {game_id}", "team_a": "A",
+                "team_b": "B", "game_date": T0 + datetime.timedelta(days=1), "status": status,
+                "updated_at": updated_at}
+
+    def query(self, sql, params=()):
+        self.queries.append(sql)
+        if "FROM sports" in sql:
+            return self.sports
+        if "FROM bet_types" in sql:
+            return self.bet_types
+        if "MAX(updated_at)" in sql:
+            return [{"ts": max(g["updated_at"] for g in self.games)}]
+        if "updated_at = %s" in sql:
+            return [g for g in self.games if g["updated_at"] == params[0]]
+        if "updated_at >=" in sql:
+            return sorted((g for g in self.games if g["updated_at"] >= params[0]),
+                          key=lambda g: (g["updated_at"], g["id"]))
+        sport_id = params[0] if len(params) == 3 else None
+        return [g for g in self.games if g["status"] in ("scheduled", "live")
+                and (sport_id is None or g["sport_id"] == sport_id)]
+
+
+class TestReferenceData(unittest.TestCase):
+    """Cached sports, bet types and upcoming games"""
+
+    def setUp(self):
+        self.db = FakeDB()
+        self.ref = ReferenceData(query=self.db.query, poll_interval=0)
+
+    def test_static_tables_load_once(self):
+        """sports and bet_types are queried once, then served from memory"""
+        self.ref.preload()
+        for _ in range(3):
+            self.assertEqual(self.ref.sport(2)["sport_name"], "NFL")
+            self.assertEqual(len(self.ref.bet_types()), 1)
+        self.assertEqual(len(self.db.queries), 2)
+        print("\n✅ test_static_tables_load_once passed — Static tables cached.")
+
+    def test_upcoming_games_cached_per_window(self):
+        """Repeated window reads hit the cache and the hit rate is reported"""
+        for _ in range(4):
+            self.assertEqual([g["id"] for g in self.ref.upcoming_games(1, start=TODAY)], [1, 2])
+        self.ref.upcoming_games(2, start=TODAY)
+        self.assertEqual(len(self.db.queries), 2)
+        stats = self.ref.stats()["games"]
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 2))
+        print("\n✅ test_upcoming_games_cached_per_window passed — Windows cached.")
+
+    def test_invalidation_is_per_sport(self):
+        """Invalidating a sport refreshes its windows and the all-sports ones only"""
+        self.ref.upcoming_games(1, start=TODAY)
+        self.ref.upcoming_games(2, start=TODAY)
+        self.ref.upcoming_games(None, start=TODAY)
+        self.db.games[0]["status"] = "completed"
+        self.ref.invalidate_games(1)
+        self.db.queries.clear()
+
+        self.assertEqual([g["id"] for g in self.ref.upcoming_games(1, start=TODAY)], [2])
+        self.assertEqual([g["id"] for g in self.ref.upcoming_games(None, start=TODAY)], [2, 3])
+        self.ref.upcoming_games(2, start=TODAY)
+        self.assertEqual(len(self.db.queries), 2)
+        print("\n✅ test_invalidation_is_per_sport passed — Targeted invalidation.")
+
+    def test_poll_detects_status_changes(self):
+        """The updated_at poller invalidates and notifies once per change"""
+        changed = []
+        self.ref.on_game_change(changed.append)
+        self.ref.poll()  # sets the watermark
+        self.ref.upcoming_games(2, start=TODAY)
+
+        later = T0 + datetime.timedelta(minutes=5)
+        self.db.games[2].update(status="live", updated_at=later)
+        self.assertEqual([g["id"] for g in self.ref.poll()], [3])
+        self.assertEqual(self.ref.poll(), [])
+        self.assertEqual([g["id"] for g in changed], [3])
+
+        self.db.queries.clear()
+        self.assertEqual(self.ref.upcoming_games(2, start=TODAY)[0]["status"], "live")
+        self.assertEqual(len(self.db.queries), 1)
+        print("\n✅ test_poll_detects_status_changes passed — Polling invalidation.")
+
+
+if __name__ == "__main__":
+    unittest.main()
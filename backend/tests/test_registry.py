@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+import app.model as model_module
+from app import logic
+from app.registry import ModelRegistry, RegistryError
+
+ROW = [[4000, 1500, 2400, 6]]
+
+
+def small_forest(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform([500, 0, 0, 1], [20000, 10000, 50000, 60], size=(200, 4))
+    Y = rng.uniform(0, 1, size=(200, 3))
+    return RandomForestRegressor(n_estimators=5, max_depth=4, random_state=seed).fit(X, Y)
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Versioned model artifacts and hot swapping"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_activate_rollback(self):
+        """Versions are numbered in order, carry metadata and can be rolled back"""
+        v1 = self.registry.publish(small_forest(1), data_sha256="abc", metrics={"r2": 0.5})
+        v2 = self.registry.publish(small_forest(2), activate=True)
+        self.assertEqual((v1, v2), ("000001", "000002"))
+        self.assertEqual(self.registry.active_version(), v2)
+        meta = self.registry.metadata(v1)
+        self.assertEqual((meta["version"], meta["data_sha256"], meta["metrics"]), (v1, "abc", {"r2": 0.5}))
+        self.assertEqual(self.registry.rollback(), v1)
+        with self.assertRaises(RegistryError):
+            self.registry.rollback()
+        with self.assertRaises(RegistryError):
+            self.registry.activate("999999")
+        print("\n✅ test_publish_activate_rollback passed — Registry versions managed.")
+
+    def test_prune_keeps_active(self):
+        """Pruning keeps the newest versions and the active one"""
+        versions = [self.registry.publish(small_forest(i)) for i in range(4)]
+        self.registry.activate(versions[0])
+        self.assertEqual(self.registry.prune(keep=2), versions[1:2])
+        self.assertEqual(self.registry.versions(), [versions[0]] + versions[2:])
+        print("\n✅ test_prune_keeps_active passed — Active version survives pruning.")
+
+    def test_hot_swap(self):
+        """Activating a version swaps the served model and flushes cached results"""
+        models = [small_forest(1), small_forest(2)]
+        v1 = self.registry.publish(models[0], activate=True)
+        with mock.patch.object(model_module, "MODEL_REGISTRY", self.registry):
+            model_module.unload_model()
+            try:
+                _, old = model_module.get_loaded_model()
+                self.assertEqual(model_module.active_model_version(), v1)
+                self.assertTrue(old.mapped)
+                np.testing.assert_allclose(old.predict(ROW), models[0].predict(ROW))
+                logic.suggest_budget(4000, 1500, 2400, 6)
+                self.assertEqual(logic.budget_cache_stats()["size"], 1)
+
+                v2 = self.registry.publish(models[1], activate=True)
+                self.assertEqual(model_module.reload_model(), v2)
+                _, new = model_module.get_loaded_model()
+                np.testing.assert_allclose(new.predict(ROW), models[1].predict(ROW))
+                self.assertEqual(logic.budget_cache_stats()["size"], 0)
+                # A request still holding the old model can finish on it
+                np.testing.assert_allclose(old.predict(ROW), models[0].predict(ROW))
+                self.assertIsNotNone(model_module.get_model())
+            finally:
+                model_module.unload_model()
+        print("\n✅ test_hot_swap passed — New version swapped in without reload.")
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_forked_worker_follows_active(self):
+        """A worker forked after the model was loaded still swaps to a newly activated version"""
+        v1 = self.registry.publish(small_forest(1), activate=True)
+        with mock.patch.object(model_module, "MODEL_REGISTRY", self.registry), \
+                mock.patch.object(model_module, "MODEL_WATCH_INTERVAL", 0.02):
+            model_module.unload_model()
+            try:
+                model_module.get_loaded_model()
+                self.assertEqual(model_module.active_model_version(), v1)
+                read, write = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    # Child: like a pre-fork worker serving its first request
+                    status = 1
+                    try:
+                        os.close(read)
+                        v2 = self.registry.publish(small_forest(2), activate=True)
+                        model_module.get_loaded_model()
+                        deadline = time.monotonic() + 5
+                        while model_module.active_model_version() != v2 and time.monotonic() < deadline:
+                            time.sleep(0.02)
+                        os.write(write, str(model_module.active_model_version()).encode())
+                        status = 0
+                    finally:
+                        os._exit(status)
+                os.close(write)
+                served = os.read(read, 64).decode()
+                os.close(read)
+                _, status = os.waitpid(pid, 0)
+                self.assertEqual(status, 0)
+                self.assertEqual(served, "000002")
+            finally:
+                model_module.unload_model()
+        print("\n✅ test_forked_worker_follows_active passed — Forked worker follows ACTIVE.")
+
+
+if __name__ == "__main__":
+    unittest.main()
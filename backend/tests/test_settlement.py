@@ -0,0 +1,166 @@
+import unittest
+from decimal import Decimal
+
+import bet_stats
+import settlement
+from settlement import bankroll_deltas, resolve_bet, resolve_parlay
+
+
+class FakeCursor:
+    """Replays canned SELECT results in order and records every write."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.writes = []
+        self._last = []
+        self.sequence = 0
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().upper().startswith("SELECT"):
+            self._last = self.results.pop(0)
+        elif "settlement_sequence" in sql:
+            self.sequence += params[0]
+            self.lastrowid = self.sequence
+        else:
+            self.writes.append((sql, params))
+
+    def executemany(self, sql, rows):
+        self.writes.append((sql, list(rows)))
+
+    def fetchall(self):
+        return self._last
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class TestSettlement(unittest.TestCase):
+    """Bet resolution and bankroll aggregation"""
+
+    def test_resolve_bet(self):
+        """Lost legs lose, pushes drop out, unresolved legs keep the bet pending"""
+        two, three = Decimal("2"), Decimal("3")
+        self.assertIsNone(resolve_bet("10", [(two, "won"), (three, None)]))
+        self.assertEqual(resolve_bet("10", [(two, "won"), (three, "lost")]), ("lost", Decimal("0.00")))
+        self.assertEqual(resolve_bet("10", [(two, "won"), (three, "won")]), ("won", Decimal("60.00")))
+        self.assertEqual(resolve_bet("10", [(two, "won"), (three, "push")]), ("won", Decimal("20.00")))
+        self.assertEqual(resolve_bet("10", [(two, "push"), (three, "cancelled")]), ("push", Decimal("10.00")))
+        self.assertEqual(resolve_bet("10", [(two, "cancelled")]), ("cancelled", Decimal("10.00")))
+        self.assertEqual(resolve_bet("10.01", [(Decimal("1.91"), "won")]), ("won", Decimal("19.12")))
+        print("\n✅ test_resolve_bet passed — Bet outcomes resolved.")
+
+    def test_resolve_parlay(self):
+        """Parlays wait for every component and multiply the winners' odds"""
+        self.assertIsNone(resolve_parlay("5", [("won", "2.00"), ("pending", "1.50")]))
+        self.assertEqual(resolve_parlay("5", [("won", "2.00"), ("won", "1.50")]), ("won", Decimal("15.00")))
+        self.assertEqual(resolve_parlay("5", [("won", "2.00"), ("lost", "1.50")]), ("lost", Decimal("0.00")))
+        print("\n✅ test_resolve_parlay passed — Parlays resolved from components.")
+
+    def test_bankroll_deltas(self):
+        """One aggregated delta per bankroll; parlay components don't move money"""
+        settled = [
+            {"bankroll_id": 1, "parlay_id": None, "total_stake": "10", "status": "won", "actual_payout": Decimal("25.00")},
+            {"bankroll_id": 1, "parlay_id": None, "total_stake": "5", "status": "lost", "actual_payout": Decimal("0.00")},
+            {"bankroll_id": 1, "parlay_id": 9, "total_stake": "5", "status": "won", "actual_payout": Decimal("10.00")},
+            {"bankroll_id": 2, "parlay_id": None, "total_stake": "8", "status": "push", "actual_payout": Decimal("8.00")},
+        ]
+        deltas = bankroll_deltas(settled)
+        self.assertEqual(deltas[1], {"balance": Decimal("25.00"), "won": Decimal("15.00"), "lost": Decimal("5.00")})
+        self.assertEqual(deltas[2], {"balance": Decimal("8.00"), "won": Decimal("0.00"), "lost": Decimal("0.00")})
+        print("\n✅ test_bankroll_deltas passed — Bankroll changes aggregated.")
+
+    def test_settle_chunk(self):
+        """A chunk settles its bets, resolves parlays and writes once per table in one transaction"""
+        bet = lambda id, parlay_id=None: {"id": id, "user_id": 7, "bankroll_id": 3, "parlay_id": parlay_id,
+                                          "total_stake": Decimal("10.00"), "total_odds": Decimal("2.00")}
+        cursor = FakeCursor([
+            [bet(1), bet(2), bet(3, parlay_id=4)],                     # pending bets on the games
+            [{"bet_id": 1, "odds": Decimal("100"), "odds_format": "american", "result": "won"},
+             {"bet_id": 2, "odds": Decimal("100"), "odds_format": "american", "result": None},
+             {"bet_id": 3, "odds": Decimal("2.00"), "odds_format": "decimal", "result": "won"}],
+            [bet(4)],                                                  # parlay parent
+            [{"parlay_id": 4, "status": "won", "total_odds": Decimal("2.00")}],
+            [], [],                                                    # bet_statistics rows
+        ])
+        conn = FakeConnection(cursor)
+
+        settled = settlement.settle_chunk(conn, [100])
+
+        self.assertEqual([b["id"] for b in settled], [1, 3, 4])
+        self.assertTrue(conn.committed)
+        bankroll_writes = [rows for sql, rows in cursor.writes if "UPDATE bankrolls" in sql]
+        self.assertEqual(bankroll_writes, [[(Decimal("40.00"), Decimal("20.00"), Decimal("0.00"), 3)]])
+        bet_writes = [rows for sql, rows in cursor.writes if "UPDATE bets" in sql]
+        self.assertTrue(all("status = 'pending'" in sql for sql, _ in cursor.writes if "UPDATE bets" in sql))
+        self.assertEqual([(row[4], row[3]) for rows in bet_writes for row in rows], [(1, 1), (3, 2), (4, 3)])
+        print("\n✅ test_settle_chunk passed — Chunk settled in one transaction.")
+
+    def test_invalid_leg_skips_its_bet(self):
+        """A NULL format counts as american; a bet with impossible odds stays pending without failing the chunk"""
+        bet = lambda id: {"id": id, "user_id": 7, "bankroll_id": 3, "parlay_id": None,
+                          "total_stake": Decimal("10.00"), "total_odds": Decimal("2.00")}
+        cursor = FakeCursor([
+            [bet(1), bet(2)],
+            [{"bet_id": 1, "odds": Decimal("150"), "odds_format": None, "result": "won"},
+             {"bet_id": 2, "odds": Decimal("0"), "odds_format": "american", "result": "won"}],
+            [], [],
+        ])
+        conn = FakeConnection(cursor)
+
+        settled = settlement.settle_chunk(conn, [100])
+
+        self.assertEqual([(b["id"], b["actual_payout"]) for b in settled], [(1, Decimal("25.00"))])
+        self.assertTrue(conn.committed)
+        print("\n✅ test_invalid_leg_skips_its_bet passed — Bad leg skipped, chunk settled.")
+
+    def test_stats_follow_settlement_sequence(self):
+        """A later chunk settling a lower bet id still counts after the earlier chunk, as a recompute would"""
+        bet = lambda id: {"id": id, "user_id": 7, "bankroll_id": 3, "parlay_id": None,
+                          "total_stake": Decimal("10.00"), "total_odds": Decimal("2.00")}
+        leg = lambda id, result: {"bet_id": id, "odds": Decimal("2.00"), "odds_format": "decimal", "result": result}
+        cursor = FakeCursor([
+            [bet(8)], [leg(8, "won")], [], [],
+            [bet(2)], [leg(2, "lost")], [], [],
+        ])
+        conn = FakeConnection(cursor)
+
+        first = settlement.settle_chunk(conn, [100])
+        second = settlement.settle_chunk(conn, [101])
+
+        settled = second + first
+        self.assertEqual([b["id"] for b in sorted(settled, key=bet_stats.settlement_order)], [8, 2])
+        self.assertEqual([b["settlement_seq"] for b in first + second], [1, 2])
+        print("\n✅ test_stats_follow_settlement_sequence passed — One order for incremental and recomputed stats.")
+
+    def test_settle_chunk_rolls_back(self):
+        """A failure mid-chunk rolls the whole chunk back"""
+        conn = FakeConnection(FakeCursor([]))
+        with self.assertRaises(IndexError):
+            settlement.settle_chunk(conn, [100])
+        self.assertTrue(conn.rolled_back)
+        self.assertFalse(conn.committed)
+        print("\n✅ test_settle_chunk_rolls_back passed — Failed chunk rolled back.")
+
+
+if __name__ == "__main__":
+    unittest.main()
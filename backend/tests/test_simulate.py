@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from app.simulate import StakingPlan, leg_probabilities, simulate_bankroll
+from app.staking import kelly_fraction
+
+
+class TestSimulate(unittest.TestCase):
+    """Monte Carlo bankroll simulation"""
+
+    def test_seed_reproduces_result(self):
+        """The same seed gives the same result; chunking doesn't change the summary shape"""
+        args = (1000, [0.55, 0.5], [1.91, 2.1], StakingPlan("fraction", 0.05))
+        a = simulate_bankroll(*args, n_bets=50, n_paths=5000, seed=7, chunk_paths=1000)
+        b = simulate_bankroll(*args, n_bets=50, n_paths=5000, seed=7, chunk_paths=1000)
+        self.assertEqual(a, b)
+        c = simulate_bankroll(*args, n_bets=50, n_paths=5000, seed=7, chunk_paths=5000)
+        self.assertEqual(c["paths"], 5000)
+        self.assertAlmostEqual(a["expected_growth"], c["expected_growth"], delta=0.05)
+        print("\n✅ test_seed_reproduces_result passed — Seeded runs match.")
+
+    def test_certain_loss_ruins_every_path(self):
+        """Flat stakes on a near-certain loser ruin every path, which then stops betting"""
+        result = simulate_bankroll(100, [1e-6], [2.0], StakingPlan("flat", 10), n_bets=20, n_paths=1000, seed=1)
+        self.assertEqual(result["risk_of_ruin"], 1.0)
+        self.assertEqual(result["final_bankroll"]["p50"], 10.0)
+        self.assertAlmostEqual(result["max_drawdown"]["p50"], 0.9)
+        print("\n✅ test_certain_loss_ruins_every_path passed — Ruin detected.")
+
+    def test_positive_edge_grows(self):
+        """Kelly staking with an edge grows the bankroll; with no edge it stakes nothing"""
+        edge = simulate_bankroll(1000, [0.6], [2.0], StakingPlan("kelly", 0.5), n_bets=200, n_paths=5000, seed=3)
+        self.assertGreater(edge["median_growth"], 0.5)
+        self.assertLess(edge["risk_of_ruin"], 0.01)
+        fair = simulate_bankroll(1000, [0.5], [2.0], StakingPlan("kelly", 1), n_bets=50, n_paths=100, seed=3)
+        self.assertEqual(fair["final_bankroll"]["p5"], 1000.0)
+        np.testing.assert_allclose(kelly_fraction([0.6, 0.4], [2.0, 2.0]), [0.2, 0.0])
+        print("\n✅ test_positive_edge_grows passed — Edge compounds, no edge no stake.")
+
+    def test_leg_probabilities_and_validation(self):
+        """Probabilities come from the price; bad inputs are rejected"""
+        np.testing.assert_allclose(leg_probabilities([2.0, 4.0]), [0.5, 0.25])
+        np.testing.assert_allclose(leg_probabilities([2.0], edge=0.1), [0.55])
+        for probabilities, odds, plan in (([0.5, 0.5], [2.0], StakingPlan("flat", 1)),
+                                          ([1.2], [2.0], StakingPlan("flat", 1)),
+                                          ([0.5], [1.0], StakingPlan("flat", 1)),
+                                          ([0.5], [2.0], StakingPlan("martingale", 1))):
+            with self.assertRaises(ValueError):
+                simulate_bankroll(100, probabilities, odds, plan, n_paths=10)
+        print("\n✅ test_leg_probabilities_and_validation passed — Inputs checked.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from app import staking
+
+
+class TestStaking(unittest.TestCase):
+    """Kelly sizing for single bets, slips and recommendation batches"""
+
+    def test_single_bet_kelly(self):
+        """Fractional Kelly scales the edge and never stakes without one"""
+        np.testing.assert_allclose(staking.kelly_fraction([0.6, 0.5, 0.3], [2.0, 2.0, 2.0]), [0.2, 0.0, 0.0])
+        np.testing.assert_allclose(staking.fractional_kelly([0.6], [2.0], fraction=0.5, max_fraction=1), [0.1])
+        np.testing.assert_allclose(staking.fractional_kelly([0.9], [2.0], fraction=1, max_fraction=0.05), [0.05])
+        print("\n✅ test_single_bet_kelly passed — Single bets sized.")
+
+    def test_simultaneous_kelly(self):
+        """Two independent 60% coin flips stake less than 20% each; correlation shrinks them further"""
+        f = staking.simultaneous_kelly([0.6, 0.6], [2.0, 2.0], fraction=1, max_total=0.99)
+        np.testing.assert_allclose(f, [0.1923, 0.1923], atol=1e-3)
+        correlated = staking.simultaneous_kelly([0.6, 0.6], [2.0, 2.0], staking.same_game_correlation([1, 1], 0.6),
+                                                fraction=1, max_total=0.99)
+        self.assertLess(correlated.sum(), f.sum())
+        capped = staking.simultaneous_kelly([0.6] * 4, [2.0] * 4, fraction=0.5, max_total=0.1)
+        self.assertLessEqual(capped.sum(), 0.1 + 1e-9)
+        print("\n✅ test_simultaneous_kelly passed — Slip sized jointly.")
+
+    def test_size_stakes_batch(self):
+        """A batch is sized in one call, capped per bet, per slip and by the budget"""
+        scores, odds = [60, 55, 40, 70], [-110, 120, 150, -150]
+        stakes = staking.size_stakes(scores, odds, 1000, mode="independent")
+        self.assertEqual(stakes[2], 0.0)
+        self.assertTrue((stakes <= 50).all())
+        budgeted = staking.size_stakes(scores, odds, 1000, game_ids=[1, 1, 2, 3], budget=30)
+        self.assertLessEqual(budgeted.sum(), 30)
+        np.testing.assert_array_equal(budgeted, np.round(budgeted, 2))
+        with self.assertRaises(ValueError):
+            staking.size_stakes(scores, odds, 1000, mode="martingale")
+        print("\n✅ test_size_stakes_batch passed — Batch sized with caps.")
+
+    def test_budget_cap(self):
+        """The betting category caps stakes; users without one are uncapped"""
+        self.assertEqual(staking.budget_cap({"categories": {"food": 300, "entertainment": 200}}), 200.0)
+        self.assertEqual(staking.budget_cap({"categories": {"betting": 50, "entertainment": 200}}), 50.0)
+        self.assertIsNone(staking.budget_cap({"categories": {"food": 300}}))
+        print("\n✅ test_budget_cap passed — Budget category found.")
+
+
+if __name__ == "__main__":
+    unittest.main()
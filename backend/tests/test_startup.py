@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import app.model as model_module
+
+HEAVY_MODULES = ("pandas", "sklearn", "joblib")
+
+
+class TestStartup(unittest.TestCase):
+    """Import-time cost and lazy model loading"""
+
+    def test_import_is_cheap(self):
+        """Importing app should not load the model or heavy ML libraries"""
+        code = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import app\n"
+            "elapsed = time.perf_counter() - start\n"
+            f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+            "print(elapsed, ','.join(heavy), app.model._loaded is None)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        elapsed, heavy, not_loaded = out.stdout.split(" ")
+        self.assertEqual(heavy, "")
+        self.assertEqual(not_loaded.strip(), "True")
+        print(f"\n✅ test_import_is_cheap passed — `import app` took {float(elapsed) * 1000:.1f}ms.")
+
+    def test_concurrent_first_use_loads_once(self):
+        """Many threads hitting a cold model should trigger a single load"""
+        model_module.unload_model()
+        real_load = model_module.load_model
+        with mock.patch.object(model_module, "load_model", side_effect=real_load) as load:
+            threads = [threading.Thread(target=model_module.get_model) for _ in range(16)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(load.call_count, 1)
+        print("\n✅ test_concurrent_first_use_loads_once passed — Model loaded exactly once.")
+
+    def test_warm_up(self):
+        """warm_up should leave the model loaded and report its duration"""
+        model_module.unload_model()
+        elapsed = model_module.warm_up()
+        self.assertIsNotNone(model_module._loaded)
+        self.assertGreaterEqual(elapsed, 0)
+        print(f"\n✅ test_warm_up passed — Cold warm-up took {elapsed:.2f}s.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,123 @@
+import datetime
+import time
+import unittest
+from unittest import mock
+
+import jwt
+
+from token_cache import TokenCache
+
+SECRET = "test-secret-for-token-cache-unit-tests"
+
+
+def make_token(minutes=5, **claims):
+    claims["exp"] = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=minutes)
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+class FakeRevocations:
+    """Stands in for the revoked_tokens table shared by workers"""
+
+    def __init__(self):
+        self.rows = {}
+        self.lookups = 0
+
+    def is_revoked(self, digest):
+        self.lookups += 1
+        return self.rows.get(digest, 0) > time.time()
+
+    def save(self, digest, exp):
+        self.rows[digest] = exp
+
+
+class TestTokenCache(unittest.TestCase):
+    """Caching of verified JWTs and revocation"""
+
+    def setUp(self):
+        self.shared = FakeRevocations()
+        self.cache = self.make_cache()
+        self.decode = mock.Mock(side_effect=lambda t: jwt.decode(t, SECRET, algorithms=["HS256"]))
+
+    def make_cache(self, **kwargs):
+        return TokenCache(maxsize=16, is_revoked=self.shared.is_revoked, save_revocation=self.shared.save,
+                          **kwargs)
+
+    def test_repeat_validation_skips_decode(self):
+        """Second validation of the same token should be a cache hit"""
+        token = make_token(email="a@b.com", type="access")
+        first = self.cache.verify(token, self.decode)
+        second = self.cache.verify(token, self.decode)
+        self.assertEqual(first["email"], "a@b.com")
+        self.assertEqual(first, second)
+        self.assertEqual(self.decode.call_count, 1)
+        print("\n✅ test_repeat_validation_skips_decode passed — Repeat validation served from cache.")
+
+    def test_invalid_token_rejected(self):
+        """Bad signatures and expired tokens should never be cached"""
+        forged = jwt.encode({"email": "x", "exp": time.time() + 60}, "another-secret-that-is-long-enough!!", algorithm="HS256")
+        expired = make_token(minutes=-1, email="a@b.com")
+        self.assertIsNone(self.cache.verify(forged, self.decode))
+        self.assertIsNone(self.cache.verify(expired, self.decode))
+        self.assertIsNone(self.cache.verify("not-a-jwt", self.decode))
+        self.assertEqual(self.cache.stats()["size"], 0)
+        print("\n✅ test_invalid_token_rejected passed — Invalid tokens rejected.")
+
+    def test_cached_token_expires(self):
+        """A cached token must be rejected once its exp passes"""
+        token = make_token(email="a@b.com")
+        self.assertIsNotNone(self.cache.verify(token, self.decode))
+        later = time.time() + 3600
+        with mock.patch("token_cache.time.time", return_value=later):
+            self.assertIsNone(self.cache.verify(token, lambda t: jwt.decode(
+                t, SECRET, algorithms=["HS256"], options={"verify_exp": True})))
+        print("\n✅ test_cached_token_expires passed — Expired cached token rejected.")
+
+    def test_revoked_token_rejected(self):
+        """Revoked tokens should be rejected even though they are cached"""
+        token = make_token(email="a@b.com")
+        payload = self.cache.verify(token, self.decode)
+        self.cache.revoke(token, payload["exp"])
+        self.assertTrue(self.cache.is_revoked(token))
+        self.assertIsNone(self.cache.verify(token, self.decode))
+        other = make_token(email="c@d.com")
+        self.assertIsNotNone(self.cache.verify(other, self.decode))
+        print("\n✅ test_revoked_token_rejected passed — Revoked token rejected.")
+
+    def test_revocation_reaches_other_workers(self):
+        """A logout on one worker is honoured by another once its cached entry ages out"""
+        other_worker = self.make_cache(ttl=30)
+        token = make_token(email="a@b.com")
+        payload = other_worker.verify(token, self.decode)
+        self.cache.revoke(token, payload["exp"])
+
+        self.assertIsNotNone(other_worker.verify(token, self.decode))  # still within its ttl
+        later, later_monotonic = time.time() + 31, time.monotonic() + 31
+        with mock.patch("token_cache.time.time", return_value=later), \
+                mock.patch("app.cache.time.monotonic", return_value=later_monotonic):
+            self.assertIsNone(other_worker.verify(token, self.decode))
+        self.assertEqual(self.shared.lookups, 2)
+        print("\n✅ test_revocation_reaches_other_workers passed — Revocation shared across workers.")
+
+    def test_shared_store_down_keeps_local_revocations(self):
+        """With revoked_tokens unreachable, tokens still verify and local revocations still hold"""
+        def down(*args):
+            raise ConnectionError("MySQL has gone away")
+
+        cache = TokenCache(maxsize=16, is_revoked=down, save_revocation=down)
+        token = make_token(email="a@b.com")
+        payload = cache.verify(token, self.decode)
+        self.assertIsNotNone(payload)
+        cache.revoke(token, payload["exp"])
+        self.assertIsNone(cache.verify(token, self.decode))
+        print("\n✅ test_shared_store_down_keeps_local_revocations passed — Outage degrades to per-worker revocation.")
+
+    def test_returns_copies(self):
+        """Callers mutating the payload must not poison the cache"""
+        token = make_token(email="a@b.com")
+        self.cache.verify(token, self.decode)["email"] = "evil@x.com"
+        self.assertEqual(self.cache.verify(token, self.decode)["email"], "a@b.com")
+        print("\n✅ test_returns_copies passed — Cached payload isolated from callers.")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,110 @@
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app import training
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+
+def write_records(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform([500, 0, 0, 1], [20000, 10000, 50000, 60], size=(n, 4))
+    food = 0.3 + 0.2 * X[:, 1] / X[:, 0]
+    ent = 0.3 - 0.1 * X[:, 3] / 60
+    frame = pd.DataFrame(np.column_stack([X, food, ent, 1 - food - ent]), columns=training.COLUMNS)
+    if str(path).endswith(".parquet"):
+        frame.to_parquet(path)
+    else:
+        frame.to_csv(path, index=False)
+    return frame
+
+
+class TestTraining(unittest.TestCase):
+    """Chunked loading, bounded sampling and the training report"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reservoir_is_bounded_and_uniform(self):
+        """The reservoir never exceeds capacity and keeps rows from the whole stream"""
+        reservoir = training.Reservoir(500, 1, seed=3)
+        stream = np.arange(50_000, dtype=np.float32).reshape(-1, 1)
+        for start in range(0, len(stream), 1000):
+            reservoir.add(stream[start:start + 1000])
+        kept = reservoir.sample()[:, 0]
+        self.assertEqual(len(kept), 500)
+        self.assertEqual(reservoir.seen, 50_000)
+        self.assertEqual(len(np.unique(kept)), 500)
+        self.assertAlmostEqual(kept.mean() / 50_000, 0.5, delta=0.05)
+        print("\n✅ test_reservoir_is_bounded_and_uniform passed — Uniform bounded sample.")
+
+    def test_load_in_chunks_as_float32(self):
+        """CSV is read chunk by chunk into float32, capped by max_rows or the memory budget"""
+        path = self.dir / "records.csv"
+        write_records(path, 2500)
+        X, Y, rows_read = training.load_training_data(path, chunksize=400)
+        self.assertEqual((X.shape, Y.shape, rows_read), ((2500, 4), (2500, 3), 2500))
+        self.assertEqual(X.dtype, np.float32)
+        X, _, rows_read = training.load_training_data(path, max_rows=300, chunksize=400)
+        self.assertEqual((len(X), rows_read), (300, 2500))
+        self.assertEqual(training.max_rows_for_budget(1, n_columns=7), 2 ** 20 // 4 // 28)
+        with self.assertRaises(ValueError):
+            training.load_training_data(self.dir / "records.xlsx")
+        print("\n✅ test_load_in_chunks_as_float32 passed — Data streamed within budget.")
+
+    def test_train_reports_holdout(self):
+        """Both estimators train and report time, memory and held-out error"""
+        path = self.dir / "records.csv"
+        write_records(path, 1500)
+        for kind in training.ESTIMATORS:
+            model, report = training.train(path, estimator=kind, n_jobs=1, n_estimators=10, holdout=0.2,
+                                           trace_memory=True)
+            self.assertEqual((report["rows_train"], report["rows_holdout"]), (1200, 300))
+            self.assertGreater(report["holdout"]["r2"], 0.5)
+            self.assertGreater(report["peak_traced_mb"], 0)
+            self.assertFalse(tracemalloc.is_tracing())
+            self.assertEqual(model.predict(pd.DataFrame([[4000, 1500, 2400, 6]], columns=training.FEATURES)).shape,
+                             (1, 3))
+        print("\n✅ test_train_reports_holdout passed — Training report produced.")
+
+    def test_tracing_left_to_the_caller(self):
+        """Untraced by default; a caller's own tracing is not stopped"""
+        path = self.dir / "records.csv"
+        write_records(path, 300)
+        _, report = training.train(path, n_jobs=1, n_estimators=5)
+        self.assertIsNone(report["peak_traced_mb"])
+        self.assertFalse(tracemalloc.is_tracing())
+        tracemalloc.start()
+        try:
+            _, report = training.train(path, n_jobs=1, n_estimators=5, trace_memory=True)
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertGreater(report["peak_traced_mb"], 0)
+        finally:
+            tracemalloc.stop()
+        print("\n✅ test_tracing_left_to_the_caller passed — Caller's tracing untouched.")
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow not installed")
+    def test_parquet(self):
+        """Parquet files stream through the same pipeline"""
+        path = self.dir / "records.parquet"
+        write_records(path, 1000)
+        X, Y, rows_read = training.load_training_data(path, chunksize=300)
+        self.assertEqual((len(X), rows_read), (1000, 1000))
+        print("\n✅ test_parquet passed — Parquet loaded.")
+
+
+if __name__ == "__main__":
+    unittest.main()
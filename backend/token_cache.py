@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+
+import jwt
+
+from app.cache import LRUCache
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Longest a worker trusts a cached token without checking revoked_tokens; a
+# logout on another worker takes effect here within this many seconds
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "30"))
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def is_revoked_in_db(digest: bytes) -> bool:
+    """True if any worker revoked the token with this digest and it hasn't expired yet."""
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute("SELECT 1 FROM revoked_tokens WHERE token_hash = %s AND expires_at > %s",
+                  (digest, int(time.time())))
+        return c.fetchone() is not None
+
+def save_revocation_to_db(digest: bytes, exp: float):
+    """Record a revocation for every worker, clearing out a few expired ones on the way."""
+    from db import connection
+
+    with connection() as conn, conn.cursor() as c:
+        c.execute(
+            "INSERT INTO revoked_tokens (token_hash, expires_at) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)",
+            (digest, int(exp) + 1)
+        )
+        c.execute("DELETE FROM revoked_tokens WHERE expires_at < %s LIMIT 1000", (int(time.time()),))
+        conn.commit()
+
+
+class TokenCache:
+    """Remembers tokens that already passed signature verification.
+
+    Entries are keyed by the token's SHA-256 digest and expire at the token's
+    own ``exp`` or after ``ttl`` seconds, whichever is sooner, so a repeat
+    validation is a dictionary lookup. Revoked tokens (e.g. on logout) are
+    written to the shared revoked_tokens table and kept in a local set until
+    they would have expired anyway. This worker rejects them at once; other
+    workers do on their next miss, within ``ttl``. If the table can't be
+    reached the check is skipped and the local set still applies.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL,
+                 is_revoked=is_revoked_in_db, save_revocation=save_revocation_to_db):
+        self._verified = LRUCache(maxsize=maxsize)
+        self.ttl = ttl
+        self._is_revoked_shared = is_revoked
+        self._save_revocation = save_revocation
+        self._revoked = {}  # digest -> exp (unix time)
+        self._lock = threading.Lock()
+
+    def verify(self, token: str, decode):
+        """Return the token's claims, or None if invalid, expired or revoked.
+
+        ``decode`` performs the full verification on a cache miss and must raise
+        jwt.InvalidTokenError (or a subclass) for bad tokens.
+        """
+        key = token_digest(token)
+        now = time.time()
+
+        revoked_exp = self._revoked.get(key)
+        if revoked_exp is not None and revoked_exp > now:
+            return None
+
+        payload = self._verified.get(key)
+        if payload is not None:
+            if payload["exp"] > now:
+                return dict(payload)
+            self._verified.pop(key)
+            return None
+
+        try:
+            payload = decode(token)
+        except jwt.InvalidTokenError:
+            return None
+
+        if self._revoked_elsewhere(key):
+            return None
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)) and exp > now:
+            self._verified.set(key, dict(payload), ttl=min(exp - now, self.ttl))
+        return payload
+
+    def revoke(self, token: str, exp: float):
+        """Reject ``token`` from now until ``exp`` (unix time)."""
+        key = token_digest(token)
+        now = time.time()
+        with self._lock:
+            self._revoked[key] = exp
+            if len(self._revoked) > 1024:
+                self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+        self._verified.pop(key)
+        try:
+            self._save_revocation(key, exp)
+        except Exception as e:
+            print("TOKEN REVOCATION ERROR:", e)
+
+    def is_revoked(self, token: str) -> bool:
+        exp = self._revoked.get(token_digest(token))
+        return exp is not None and exp > time.time()
+
+    def _revoked_elsewhere(self, key):
+        try:
+            return self._is_revoked_shared(key)
+        except Exception as e:
+            print("TOKEN REVOCATION ERROR:", e)
+            return False
+
+    def stats(self):
+        stats = self._verified.stats()
+        stats["revoked"] = len(self._revoked)
+        return stats